@@ -209,6 +209,7 @@ def add_uddf_input(parser):
     - multiple UDDF files can be specified
     - each file can be preceded with `-k` option to indicate which dives
       should be fetched from a file
+    - `-j` is added to parse the files with multiple processes
 
     The `-k` and `-n` options are glued with 'and' operator - use only one
     of them if confused.
@@ -221,6 +222,11 @@ def add_uddf_input(parser):
             dest='dives',
             help='fetch dives with their number (i.e. 40-42,45 are dives'
                 ' with dive number 40, 41, 42 and 45)')
+    parser.add_argument('-j', '--jobs',
+            type=int,
+            default=1,
+            metavar='N',
+            help='parse input files with N processes')
     parser.add_argument('-k',
             dest='input',
             nargs=0,
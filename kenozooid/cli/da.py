@@ -109,7 +109,7 @@ class PlotProfiles(object):
                     .format(ext))
 
         r, f = args.input
-        dives = kl.find_dives(f, r, args.dives)
+        dives = kl.find_dives(f, r, args.dives, jobs=args.jobs)
 
         kp.plot(dives, fout,
             ptype=args.plot_type,
@@ -153,7 +153,7 @@ class Analyze(object):
         import kenozooid.logbook as kl
 
         r, f = args.input
-        dives = kl.find_dives(f, r, args.dives)
+        dives = kl.find_dives(f, r, args.dives, jobs=args.jobs)
         analyze(args.script, args.args, dives)
 
 
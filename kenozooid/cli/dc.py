@@ -36,6 +36,23 @@ add_master_command('sim',
         'Kenozooid dive simulation commands',
         'simulate dives with a dive computer')
 
+
+def add_tolerance(parser):
+    """
+    Add dive profile simplification option to a parser.
+
+    :Parameters:
+     parser
+        Parser of a command.
+    """
+    parser.add_argument('--simplify',
+            type=float,
+            default=None,
+            metavar='TOLERANCE',
+            dest='tolerance',
+            help='simplify dive profiles with depth tolerance in meters,'
+                ' i.e. 0.3')
+
 @inject(CLICommand, name='drivers')
 class ListDrivers(object):
     """
@@ -177,7 +194,7 @@ class Simulate(object):
         port = args.port
 
         r, f = args.input
-        dives = kl.find_dives(f, r, args.dives)
+        dives = kl.find_dives(f, r, args.dives, jobs=args.jobs)
 
         sim = find_driver(Simulator, drv, port)
 
@@ -208,6 +225,24 @@ class Backup(object):
                 help='device port, i.e. /dev/ttyUSB0, COM1')
         parser.add_argument('output',
                 help='UDDF file to contain dive computer backup')
+        parser.add_argument('--incremental',
+                action='store_true',
+                default=False,
+                help='store only dives newer than dives of previous backup')
+        parser.add_argument('--device',
+                nargs=3,
+                action='append',
+                dest='devices',
+                default=[],
+                metavar=('DRIVER', 'PORT', 'OUTPUT'),
+                help='backup another dive computer at the same time')
+        parser.add_argument('-j', '--jobs',
+                type=int,
+                metavar='N',
+                help='convert data of dive computers backed up at the same'
+                    ' time with N processes (number of processors by'
+                    ' default)')
+        add_tolerance(parser)
 
 
     def __call__(self, args):
@@ -220,7 +255,13 @@ class Backup(object):
         port = args.port
         fout = args.output
 
-        kd.backup(drv_name, port, fout)
+        if args.devices:
+            devices = [(drv_name, port, fout)] + args.devices
+            kd.backup_all(devices, jobs=args.jobs,
+                incremental=args.incremental, tolerance=args.tolerance)
+        else:
+            kd.backup(drv_name, port, fout, incremental=args.incremental,
+                tolerance=args.tolerance)
 
 
 
@@ -237,9 +278,17 @@ class DumpExtract(object):
         Add options for dive extract command.
         """
         parser.add_argument('input',
-                help='UDDF file with dive computer dump data')
+                nargs='+',
+                help='UDDF file(s) with dive computer dump data')
         parser.add_argument('output',
                 help='output UDDF file')
+        parser.add_argument('-j', '--jobs',
+                type=int,
+                default=1,
+                metavar='N',
+                help='parse dive data (or convert multiple files) with N'
+                    ' processes')
+        add_tolerance(parser)
 
 
     def __call__(self, args):
@@ -251,8 +300,13 @@ class DumpExtract(object):
         fin = args.input
         fout = args.output
         log.debug('extracting dive profiles from {} (saving to {})' \
-                .format(fin, fout))
-        kd.extract_dives(fin, fout)
+                .format(', '.join(fin), fout))
+        if len(fin) == 1:
+            kd.extract_dives(fin[0], fout, jobs=args.jobs,
+                tolerance=args.tolerance)
+        else:
+            kd.extract_dumps(fin, fout, jobs=args.jobs,
+                tolerance=args.tolerance)
 
 
 
@@ -274,6 +328,7 @@ class Convert(object):
                 help='dive computer binary data')
         parser.add_argument('output',
                 help='UDDF file to contain dive computer backup')
+        add_tolerance(parser)
 
 
     def __call__(self, args):
@@ -286,7 +341,7 @@ class Convert(object):
         fin = args.input
         fout = args.output
 
-        kd.convert(drv_name, fin, fout)
+        kd.convert(drv_name, fin, fout, tolerance=args.tolerance)
 
 
 # vim: sw=4:et:ai
@@ -73,9 +73,10 @@ class ListDives(object):
         Execute command for list of dives in UDDF file.
         """
         import kenozooid.logbook as kl
+        import kenozooid.uddf as ku
 
         for fin in args.input:
-            dives = kl.find_dives([fin])
+            dives = ku.index_dives(fin)
             print('{}:'.format(fin))
             for i, d in enumerate(kl.list_dives(dives), 1):
                 print('{:5}: {:>4} {:>9} {:>9} ({:>5}) {:>9} {:>9}'.format(i,
@@ -151,7 +152,8 @@ class CopyDive(object):
         import kenozooid.logbook as kl
 
         r, f = args.input
-        kl.copy_dives(f, r, args.dives, args.logbook)
+        kl.copy_dives(f, r, args.dives, args.logbook,
+            jobs=args.jobs)
 
 
 
@@ -19,9 +19,12 @@
 
 from collections import namedtuple
 from operator import attrgetter
+import copyreg
 
 import kenozooid.util as ku
 
+_TYPES = {}
+
 def ntuple(name, fields):
     """
     Create a named tuple with all fields set to ``None`` by default.
@@ -36,15 +39,35 @@ def ntuple(name, fields):
     k = len(t._fields)
     df = k * (None, )
     dt = t(*df)
+
+    # the tuple class is not available at module level, so register it
+    # to allow sending of the data records between processes
+    _TYPES[name] = t
+    copyreg.pickle(t, lambda r: (_record, (name, tuple(r))))
     return dt._replace
 
 
+def _record(name, values):
+    """
+    Recreate data record of given type with values.
+
+    :Parameters:
+     name
+        Name of data record type.
+     values
+        Values of data record.
+    """
+    return _TYPES[name]._make(values)
+
+
+
 Dive = ntuple('Dive', 'number datetime depth duration temp avg_depth mode profile' \
         ' equipment')
 Sample = ntuple('Sample', 'depth time temp setpoint setpointby' \
         ' deco_time deco_depth alarm gas')
 Gas = ntuple('Gas', 'id name o2 he depth')
 BinaryData = ntuple('BinaryData', 'datetime data')
+DiveKey = ntuple('DiveKey', 'datetime key')
 
 
 def gas(o2, he, depth=0):
@@ -67,14 +90,14 @@ def gas(o2, he, depth=0):
 
 def sort_dives(dives):
     """
-    Sort dives by dive datetime.
+    Sort dives (or dive keys) by dive datetime.
     """
     return sorted(dives, key=attrgetter('datetime'))
 
 
 def uniq_dives(dives):
     """
-    Remove duplicated dives from sorted iterator of dives.
+    Remove duplicated dives from sorted iterator of dives (or dive keys).
     """
     ld = None
     for d in dives:
@@ -82,4 +105,99 @@ def uniq_dives(dives):
             yield d
         ld = d.datetime
 
+
+def decimate_dives(dives, tolerance):
+    """
+    Reduce amount of dive profile samples of each dive.
+
+    :Parameters:
+     dives
+        Iterator of dives.
+     tolerance
+        Maximum depth error of simplified dive profile in meters.
+
+    .. seealso:: :py:func:`simplify_profile`
+    """
+    for d in dives:
+        yield d._replace(profile=simplify_profile(d.profile, tolerance))
+
+
+def simplify_profile(samples, tolerance):
+    """
+    Simplify dive profile with Ramer-Douglas-Peucker algorithm.
+
+    The distance of a sample to a profile line is the depth difference
+    between the sample and the line at time of the sample, so the simplified
+    profile differs from the original one by at most ``tolerance`` meters.
+
+    The first and last samples are always kept. Samples with an alarm or
+    gas switch and samples changing deco or setpoint information are kept
+    as well and the profile is simplified between such samples.
+
+    List of simplified dive profile samples is returned.
+
+    :Parameters:
+     samples
+        Dive profile samples.
+     tolerance
+        Maximum depth error of simplified dive profile in meters.
+    """
+    samples = list(samples)
+    n = len(samples)
+    if n < 3:
+        return samples
+
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    for k in range(1, n - 1):
+        keep[k] = _is_event(samples[k - 1], samples[k])
+
+    anchors = [k for k in range(n) if keep[k]]
+    segments = list(zip(anchors[:-1], anchors[1:]))
+    while segments:
+        i, j = segments.pop()
+        s1, s2 = samples[i], samples[j]
+        if j - i < 2:
+            continue
+        if s1.depth is None or s2.depth is None:
+            keep[i + 1:j] = (j - i - 1) * [True]
+            continue
+
+        dt = s2.time - s1.time
+        a = (s2.depth - s1.depth) / dt if dt else 0.0
+
+        k = -1
+        dmax = tolerance
+        for m in range(i + 1, j):
+            s = samples[m]
+            d = abs(s.depth - s1.depth - a * (s.time - s1.time))
+            if d > dmax:
+                k, dmax = m, d
+
+        if k > 0:
+            keep[k] = True
+            segments.append((i, k))
+            segments.append((k, j))
+
+    return [s for s, v in zip(samples, keep) if v]
+
+
+def _is_event(prev, sample):
+    """
+    Check if dive profile sample contains an event, which cannot be
+    removed from the dive profile.
+
+    :Parameters:
+     prev
+        Previous dive profile sample.
+     sample
+        Dive profile sample.
+    """
+    return sample.depth is None \
+        or sample.alarm is not None \
+        or sample.gas is not None \
+        or sample.setpoint != prev.setpoint \
+        or sample.deco_time != prev.deco_time \
+        or sample.deco_depth != prev.deco_depth
+
 # vim: sw=4:et:ai
@@ -21,10 +21,19 @@
 Dive computer functionality.
 """
 
+from collections import OrderedDict
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from dirty import RawString
 from functools import partial
+from itertools import chain
+import importlib
+import json
 import lxml.etree as et
 import logging
+import os
+import tempfile
 
 import kenozooid.component as kc
 import kenozooid.data as kd
@@ -33,10 +42,22 @@ import kenozooid.uddf as ku
 
 log = logging.getLogger('kenozooid.dc')
 
-def backup(drv_name, port, fout):
+# file with fingerprints of the newest dives fetched from dive computers,
+# see backup
+FINGERPRINT_FILE = os.path.join(os.path.expanduser('~'), '.kenozooid',
+    'fingerprints.json')
+
+# size of XML data chunks read from dives spool file, see _spool
+SPOOL_CHUNK = 1024 ** 2
+
+def backup(drv_name, port, fout, incremental=False, tolerance=None):
     """
     Backup dive computer data.
 
+    If incremental backup is requested, then only dives newer than the
+    newest dive of previous backup of a dive computer are stored in the
+    output file. The dive computer raw data is stored in full.
+
     :Parameters:
      drv_name
         Dive computer driver name.
@@ -44,14 +65,237 @@ def backup(drv_name, port, fout):
         Dive computer port.
      fout
         Output file.
+     incremental
+        Store only new dives if true.
+     tolerance
+        Dive profile simplification tolerance in meters, see
+        :py:func:`kenozooid.data.simplify_profile`.
     """
     drv = _mem_dump(drv_name, port)
+    if incremental:
+        _check_incremental(drv_name, drv)
+
     data = drv.dump()
 
-    _save_dives(drv, datetime.now(), data, fout)
+    key = fp = new_fp = None
+    if incremental:
+        key, fp, new_fp = _backup_fingerprints(drv, data)
+
+    _save_dives(drv, datetime.now(), data, fout, fingerprint=fp,
+        tolerance=tolerance)
+
+    if incremental and new_fp is not None:
+        save_fingerprint(key, new_fp)
+
+
+def backup_all(devices, jobs=None, incremental=False, tolerance=None):
+    """
+    Backup data of several dive computers at once.
+
+    The data is downloaded from the dive computers concurrently with
+    asyncio event loop (see :py:class:`kenozooid.driver.AsyncDataParser`).
+    The data of a dive computer is converted with a pool of processes as
+    soon as it is downloaded, while the data of other dive computers is
+    still being downloaded.
+
+    If backup of a dive computer fails, then the error is logged and
+    raised when backup of all other dive computers is finished.
+
+    :Parameters:
+     devices
+        Collection of tuples of dive computer driver name, port and output
+        file.
+     jobs
+        Amount of processes used to convert dive computer data, `None` for
+        number of processors.
+     incremental
+        Store only new dives if true.
+     tolerance
+        Dive profile simplification tolerance in meters, see
+        :py:func:`kenozooid.data.simplify_profile`.
+    """
+    asyncio.run(_backup_all(devices, jobs, incremental, tolerance))
+
+
+async def _backup_all(devices, jobs, incremental, tolerance):
+    """
+    Backup data of several dive computers at once with asyncio event loop.
+
+    See :py:func:`backup_all` for parameters description.
+    """
+    with _executor(jobs) as e:
+        tasks = (_backup_device(e, name, port, fout, incremental, tolerance)
+            for name, port, fout in devices)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    errors = [(d, ex) for d, ex in zip(devices, results) if ex is not None]
+    for (name, port, fout), ex in errors:
+        log.error('backup of {} dive computer at {} failed: {}'
+            .format(name, port, ex))
+    if errors:
+        raise errors[0][1]
+
+
+async def _backup_device(executor, drv_name, port, fout, incremental,
+        tolerance):
+    """
+    Backup dive computer data with asyncio event loop.
+
+    The dive computer data is downloaded asynchronously and converted
+    with an executor.
+
+    :Parameters:
+     executor
+        Executor used to convert dive computer data.
+     drv_name
+        Dive computer driver name.
+     port
+        Dive computer port.
+     fout
+        Output file.
+     incremental
+        Store only new dives if true.
+     tolerance
+        Dive profile simplification tolerance in meters.
+    """
+    from kenozooid.driver import AsyncDataParser, DataParser, \
+        find_driver_async
+
+    drv = await find_driver_async(AsyncDataParser, drv_name, port)
+    if drv is None:
+        raise ValueError('Device driver {} does not support asynchronous'
+            ' data dump'.format(drv_name))
+
+    id = kc.params(drv.__class__)['id']
+    parser = next(kc.query(DataParser, id=id))()
+    if incremental:
+        _check_incremental(drv_name, parser)
+
+    data = await drv.dump()
+    time = datetime.now()
+    log.debug('downloaded {} byte(s) from {} dive computer at {}'
+        .format(len(data), drv_name, port))
+
+    key = fp = new_fp = None
+    if incremental:
+        key, fp, new_fp = _backup_fingerprints(parser, data)
+
+    args = (parser.__class__, time, data, fout, fp, tolerance)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(executor, _backup_job, args)
 
+    if incremental and new_fp is not None:
+        save_fingerprint(key, new_fp)
 
-def convert(drv_name, fin, fout):
+
+def _backup_job(args):
+    """
+    Convert raw dive computer data into UDDF format and store it in output
+    file.
+
+    :Parameters:
+     args
+        Tuple of data parser class, time of raw data fetch, raw data,
+        output file, dive fingerprint and dive profile simplification
+        tolerance.
+    """
+    cls, time, data, fout, fingerprint, tolerance = args
+    _save_dives(cls(), time, data, fout, fingerprint=fingerprint,
+        tolerance=tolerance)
+
+
+def _check_incremental(drv_name, drv):
+    """
+    Check if data parser of a device driver supports incremental backup.
+
+    Value error is raised if incremental backup is not supported.
+
+    :Parameters:
+     drv_name
+        Dive computer driver name.
+     drv
+        Data parser of the device driver.
+    """
+    if 'fingerprint' not in kc.params(drv.__class__)['data']:
+        raise ValueError('Device driver {} does not support incremental'
+            ' backup'.format(drv_name))
+
+
+def _backup_fingerprints(drv, data):
+    """
+    Get dive computer key, fingerprint of the newest dive of previous
+    backup and fingerprint of the newest dive in raw data.
+
+    :Parameters:
+     drv
+        Data parser of the device driver.
+     data
+        Raw dive computer data.
+    """
+    serial, new_fp = drv.fingerprint(data)
+    key = '{}-{}'.format(kc.params(drv.__class__)['id'], serial)
+    fp = load_fingerprint(key)
+    log.debug('dive computer {} fingerprint {}'.format(key, fp))
+    return key, fp, new_fp
+
+
+def load_fingerprint(key, fn=None):
+    """
+    Load fingerprint of the newest dive fetched from a dive computer.
+
+    If there is no fingerprint for the dive computer, then `None` is
+    returned.
+
+    :Parameters:
+     key
+        Dive computer key, i.e. driver id and serial number.
+     fn
+        Fingerprint file name, `FINGERPRINT_FILE` by default.
+    """
+    return _load_fingerprints(fn).get(key)
+
+
+def save_fingerprint(key, fp, fn=None):
+    """
+    Save fingerprint of the newest dive fetched from a dive computer.
+
+    :Parameters:
+     key
+        Dive computer key, i.e. driver id and serial number.
+     fp
+        Dive fingerprint.
+     fn
+        Fingerprint file name, `FINGERPRINT_FILE` by default.
+    """
+    fn = FINGERPRINT_FILE if fn is None else fn
+    data = _load_fingerprints(fn)
+    data[key] = fp
+
+    os.makedirs(os.path.dirname(os.path.abspath(fn)), exist_ok=True)
+    tmp = fn + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=4, sort_keys=True)
+    os.replace(tmp, fn)
+    log.debug('saved dive computer {} fingerprint {}'.format(key, fp))
+
+
+def _load_fingerprints(fn=None):
+    """
+    Load dictionary of dive fingerprints.
+
+    :Parameters:
+     fn
+        Fingerprint file name, `FINGERPRINT_FILE` by default.
+    """
+    fn = FINGERPRINT_FILE if fn is None else fn
+    try:
+        with open(fn) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def convert(drv_name, fin, fout, tolerance=None):
     """
     Convert binary dive computer data into UDDF.
 
@@ -62,40 +306,184 @@ def convert(drv_name, fin, fout):
         Binary dive computer data file name.
      fout
         Output file.
+     tolerance
+        Dive profile simplification tolerance in meters, see
+        :py:func:`kenozooid.data.simplify_profile`.
     """
     drv = _mem_dump(drv_name)
     with open(fin, 'rb') as f:
         data = f.read()
-        _save_dives(drv, datetime.now(), data, fout)
+        _save_dives(drv, datetime.now(), data, fout, tolerance=tolerance)
 
 
-def extract_dives(fin, fout):
+def extract_dives(fin, fout, jobs=None, tolerance=None):
     """
     Extract dives from dive computer dump data.
 
+    If the input file contains multiple dive computer dumps (i.e. it is
+    created by :py:func:`extract_dumps`), then the dives of all dumps are
+    extracted with :py:func:`extract_dumps`.
+
     :Parameters:
      fin
         UDDF file with dive computer raw data.
      fout
         Output file.
+     jobs
+        Amount of processes used to parse dive data.
+     tolerance
+        Dive profile simplification tolerance in meters, see
+        :py:func:`kenozooid.data.simplify_profile`.
     """
-    xp_dc = ku.XPath('//uddf:divecomputerdump')
-    
-    din = et.parse(fin)
-    nodes = xp_dc(din)
-    if not nodes:
+    dumps = _find_dumps(fin)
+    if not dumps:
         raise ValueError('No dive computer dump data found in {}'
                 .format(fin))
 
-    assert len(nodes) == 1
+    if len(dumps) > 1:
+        log.debug('{} dive computer dumps found in {}'.format(len(dumps), fin))
+        extract_dumps([fin], fout, jobs=jobs, tolerance=tolerance)
+        return
 
-    dump = ku.dump_data(nodes[0])
+    dump = dumps[0]
 
     log.debug('dive computer dump data found: ' \
             '{0.dc_id}, {0.dc_model}, {0.datetime}'.format(dump))
 
     drv = _mem_dump(dump.dc_model)
-    _save_dives(drv, dump.datetime, dump.data, fout)
+    _save_dives(drv, dump.datetime, dump.data, fout, jobs=jobs,
+        tolerance=tolerance)
+
+
+def extract_dumps(files, fout, jobs=None, tolerance=None):
+    """
+    Extract dives from dive computer dump data stored in multiple UDDF
+    files into one file.
+
+    All dive computer dumps of each file are converted. The dives are
+    sorted and duplicated dives are stored once. The dive computer dumps
+    are stored in the output file, so it can be used as dive extraction
+    source again.
+
+    :Parameters:
+     files
+        UDDF files with dive computer raw data.
+     fout
+        Output file.
+     jobs
+        Amount of processes used to convert the files, `None` to convert
+        the files in current process.
+     tolerance
+        Dive profile simplification tolerance in meters, see
+        :py:func:`kenozooid.data.simplify_profile`.
+    """
+    args = ((f, tolerance) for f in files)
+    if jobs is not None and jobs > 1:
+        log.debug('extracting dives with {} processes'.format(jobs))
+        with _executor(jobs) as e:
+            data = list(chain.from_iterable(e.map(_extract_job, args)))
+    else:
+        data = list(chain.from_iterable(map(_extract_job, args)))
+
+    if not data:
+        raise ValueError('No dive computer dump data found in {}'
+                .format(', '.join(files)))
+
+    models = OrderedDict()
+    dumps = OrderedDict()
+    for dc_id, model, bdata, _ in data:
+        models[dc_id] = model
+        dumps.setdefault((dc_id, bdata.data), bdata)
+    log.debug('extracted {} dive computer dumps, {} unique'
+            .format(len(data), len(dumps)))
+
+    dives = kf.pipe(chain.from_iterable(d[3] for d in data),
+        kd.sort_dives,
+        kd.uniq_dives)
+    dives = list(dives)
+    gases = (s.gas for d in dives for s in d.profile)
+    gases = [ku.create_gas(g) for g in _uniq_gases(gases)]
+
+    eq = chain.from_iterable(ku.create_dc_data(dc_id, model)
+        for dc_id, model in models.items())
+    dump = chain.from_iterable(
+        ku.create_dump_data(dc_id=dc_id, datetime=d.datetime, data=d.data)
+        for (dc_id, _), d in dumps.items())
+    dives = (ku.xml_raw(n) for n in ku.create_dives(dives))
+    doc = ku.create_uddf(equipment=eq, gases=gases, dives=dives, dump=dump)
+    ku.save(doc, fout)
+
+
+def _extract_job(args):
+    """
+    Extract dives from all dive computer dumps of UDDF file.
+
+    List of tuples is returned. A tuple consists of dive computer id,
+    dive computer model, dive computer dump data record and list of dives.
+
+    :Parameters:
+     args
+        Tuple of UDDF file and dive profile simplification tolerance.
+    """
+    fin, tolerance = args
+    data = []
+    for dump in _find_dumps(fin):
+        log.debug('dive computer dump data found in {}: {}, {}'
+                .format(fin, dump.dc_model, dump.datetime))
+        drv = _mem_dump(dump.dc_model)
+        model = drv.version(dump.data)
+        dc_id = ku.gen_id(model)
+
+        bdata = kd.BinaryData(datetime=dump.datetime, data=dump.data)
+        dives = kf.pipe(drv.dives(bdata), kd.sort_dives, kd.uniq_dives)
+        if tolerance is not None:
+            dives = kd.decimate_dives(dives, tolerance)
+        dives = [d._replace(equipment=(dc_id,)) for d in dives]
+        data.append((dc_id, model, bdata, dives))
+    return data
+
+
+def _executor(jobs):
+    """
+    Create pool of processes used to convert dive computer data.
+
+    Dive computer driver modules are imported by each pool process, so
+    the drivers are registered regardless of process start method.
+
+    :Parameters:
+     jobs
+        Amount of processes, `None` for number of processors.
+    """
+    from kenozooid.driver import DataParser
+    modules = sorted(set(cls.__module__ for cls in kc.query(DataParser)))
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_init_job,
+        initargs=(modules,))
+
+
+def _init_job(modules):
+    """
+    Initialize pool process by importing dive computer driver modules.
+
+    :Parameters:
+     modules
+        Names of dive computer driver modules.
+    """
+    for m in modules:
+        importlib.import_module(m)
+
+
+def _find_dumps(fin):
+    """
+    Find dive computer dump data in UDDF file.
+
+    List of dive computer dump data records is returned.
+
+    :Parameters:
+     fin
+        UDDF file with dive computer raw data.
+    """
+    xp_dc = ku.XPath('//uddf:divecomputerdump')
+    return [ku.dump_data(n) for n in xp_dc(et.parse(fin))]
 
 
 def _mem_dump(name, port=None):
@@ -117,7 +505,8 @@ def _mem_dump(name, port=None):
     return drv
 
 
-def _save_dives(drv, time, data, fout):
+def _save_dives(drv, time, data, fout, jobs=None, fingerprint=None,
+        tolerance=None):
     """
     Convert raw dive computer data into UDDF format and store it in output
     file.
@@ -131,6 +520,14 @@ def _save_dives(drv, time, data, fout):
         Raw dive computer data.
      fout
         Output file.
+     jobs
+        Amount of processes used to parse dive data.
+     fingerprint
+        If specified, only dives newer than the dive identified by the
+        fingerprint are stored.
+     tolerance
+        If specified, dive profiles are simplified with the tolerance in
+        meters.
     """
     model = drv.version(data)
     dc_id = ku.gen_id(model)
@@ -142,74 +539,122 @@ def _save_dives(drv, time, data, fout):
     eq = ku.create_dc_data(dc_id, model)
     dump = ku.create_dump_data(dc_id=dc_id, datetime=time, data=data)
 
-    p = kc.params(drv.__class__)
-    if 'gas' in p['data']:
-        log.debug('gas data pipeline')
-        with kf.buffer_open(2) as (f_g, f_d):
-
-            # store gas and dives in two separate files,
-            # then merge the data into one UDDF file
-            save = kf.sink(partial(ku.save, fout=fout))
-            m = kf.concat(2, partial(cat_gd, equipment=eq, dump=dump), save)
-            kf.send(
-                kf.pipe(drv.dives(bdata),
-                    kd.sort_dives,
-                    kd.uniq_dives),
-                kf.split(
-                    extract_gases(uniq_gases(kf.buffer(f_g, m))),
-                    create_dives(kf.buffer(f_d, m), equipment=(dc_id,))
-                )
-            )
-
+    kw = {} if fingerprint is None else {'fingerprint': fingerprint}
+    p = kc.params(drv.__class__)['data']
+    gases = None
+    found = None
+
+    if 'index' in p:
+        # sort dive keys, then parse dives one by one, so only one dive
+        # is kept in memory
+        log.debug('dive keys pipeline')
+        keys = kf.pipe(drv.dive_keys(bdata, **kw),
+            kd.sort_dives,
+            kd.uniq_dives)
+        keys = list(keys)
+        dives = drv.dives(bdata, jobs=jobs, keys=keys)
+        if 'gas' in p:
+            # collect gas mixes while dives are decoded, the dives are
+            # spooled until all gas mixes are found
+            found = []
+            dives = (_dive_gases(d, found) for d in dives)
+    else:
+        log.debug('dives pipeline')
+        dives = kf.pipe(drv.dives(bdata, jobs=jobs, **kw),
+            kd.sort_dives,
+            kd.uniq_dives)
+        if 'gas' in p:
+            dives = list(dives)
+            gases = (s.gas for d in dives for s in d.profile)
+
+    # gas mixes definitions precede dives in UDDF file, so collect the
+    # gas mixes first
+    if gases is not None:
+        gases = [ku.create_gas(g) for g in _uniq_gases(gases)]
+        log.debug('found {} gas mixes'.format(len(gases)))
+
+    if tolerance is not None:
+        log.debug('dive profile simplification, tolerance {}m'
+            .format(tolerance))
+        dives = kd.decimate_dives(dives, tolerance)
+
+    # repetition group requires at least one dive, i.e. there might be no
+    # new dives for incremental backup
+    dives = iter(dives)
+    first = next(dives, None)
+    if first is None:
+        log.info('no dives found, storing dive computer data only')
+        dives = None
     else:
-        log.debug('simple data pipeline')
-        dives = kf.pipe(drv.dives(bdata),
-                kd.sort_dives,
-                kd.uniq_dives,
-                partial(ku.create_dives, equipment=(dc_id,)))
-        ku.save(ku.create_uddf(equipment=eq, dives=dives, dump=dump), fout)
+        # render each dive upfront to avoid passing its xml data through
+        # the whole document tree
+        dives = ku.create_dives(chain((first,), dives), equipment=(dc_id,))
+        if found is None:
+            dives = (ku.xml_raw(n) for n in dives)
+        else:
+            dives = _spool(dives)
 
-#
-# fixme: put the functions/coroutines below into proper modules
-#
-@kf.coroutine
-def create_dives(tg, equipment=None):
-    while True:
-        dive = yield
-        n = ku.create_dive(dive, equipment=equipment)
-        tg.send(n)
-
-@kf.coroutine
-def extract_gases(tc):
-    while True:
-        dive = yield
-        for s in dive.profile:
-            if s.gas is not None:
-                tc.send(s.gas)
-
-@kf.coroutine
-def uniq_gases(tc):
-    gases = set()
-    while True:
-        gas = yield
-        if gas not in gases:
-            gases.add(gas)
-            n = ku.create_gas(gas)
-            tc.send(n)
-
-def cat_gd(fg, fd, equipment=None, dump=None):
-    xfg = xfd = None
-    fg.seek(0)
-    fd.seek(0)
-    if len(fg.read(1)) > 0:
-        xfg = ku.xml_file_copy(fg)
-    if len(fd.read(1)) > 0:
-        xfd = ku.xml_file_copy(fd)
-    fg.seek(0)
-    fd.seek(0)
-    return ku.create_uddf(equipment=equipment,
-            dump=dump,
-            gases=xfg,
-            dives=xfd)
+    if found is not None:
+        gases = [ku.create_gas(g) for g in _uniq_gases(found)]
+        log.debug('found {} gas mixes'.format(len(gases)))
+
+    doc = ku.create_uddf(equipment=eq, gases=gases, dives=dives, dump=dump)
+    ku.save(doc, fout)
+
+
+def _dive_gases(dive, gases):
+    """
+    Collect gas mixes of a dive.
+
+    The dive is returned.
+
+    :Parameters:
+     dive
+        Dive data record.
+     gases
+        List of gas mixes, the gas mixes of the dive are appended to it.
+    """
+    gases.extend(s.gas for s in dive.profile if s.gas is not None)
+    return dive
+
+
+def _spool(nodes):
+    """
+    Render XML nodes into temporary file.
+
+    The nodes are consumed and iterator of raw XML data chunks read from
+    the temporary file is returned, so the XML data is not kept in
+    memory.
+
+    :Parameters:
+     nodes
+        Iterable of XML nodes.
+    """
+    f = tempfile.TemporaryFile('w+', encoding='utf-8')
+    for n in nodes:
+        f.writelines(n)
+    f.seek(0)
+
+    def chunks():
+        with f:
+            yield from (RawString(s)
+                for s in iter(partial(f.read, SPOOL_CHUNK), ''))
+
+    return chunks()
+
+
+def _uniq_gases(gases):
+    """
+    Remove duplicated and null gas mixes from iterator of gas mixes.
+
+    :Parameters:
+     gases
+        Iterator of gas mixes.
+    """
+    found = set()
+    for gas in gases:
+        if gas is not None and gas not in found:
+            found.add(gas)
+            yield gas
 
 # vim: sw=4:et:ai
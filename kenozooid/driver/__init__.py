@@ -24,6 +24,7 @@ used in diving.
 The module specifies set of interfaces to be implemented by device drivers.
 """
 
+import asyncio
 import logging
 
 import kenozooid.component as kc
@@ -119,7 +120,7 @@ class DataParser(object):
         Get raw data from dive computer.
         """
 
-    def dives(self, data):
+    def dives(self, data, jobs=None, keys=None):
         """
         Parse dive data from raw data.
         
@@ -128,10 +129,36 @@ class DataParser(object):
         :Parameters:
          data
             Raw dive computer data.
+         jobs
+            Amount of processes used to parse dive data, `None` to parse
+            dive data in current process. A driver might ignore the
+            parameter.
+         keys
+            If specified, parse dives identified by the dive keys in
+            order of the keys (see `dive_keys`).
         """
 
 
-    def gases(self, data):
+    def dive_keys(self, data):
+        """
+        Get keys of dives from raw data.
+
+        Iterator of dive key records (`kenozooid.data.DiveKey`) is
+        returned. A dive key contains dive date and time and driver
+        specific key, i.e. dive data offset, identifying a dive in raw
+        data. The dive data is not parsed, so the dive keys can be sorted
+        cheaply and the dives can be parsed one by one later.
+
+        The method is optional and a driver implementing it declares
+        ``index`` data capability.
+
+        :Parameters:
+         data
+            Raw dive computer data.
+        """
+
+
+    def gases(self, data, keys=None):
         """
         Get list of gases per dive.
 
@@ -141,6 +168,9 @@ class DataParser(object):
         :Parameters:
          data
             Raw dive computer data.
+         keys
+            If specified, get gases of dives identified by the dive keys
+            (see `dive_keys`).
         """
 
 
@@ -154,6 +184,23 @@ class DataParser(object):
         """
 
 
+class AsyncDataParser(object):
+    """
+    Asynchronous diving computer data dump interface.
+
+    Driver implementing the interface downloads raw data from dive
+    computer without blocking asyncio event loop, so data of several dive
+    computers can be downloaded at once. The raw data is parsed with
+    `DataParser` interface implementation of the driver.
+    """
+    driver = None
+
+    async def dump(self):
+        """
+        Get raw data from dive computer.
+        """
+
+
 class DeviceError(BaseException):
     """
     Device communication error.
@@ -208,4 +255,24 @@ def find_driver(iface, query, port=None):
         return None
 
 
+async def find_driver_async(iface, query, port=None):
+    """
+    Find device driver implementing an interface without blocking asyncio
+    event loop.
+
+    Scanning for connected devices is blocking, so it is performed in the
+    default executor of the event loop. See `find_driver` for details.
+
+    :Parameters:
+     iface
+        Interface of functionality.
+     query
+        Device driver id or device model string.
+     port
+        Device port (i.e. /dev/ttyUSB0, COM1).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, find_driver, iface, query, port)
+
+
 # vim: sw=4:et:ai
@@ -27,18 +27,23 @@ protocol can be found at address
 
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from serial import Serial, SerialException
-from binascii import hexlify
+from binascii import hexlify, unhexlify
 from functools import partial
+from math import isnan
 from operator import attrgetter
+import asyncio
 import logging
+import time
 
 log = logging.getLogger('kenozooid.driver.ostc')
 
 import kenozooid.uddf as ku
 import kenozooid.component as kc
-from kenozooid.driver import DeviceDriver, Simulator, DataParser, DeviceError
+from kenozooid.driver import DeviceDriver, Simulator, DataParser, \
+    AsyncDataParser, DeviceError
 from kenozooid.units import C2K, B2Pa
 from . import parser as ostc_parser
 import kenozooid.data as kd
@@ -46,6 +51,20 @@ import kenozooid.data as kd
 GAS_GETTERS = {i: attrgetter('gas{}_o2'.format(i), 'gas{}_he'.format(i))
         for i in range(1, 7)}
 
+# amount of dives sent to a process at once when decoding dives with pool
+# of processes
+DIVE_CHUNK = 8
+
+# size of OSTC memory dump ('a' command output) and size of additional
+# data sent by firmware 1.91 or newer
+LEN_DUMP = 33034
+LEN_DUMP_EXT = 32768
+
+# amount of bytes read from serial port at once and maximum amount of
+# consecutive serial port read timeouts
+READ_CHUNK = 1024
+READ_RETRIES = 3
+
 def pressure(depth):
     """
     Convert depth in meters to pressure in mBars.
@@ -53,15 +72,133 @@ def pressure(depth):
     return int(depth + 10)
 
 
+def _dive_time(header):
+    """
+    Get date and time of the end of a dive from OSTC dive header.
+
+    :Parameters:
+     header
+        OSTC dive header.
+    """
+    return header.year, header.month, header.day, header.hour, header.minute
+
+
+def _dive_start(header):
+    """
+    Get date and time of the start of a dive from OSTC dive header.
+
+    :Parameters:
+     header
+        OSTC dive header.
+    """
+    st = datetime(2000 + header.year, header.month, header.day,
+            header.hour, header.minute)
+    # ostc dive computer saves time at the end of dive in its
+    # memory, so substract the dive time;
+    # sampling amount is substracted as well as below (0, 0)
+    # waypoint is added
+    return st - _dive_duration(header)
+
+
+def _dive_duration(header):
+    """
+    Get duration of a dive from OSTC dive header.
+
+    Sampling amount is added due to (0, 0) waypoint injection.
+
+    :Parameters:
+     header
+        OSTC dive header.
+    """
+    return timedelta(minutes=header.dive_time_m,
+            seconds=header.dive_time_s + header.sampling)
+
+
+def _parse_dive(data):
+    """
+    Convert OSTC dive header and dive profile block into dive data record
+    in a pool process.
+
+    :Parameters:
+     data
+        Tuple of dive header block and dive profile block.
+    """
+    return OSTCDataParser()._dive(*data)
+
+
+def _dump_size(status):
+    """
+    Get size of OSTC memory dump data from OSTC status block.
+
+    :Parameters:
+     status
+        OSTC status block data.
+    """
+    status = ostc_parser.get_data(status)
+    size = LEN_DUMP
+    if (status.ver1, status.ver2) >= (1, 91):
+        log.debug('detected ostc firmware >= 1.91, reading additional data')
+        size += LEN_DUMP_EXT
+    return size
+
+
+def _log_metrics(metrics):
+    """
+    Log OSTC serial port data transfer metrics.
+    """
+    log.debug('read {} byte(s) in {:.1f}s ({:.0f} B/s), {} chunk(s),'
+        ' {} retries'.format(metrics.bytes, metrics.time, metrics.rate,
+        metrics.chunks, metrics.retries))
+
+
+class ReadMetrics(object):
+    """
+    OSTC serial port data transfer metrics.
+
+    :var size: Expected amount of data [B].
+    :var bytes: Amount of data read so far [B].
+    :var chunks: Amount of serial port reads.
+    :var retries: Amount of serial port read timeouts.
+    :var time: Time of data transfer [s].
+    """
+    def __init__(self, size):
+        self.size = size
+        self.bytes = 0
+        self.chunks = 0
+        self.retries = 0
+        self.time = 0
+
+
+    @property
+    def rate(self):
+        """
+        Data transfer rate [B/s].
+        """
+        return self.bytes / self.time if self.time > 0 else 0
+
+
 @kc.inject(DeviceDriver, id='ostc', name='OSTC Driver',
         models=('OSTC', 'OSTC Mk.2', 'OSTC 2N'))
 class OSTCDriver(object):
     """
     OSTC dive computer driver.
+
+    The data is read from serial port in chunks. The progress of data
+    transfer is reported with a callback, which receives transfer
+    metrics as parameter.
+
+    :var chunk: Amount of bytes read from serial port at once.
+    :var progress: Data transfer progress callback, see `ReadMetrics`.
+    :var metrics: Metrics of last data transfer, see `ReadMetrics`.
     """
-    def __init__(self, port):
+    metrics = None
+
+    def __init__(self, port, chunk=READ_CHUNK, progress=None):
         super(OSTCDriver, self).__init__()
 
+        self.chunk = chunk
+        self.progress = progress
+
         self._device = Serial(port=port,
                 baudrate=115200,
                 bytesize=8,
@@ -76,14 +213,48 @@ class OSTCDriver(object):
         log.debug('returned after command {}'.format(cmd))
 
 
-    def _read(self, size):
+    def _read(self, size, metrics=None):
+        """
+        Read data from serial port in chunks.
+
+        Device error is raised if there is no data after `READ_RETRIES`
+        consecutive serial port read timeouts.
+
+        :Parameters:
+         size
+            Amount of bytes to read.
+         metrics
+            Data transfer metrics to update, new metrics by default.
+        """
         assert size > 0
         log.debug('reading {} byte(s)'.format(size))
-        data = self._device.read(size)
+
+        if metrics is None:
+            metrics = self.metrics = ReadMetrics(size)
+
+        data = bytearray()
+        retries = 0
+        while len(data) < size:
+            t = time.perf_counter()
+            chunk = self._device.read(min(self.chunk, size - len(data)))
+            metrics.time += time.perf_counter() - t
+            metrics.chunks += 1
+
+            if len(chunk) < min(self.chunk, size - len(data)):
+                metrics.retries += 1
+                retries = 0 if chunk else retries + 1
+                log.debug('serial port read timeout, got {} of {} byte(s)' \
+                    .format(len(data) + len(chunk), size))
+                if retries == READ_RETRIES:
+                    raise DeviceError('Device communication error')
+
+            data.extend(chunk)
+            metrics.bytes += len(chunk)
+            if self.progress is not None:
+                self.progress(metrics)
+
         log.debug('got {} byte(s) of data'.format(len(data)))
-        if len(data) != size:
-            raise DeviceError('Device communication error')
-        return data
+        return bytes(data)
 
 
     @staticmethod
@@ -145,7 +316,94 @@ class OSTCSimulator(object):
 
 
 
-@kc.inject(DataParser, id='ostc', data=('gas',))
+@kc.inject(AsyncDataParser, id='ostc')
+class OSTCAsyncDataParser(object):
+    """
+    Asynchronous OSTC dive computer data dump adapter of OSTC driver.
+
+    The data is read from serial port when asyncio event loop reports the
+    port is readable. If the serial port has no file descriptor, then the
+    data is read by OSTC driver in the default executor of the event loop.
+    """
+    async def dump(self):
+        """
+        Download OSTC status and all dive profiles.
+
+        See :py:meth:`OSTCDataParser.dump` for details.
+        """
+        drv = self.driver
+        drv._write(b'a')
+
+        metrics = drv.metrics = ReadMetrics(LEN_DUMP)
+        status = await self._read(ostc_parser.LEN_STATUS, metrics)
+        metrics.size = _dump_size(status)
+
+        data = status + await self._read(metrics.size - len(status), metrics)
+        _log_metrics(metrics)
+        return data
+
+
+    async def _read(self, size, metrics):
+        """
+        Read data from serial port in chunks without blocking asyncio event
+        loop.
+
+        See :py:meth:`OSTCDriver._read` for details.
+
+        :Parameters:
+         size
+            Amount of bytes to read.
+         metrics
+            Data transfer metrics to update.
+        """
+        drv = self.driver
+        dev = drv._device
+        loop = asyncio.get_running_loop()
+        if not hasattr(dev, 'fileno'):
+            return await loop.run_in_executor(None, drv._read, size, metrics)
+
+        log.debug('reading {} byte(s) asynchronously'.format(size))
+        readable = asyncio.Event()
+        fd = dev.fileno()
+        loop.add_reader(fd, readable.set)
+        try:
+            data = bytearray()
+            retries = 0
+            t = time.perf_counter()
+            while len(data) < size:
+                try:
+                    await asyncio.wait_for(readable.wait(), dev.timeout)
+                except asyncio.TimeoutError:
+                    metrics.retries += 1
+                    retries += 1
+                    log.debug('serial port read timeout, got {} of {}'
+                        ' byte(s)'.format(len(data), size))
+                    if retries == READ_RETRIES:
+                        raise DeviceError('Device communication error')
+                    continue
+                finally:
+                    metrics.time += time.perf_counter() - t
+                    t = time.perf_counter()
+
+                readable.clear()
+                n = min(drv.chunk, size - len(data), max(dev.in_waiting, 1))
+                chunk = dev.read(n)
+                metrics.chunks += 1
+                retries = 0
+
+                data.extend(chunk)
+                metrics.bytes += len(chunk)
+                if drv.progress is not None:
+                    drv.progress(metrics)
+        finally:
+            loop.remove_reader(fd)
+
+        log.debug('got {} byte(s) of data'.format(len(data)))
+        return bytes(data)
+
+
+
+@kc.inject(DataParser, id='ostc', data=('gas', 'fingerprint', 'index'))
 class OSTCDataParser(object):
     """
     OSTC dive computer data parser.
@@ -153,95 +411,249 @@ class OSTCDataParser(object):
     def dump(self):
         """
         Download OSTC status and all dive profiles.
+
+        The status is parsed as soon as it is received, so the amount of
+        data sent by OSTC dive computer is known before the dive profiles
+        are read.
         """
-        self.driver._write(b'a')
-        data = self.driver._read(33034)
-        status = ostc_parser.get_data(data)
-        if (status.ver1, status.ver2) >= (1, 91):
-            log.debug('detected ostc firmware >= 1.91, reading additional data')
-            data += self.driver._read(32768)
+        drv = self.driver
+        drv._write(b'a')
+
+        metrics = drv.metrics = ReadMetrics(LEN_DUMP)
+        status = drv._read(ostc_parser.LEN_STATUS, metrics)
+        metrics.size = _dump_size(status)
+
+        data = status + drv._read(metrics.size - len(status), metrics)
+        _log_metrics(metrics)
         return data
 
 
-    def dives(self, dump):
+    def dives(self, dump, jobs=None, fingerprint=None, keys=None):
         """
         Convert dive data into UDDF format.
+
+        If amount of jobs is specified, then dive profiles are decoded
+        with a pool of processes. The order of dives is preserved.
+
+        If dive fingerprint is specified, then only dives newer than the
+        dive identified by the fingerprint are converted.
+
+        If dive keys are specified, then the dives identified by the keys
+        are converted in order of the keys.
+
+        :Parameters:
+         dump
+            OSTC binary data.
+         jobs
+            Amount of processes, `None` to decode dives in current process.
+         fingerprint
+            Dive fingerprint, see :py:meth:`OSTCDataParser.fingerprint`.
+         keys
+            Dive keys, see :py:meth:`OSTCDataParser.dive_keys`.
         """
-        ostc_data = ostc_parser.get_data(dump.data)
+        if keys is None:
+            profiles = self._profiles(dump, fingerprint)
+        else:
+            profiles = (k.key for k in keys)
+        if jobs is not None and jobs > 1:
+            log.debug('decoding dives with {} processes'.format(jobs))
+            profiles = ((bytes(h), bytes(p)) for h, p in profiles)
+            with ProcessPoolExecutor(max_workers=jobs) as e:
+                dives = e.map(_parse_dive, profiles, chunksize=DIVE_CHUNK)
+                yield from (d for d in dives if d is not None)
+        else:
+            dives = (self._dive(h, p) for h, p in profiles)
+            yield from (d for d in dives if d is not None)
+
+
+    def dive_keys(self, dump, fingerprint=None):
+        """
+        Get keys of dives from OSTC binary data.
 
-        for h, p in ostc_parser.profiles(ostc_data.profiles):
-            log.debug('header: {}'.format(hexlify(h)))
-            log.debug('profile: {}'.format(hexlify(p)))
+        The key of a dive is tuple of dive header and dive profile blocks,
+        which are views of the binary data.
 
-            header = ostc_parser.header(h)
-            dive_data = ostc_parser.dive_data(header, p)
-
-            # set time of the start of dive
-            st = datetime(2000 + header.year, header.month, header.day,
-                    header.hour, header.minute)
-            # ostc dive computer saves time at the end of dive in its
-            # memory, so substract the dive time;
-            # sampling amount is substracted as well as below (0, 0)
-            # waypoint is added
-            duration = timedelta(minutes=header.dive_time_m,
-                    seconds=header.dive_time_s + header.sampling)
-            st -= duration
-
-            # firmware ver < 1.91 has no average depth information
-            avg_depth = header.avg_depth / 100.0 \
-                    if hasattr(header, 'avg_depth') else None
-
-            # firmware ver < 1.91 has no deco type information
-            dive_mode = None
-            if hasattr(header, 'deco_type'):
-                if header.deco_type in (0, 4):
-                    dive_mode = 'opencircuit'
-                elif header.deco_type in (2, 5):
-                    dive_mode = 'closedcircuit'
-                elif header.doc_type == 3:
-                    dive_mode = 'apnoe'
+        :Parameters:
+         dump
+            OSTC binary data.
+         fingerprint
+            Dive fingerprint, see :py:meth:`OSTCDataParser.fingerprint`.
+        """
+        for h, p in self._profiles(dump, fingerprint):
+            st = _dive_start(ostc_parser.header(h))
+            yield kd.DiveKey(datetime=st, key=(h, p))
+
+
+    def gases(self, dump, keys=None):
+        """
+        Get gas mixes used by OSTC dives.
+
+        The dive profile blocks are parsed into columns (see
+        :py:func:`kenozooid.driver.ostc.parser.dive_columns`), but dive
+        samples are not created. If a dive is invalid, then empty tuple is
+        returned for the dive.
+
+        :Parameters:
+         dump
+            OSTC binary data.
+         keys
+            Dive keys, see :py:meth:`OSTCDataParser.dive_keys`.
+        """
+        if keys is None:
+            profiles = self._profiles(dump)
+        else:
+            profiles = (k.key for k in keys)
 
+        for h, p in profiles:
+            header = ostc_parser.header(h)
             try:
-                profile = list(self._get_profile(header, dive_data))
-                yield kd.Dive(datetime=st,
-                    depth=header.max_depth / 100.0,
-                    duration=duration.seconds,
-                    temp=C2K(header.min_temp / 10.0),
-                    avg_depth=avg_depth,
-                    mode=dive_mode,
-                    profile=profile)
-            except ValueError as ex:
-                log.error('invalid dive {0.year:>02d}-{0.month:>02d}-{0.day:>02d}' \
-                    ' {0.hour:>02d}:{0.minute:>02d}' \
-                    ' max depth={0.max_depth}'.format(header))
+                columns = ostc_parser.dive_columns(header, p)
+                gases = [self._get_gas(header, header.gas)]
+                samples = zip(columns.current_gas.tolist(),
+                    columns.gas_set_o2.tolist(), columns.gas_set_he.tolist())
+                for gas_no, o2, he in samples:
+                    gas = self._sample_gas(header, gas_no, o2, he)
+                    if gas is not None:
+                        gases.append(gas)
+                yield tuple(gases)
+            except ValueError:
+                yield ()
+
+
+    def fingerprint(self, data):
+        """
+        Get OSTC serial number and fingerprint of the newest dive from raw
+        data.
+
+        The fingerprint is hex encoded header of the newest dive or `None`
+        if there are no dives.
+
+        :Parameters:
+         data
+            OSTC raw data.
+        """
+        status = ostc_parser.get_data(data)
+        headers = (h for h, p in
+            ostc_parser.ring_profiles(data, ostc_parser.LEN_STATUS))
+        h = max(headers, key=lambda h: _dive_time(ostc_parser.header(h)),
+            default=None)
+        fp = None if h is None else hexlify(h).decode()
+        return status.eeprom.serial, fp
+
 
+    def _profiles(self, dump, fingerprint=None):
+        """
+        Get iterator of dive header and dive profile blocks from OSTC
+        binary data.
+
+        The profile data is split with
+        :py:func:`kenozooid.driver.ostc.parser.ring_profiles`, so a dive
+        wrapped around end of OSTC profile ring buffer is found as well.
+        The blocks are views of the binary data, except the blocks of the
+        wrapped dive.
+
+        :Parameters:
+         dump
+            OSTC binary data.
+         fingerprint
+            Dive fingerprint, if specified only dives newer than the dive
+            identified by the fingerprint are returned.
+        """
+        profiles = ostc_parser.ring_profiles(dump.data,
+            ostc_parser.LEN_STATUS)
+        if fingerprint is not None:
+            t = _dive_time(ostc_parser.header(unhexlify(fingerprint)))
+            log.debug('skipping dives older than {}'.format(t))
+            profiles = ((h, p) for h, p in profiles
+                if _dive_time(ostc_parser.header(h)) > t)
+        return profiles
+
+
+    def _dive(self, h, p):
+        """
+        Convert OSTC dive header and dive profile block into dive data
+        record.
+
+        If a dive is invalid, then error is logged and `None` returned.
 
-    def _get_profile(self, header, dive_data):
+        :Parameters:
+         h
+            Dive header block.
+         p
+            Dive profile block.
         """
-        Parse OSTC dive samples.
+        log.debug('header: {}'.format(hexlify(h)))
+        log.debug('profile: {}'.format(hexlify(p)))
+
+        header = ostc_parser.header(h)
+
+        # set time of the start of dive
+        st = _dive_start(header)
+        duration = _dive_duration(header)
+
+        # firmware ver < 1.91 has no average depth information
+        avg_depth = header.avg_depth / 100.0 \
+                if hasattr(header, 'avg_depth') else None
+
+        # firmware ver < 1.91 has no deco type information
+        dive_mode = None
+        if hasattr(header, 'deco_type'):
+            if header.deco_type in (0, 4):
+                dive_mode = 'opencircuit'
+            elif header.deco_type in (2, 5):
+                dive_mode = 'closedcircuit'
+            elif header.doc_type == 3:
+                dive_mode = 'apnoe'
+
+        try:
+            columns = ostc_parser.dive_columns(header, p)
+            profile = list(self._get_profile(header, columns))
+            return kd.Dive(datetime=st,
+                depth=header.max_depth / 100.0,
+                duration=duration.seconds,
+                temp=C2K(header.min_temp / 10.0),
+                avg_depth=avg_depth,
+                mode=dive_mode,
+                profile=profile)
+        except ValueError as ex:
+            log.error('invalid dive {0.year:>02d}-{0.month:>02d}-{0.day:>02d}' \
+                ' {0.hour:>02d}:{0.minute:>02d}' \
+                ' max depth={0.max_depth}'.format(header))
+
+
+    def _get_profile(self, header, columns):
+        """
+        Create OSTC dive samples from dive columns.
+
+        Missing values of dive columns are NaN or -1, see
+        :py:func:`kenozooid.driver.ostc.parser.dive_columns`.
+
+        :Parameters:
+         header
+            Dive header information.
+         columns
+            Dive columns record.
         """
         # ostc starts dive below at a depth, so add (0, 0) sample
         yield kd.Sample(depth=0.0, time=0, gas=self._get_gas(header, header.gas))
 
-        for i, sample in enumerate(dive_data, 1):
-            temp = C2K(sample.temp) if sample.temp else None
+        samples = zip(*(c.tolist() for c in columns))
+        for i, sample in enumerate(samples, 1):
+            depth, alarm, o2, he, gas_no, setpoint, temp, deco_depth, \
+                deco_time = sample
+
+            temp = C2K(temp) if temp and not isnan(temp) else None
 
-            setpoint = B2Pa(sample.setpoint / 100.0) if sample.setpoint else None
+            setpoint = B2Pa(setpoint / 100.0) if setpoint > 0 else None
 
             # deco info
-            deco_time = sample.deco_time * 60.0 if sample.deco_depth else None
-            deco_depth = sample.deco_depth if sample.deco_depth else None
-            deco_alarm = False
-            if sample.alarm is not None:
-                deco_alarm = sample.alarm in (2, 3)
-
-            gas = None
-            if sample.current_gas is not None:
-                gas = self._get_gas(header, sample.current_gas)
-            elif sample.gas_set_o2 is not None:
-                gas = kd.gas(sample.gas_set_o2, sample.gas_set_he)
-
-            yield kd.Sample(depth=sample.depth,
+            deco_time = deco_time * 60.0 if deco_depth > 0 else None
+            deco_depth = deco_depth if deco_depth > 0 else None
+            deco_alarm = alarm in (2, 3)
+
+            gas = self._sample_gas(header, gas_no, o2, he)
+
+            yield kd.Sample(depth=depth,
                     time=(i * header.sampling),
                     alarm=('deco',) if deco_alarm else None,
                     temp=temp,
@@ -254,6 +666,30 @@ class OSTCDataParser(object):
         yield kd.Sample(depth=0.0, time=(i + 1) * header.sampling)
 
 
+    def _sample_gas(self, header, gas_no, o2, he):
+        """
+        Get gas mix switched to at OSTC dive sample.
+
+        If there is no gas switch, then `None` is returned.
+
+        :Parameters:
+         header
+            Dive header information.
+         gas_no
+            Gas mix number switched to, -1 if none.
+         o2
+            O2 percentage of gas mix set, -1 if none.
+         he
+            Helium percentage of gas mix set, -1 if none.
+        """
+        gas = None
+        if gas_no >= 0:
+            gas = self._get_gas(header, gas_no)
+        elif o2 >= 0:
+            gas = kd.gas(o2, he)
+        return gas
+
+
     def _get_gas(self, header, gas_no):
         """
         Get gas information from OSTC dive header.
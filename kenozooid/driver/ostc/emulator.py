@@ -0,0 +1,218 @@
+#
+# Kenozooid - dive planning and analysis toolbox.
+#
+# Copyright (C) 2009-2017 by Artur Wroblewski <wrobell@riseup.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+OSTC dive computer emulator.
+
+The emulator serves OSTC driver commands over pseudo-terminal, so OSTC
+driver can be used without dive computer, i.e.::
+
+    with OSTCEmulator(data, baudrate=115200) as dev:
+        kenozooid.dc.backup('ostc', dev.port, 'backup.uddf')
+
+The following commands are supported
+
+ a
+    Send memory dump data.
+ e
+    Send firmware version and (empty) fingerprint.
+ c
+    Start dive simulation, the depth data is recorded until simulation is
+    stopped.
+
+The memory dump data can be sent with limited data transfer rate and with
+injected errors (data transfer stall, drop of connection and data
+corruption).
+"""
+
+import os
+import select
+import threading
+import time
+import tty
+import logging
+
+import kenozooid.uddf as ku
+from . import parser as ostc_parser
+
+log = logging.getLogger('kenozooid.driver.ostc.emulator')
+
+# amount of bytes written to pseudo-terminal at once
+WRITE_CHUNK = 256
+
+# time of waiting for pseudo-terminal events before checking if emulator
+# is stopped [s]
+POLL_TIMEOUT = 0.1
+
+def load_dump(fn):
+    """
+    Load OSTC memory dump data from UDDF file.
+
+    :Parameters:
+     fn
+        UDDF file name.
+    """
+    node = next(ku.find(fn, '//uddf:dcdump'))
+    return ku._dump_decode(node.text)
+
+
+class OSTCEmulator(threading.Thread):
+    """
+    OSTC dive computer emulator.
+
+    The data transfer rate is limited by baud rate (8N1, 10 bits per
+    byte).
+
+    :var data: Memory dump data sent with 'a' command.
+    :var port: Pseudo-terminal device name to be used with OSTC driver.
+    :var baudrate: Baud rate of data transfer, `None` for no limit.
+    :var stall: Tuple of data position and time of data transfer stall.
+    :var drop: Data position at which the data transfer stops.
+    :var corrupt: Positions of data bytes to be corrupted.
+    :var commands: List of received commands.
+    :var depths: Depths received during dive simulation.
+    """
+    def __init__(self, data, baudrate=None, stall=None, drop=None,
+            corrupt=()):
+        super(OSTCEmulator, self).__init__(daemon=True)
+        self.data = data
+        self.baudrate = baudrate
+        self.stall = stall
+        self.drop = drop
+        self.corrupt = corrupt
+        self.commands = []
+        self.depths = []
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._done = threading.Event()
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+    def stop(self):
+        """
+        Stop the emulator and close the pseudo-terminal.
+        """
+        self._done.set()
+        if self.is_alive():
+            self.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+
+    def run(self):
+        """
+        Receive and execute OSTC driver commands.
+        """
+        log.debug('ostc emulator started at port {}'.format(self.port))
+        while True:
+            cmd = self._recv()
+            if cmd is None:
+                break
+
+            self.commands.append(cmd)
+            log.debug('ostc emulator received command {}'.format(cmd))
+            if cmd == b'a':
+                self._send_dump()
+            elif cmd == b'e':
+                status = ostc_parser.get_data(self.data)
+                self._send(bytes((status.ver1, status.ver2)) + bytes(16))
+            elif cmd == b'c':
+                self._simulate()
+            else:
+                log.debug('ostc emulator ignores command {}'.format(cmd))
+        log.debug('ostc emulator stopped')
+
+
+    def _simulate(self):
+        """
+        Record dive simulation depths until simulation is stopped.
+        """
+        while True:
+            cmd = self._recv()
+            if cmd is None or cmd == b'\x00':
+                break
+            self.depths.append(cmd[0] - 10)
+
+
+    def _send_dump(self):
+        """
+        Send memory dump data with limited transfer rate and injected
+        errors.
+        """
+        data = bytearray(self.data)
+        for k in self.corrupt:
+            data[k] ^= 0xff
+        if self.drop is not None:
+            del data[self.drop:]
+
+        if self.stall is None:
+            self._send(data)
+        else:
+            k, t = self.stall
+            self._send(data[:k])
+            self._done.wait(t)
+            self._send(data[k:])
+
+
+    def _recv(self):
+        """
+        Receive one byte from OSTC driver.
+
+        If the emulator is stopped, then `None` is returned.
+        """
+        while not self._done.is_set():
+            r, _, _ = select.select([self._master], [], [], POLL_TIMEOUT)
+            if r:
+                return os.read(self._master, 1)
+        return None
+
+
+    def _send(self, data):
+        """
+        Send data to OSTC driver with limited data transfer rate.
+
+        If the emulator is stopped, then sending is interrupted.
+        """
+        data = memoryview(data)
+        rate = None if self.baudrate is None else self.baudrate / 10
+        start = time.perf_counter()
+        k = 0
+        while k < len(data) and not self._done.is_set():
+            _, w, _ = select.select([], [self._master], [], POLL_TIMEOUT)
+            if not w:
+                continue
+
+            k += os.write(self._master, data[k:k + WRITE_CHUNK])
+            if rate is not None:
+                delay = start + k / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+
+# vim: sw=4:et:ai
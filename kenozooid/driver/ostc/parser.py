@@ -24,8 +24,9 @@ OSTC dive computer binary data parsing routines.
 import logging
 import re
 from collections import namedtuple
-from struct import unpack, calcsize
+from struct import Struct, unpack, calcsize
 from binascii import hexlify
+from math import gcd
 
 log = logging.getLogger('kenozooid.driver.ostc')
 
@@ -45,6 +46,26 @@ RE_PROFILES = re.compile(b'(\xfa\xfa' \
         b'(\x20.{42}|\x21.{52})\xfb\xfb)' \
         b'(.+?\xfd\xfd)', re.DOTALL)
 
+# profile data markers and length of dive header for each header type,
+# see RE_PROFILES
+PROFILE_START = b'\xfa\xfa'
+PROFILE_HEADER_END = b'\xfb\xfb'
+PROFILE_END = b'\xfd\xfd'
+PROFILE_HEADER_LEN = {0x20: 47, 0x21: 57}
+
+# end of last dive in profile ring buffer
+PROFILE_EOP = b'\xfd\xfd\xfe'
+
+# profile data markers search; unlike bytes.find, regular expressions
+# search memoryview objects without copying them
+RE_PROFILE_START = re.compile(re.escape(PROFILE_START))
+RE_PROFILE_END = re.compile(re.escape(PROFILE_END))
+RE_PROFILE_EOP = re.compile(re.escape(PROFILE_EOP))
+
+# size of profile data chunk searched at once, when searching for the
+# last profile data marker
+RFIND_CHUNK = 1024
+
 # dive profile header
 DiveHeader = namedtuple('DiveHeader', """\
 version month day year hour minute max_depth dive_time_m dive_time_s
@@ -66,13 +87,27 @@ FMT_DIVE_HEADER_191 = FMT_DIVE_HEADER + 'HH' 'BB' 'BBBB'
 DiveSample = namedtuple('DiveSample', 'depth alarm gas_set_o2 gas_set_he'
     ' current_gas setpoint temp deco_depth deco_time gf ppo2 cns')
 
+# dive profile data block columns, see dive_columns
+DiveColumns = namedtuple('DiveColumns', 'depth alarm gas_set_o2 gas_set_he'
+    ' current_gas setpoint temp deco_depth deco_time')
+
+# dive profile sample depth and profile flag byte, and sample temperature
+S_SAMPLE = Struct('<HB')
+S_TEMP = Struct('<H')
+
+# dive header divisors in order of sample data
+DIVISORS = ('div_temp', 'div_deco', 'div_gf', 'div_ppo2', 'div_deco_debug',
+    'div_cns')
+
 
 def get_data(data):
     """
     Get status information and profile raw data, see `Data` named tuple.
+
+    The profile raw data is a view of the input data.
     """
     dump = Data(*unpack(FMT_STATUS, data[:LEN_STATUS]),
-            profiles=data[LEN_STATUS:])
+            profiles=memoryview(data)[LEN_STATUS:])
     eeprom = EEPROMData(*unpack(FMT_EEPROM, dump.eeprom))
     dump = dump._replace(eeprom=eeprom)
     log.debug('unpacked status dump, voltage {}, version {}.{}, serial {}' \
@@ -80,10 +115,16 @@ def get_data(data):
     return dump
 
 
-def profiles(data):
+def profiles(data, start=0, end=None):
     """
-    Split profile data into individual dive profiles using profile
-    regular expression `RE_PROFILES`.
+    Split profile data into individual dive profiles.
+
+    The profile data is searched for profile markers in the same way as
+    profile regular expression `RE_PROFILES` does. Search can be limited to
+    profile data between start and end positions, i.e. to split profile
+    data of OSTC raw data without copying it::
+
+        profiles(data, LEN_STATUS)
 
     Collection of tuples (header, block) is returned
 
@@ -92,8 +133,150 @@ def profiles(data):
      block 
         dive profile block data
 
+    The header and block are views of the profile data. If the profile
+    data is a view, then the header and block are views of the data
+    referenced by the view.
+
+    :Parameters:
+     data
+        Profile data or OSTC raw data.
+     start
+        Start position of profile data.
+     end
+        End position of profile data.
+    """
+    view = memoryview(data)
+    end = len(data) if end is None else end
+    return ((view[k:i], view[i:j]) for k, i, j in _split(data, start, end))
+
+
+def ring_profiles(data, start=0, end=None):
+    """
+    Split profile ring buffer data into individual dive profiles.
+
+    OSTC stores dive profiles in circular buffer, where end of last dive
+    is marked with `PROFILE_EOP` marker. The marker is searched from the
+    end of the buffer as OSTC usually sends the newest dive last. The dive
+    profiles are returned from the oldest one and the search stops at the
+    newest dive. A dive profile wrapped around end of the buffer is
+    returned as well.
+
+    If there is no end of last dive marker, then all dive profiles found
+    with `profiles` function are returned.
+
+    The header and block of a dive profile wrapped around end of the
+    buffer are views of a copy of the dive profile data. The header and
+    block of other dive profiles are views of the profile data.
+
+    See `profiles` function for parameters and returned values.
     """
-    return ((h, p) for h, _, p in RE_PROFILES.findall(data))
+    view = memoryview(data)
+    end = len(data) if end is None else end
+
+    eop = _rfind(RE_PROFILE_EOP, data, start, end)
+    if eop == -1:
+        yield from profiles(data, start, end)
+        return
+    eop += 2
+
+    # the oldest dives are after the newest one
+    last = eop + 1
+    for k, i, j in _split(data, last, end):
+        yield view[k:i], view[i:j]
+        last = j
+
+    # find dive wrapped around end of the buffer; only the wrapped dive
+    # is copied
+    n = _find(RE_PROFILE_END, data, start, eop)
+    pos = start
+    if n != -1:
+        tail = bytes(view[last:end]) + bytes(view[start:n + 2])
+        size = end - last
+        for k, i, j in _split(tail, 0, len(tail)):
+            if k < size < j:
+                yield memoryview(tail)[k:i], memoryview(tail)[i:j]
+                pos = start + j - size
+
+    for k, i, j in _split(data, pos, eop):
+        yield view[k:i], view[i:j]
+
+
+def _split(data, start, end):
+    """
+    Find positions of dive profiles in profile data.
+
+    Iterator of tuples (header start, block start, block end) is returned.
+
+    :Parameters:
+     data
+        Profile data.
+     start
+        Start position of profile data.
+     end
+        End position of profile data.
+    """
+    k = _find(RE_PROFILE_START, data, start, end)
+    while k != -1:
+        i = -1
+        if k + 2 < end:
+            n = PROFILE_HEADER_LEN.get(data[k + 2])
+            if n is not None and k + n <= end \
+                    and data[k + n - 2:k + n] == PROFILE_HEADER_END:
+                i = k + n
+
+        if i == -1:
+            k = _find(RE_PROFILE_START, data, k + 1, end)
+            continue
+
+        # at least one byte of profile block is expected
+        j = _find(RE_PROFILE_END, data, i + 1, end)
+        if j == -1:
+            break
+        j += 2
+
+        yield k, i, j
+        k = _find(RE_PROFILE_START, data, j, end)
+
+
+def _find(regex, data, start, end):
+    """
+    Find position of profile data marker or -1 if marker is not found.
+
+    :Parameters:
+     regex
+        Regular expression of profile data marker.
+     data
+        Profile data.
+     start
+        Start position of search.
+     end
+        End position of search.
+    """
+    m = regex.search(data, start, end)
+    return -1 if m is None else m.start()
+
+
+def _rfind(regex, data, start, end):
+    """
+    Find position of last profile data marker or -1 if marker is not
+    found.
+
+    The profile data is searched in chunks from its end, so the search
+    stops at the chunk containing the marker.
+
+    See `_find` function for parameters description.
+    """
+    size = len(regex.pattern)
+    while end > start:
+        k = max(start, end - RFIND_CHUNK)
+        found = [m.start() for m in regex.finditer(data, k, end)]
+        if found:
+            return found[-1]
+        if k == start:
+            break
+        # markers crossing chunk boundary are found in next chunk
+        end = k + size - 1
+    return -1
 
 
 def header(data):
@@ -120,32 +303,44 @@ def header(data):
 def dive_data(header, data):
     """
     Parse OSTC dive profile data block.
-    """
-    div_temp_s, div_temp_c = divisor(header.div_temp)
-    div_deco_s, div_deco_c = divisor(header.div_deco)
-    div_gf_s, div_gf_c = divisor(header.div_gf)
-    div_ppo2_s, div_ppo2_c = divisor(header.div_ppo2)
-    div_deco_debug_s, div_deco_debug_c = divisor(header.div_deco_debug)
-    div_cns_s, div_cns_c = divisor(header.div_cns)
 
-    log.debug('header divisor values {:x} {:x} {:x} {:x} {:x} {:x}'
-        .format(header.div_temp, header.div_deco, header.div_gf,
-            header.div_ppo2, header.div_deco_debug, header.div_cns))
+    The data block can be `bytes` or `memoryview` object.
 
+    :Parameters:
+     header
+        Dive profile header.
+     data
+        Dive profile block data.
+
+    .. seealso:: :py:func:`sample_layout`
+    """
+    debug = log.isEnabledFor(logging.DEBUG)
+    if debug:
+        log.debug('header divisor values {:x} {:x} {:x} {:x} {:x} {:x}'
+            .format(header.div_temp, header.div_deco, header.div_gf,
+                header.div_ppo2, header.div_deco_debug, header.div_cns))
+
+    layout = sample_layout(header)
     dive_total_time = header.dive_time_m * 60 + header.dive_time_s
+    sampling = header.sampling
+    unpack_sample = S_SAMPLE.unpack_from
+    unpack_temp = S_TEMP.unpack_from
 
+    n = len(data) - 2 # skip profile block data end
     i = 0
-    j = 1 # sample number 
-    while i < len(data) - 2: # skip profile block data end
-        depth = unpack('<H', data[i:i + 2])[0] / 100.0
-        i += 2
+    j = 1 # sample number
+    while i < n:
+        depth, pfb = unpack_sample(data, i)
+        depth /= 100.0
+        i += 3
 
         # size is count of bytes after profile byte
-        pfb = data[i]
-        i += 1
-        size, event = flag_byte(pfb)
-        log.debug('sample {} info: depth = {:.2f}, pfb = {:x}, size = {}, ' \
-            'data: {}'.format(j, depth, pfb, size, hexlify(data[i:i + size])))
+        size = pfb & 0x7f
+        event = pfb >> 7
+        if debug:
+            log.debug('sample {} info: depth = {:.2f}, pfb = {:x}, size = {},'
+                ' data: {}'.format(j, depth, pfb, size,
+                    hexlify(data[i:i + size])))
 
         alarm = None
         gas_set = 0
@@ -164,9 +359,10 @@ def dive_data(header, data):
             gas_change = v & 0x20
             setpoint_change = v & 0x40
 
-            log.debug('alarm = {}, gas_set = {}, gas_change = {},' \
-                ' setpoint_change = {}'.format(alarm, gas_set, gas_change,
-                    setpoint_change))
+            if debug:
+                log.debug('alarm = {}, gas_set = {}, gas_change = {},' \
+                    ' setpoint_change = {}'.format(alarm, gas_set,
+                        gas_change, setpoint_change))
 
             if gas_set:
                 gas_set_o2 = data[i]
@@ -179,54 +375,58 @@ def dive_data(header, data):
                 i += 1
                 gas_change = 1
 
-        div_bytes = 0
-
-        temp = sample_data(data, i, j, div_temp_s, div_temp_c)
-        if temp is not None:
-            assert len(temp) == div_temp_c == 2
-            temp = unpack('<H', temp)[0] / 10.0
-            i += div_temp_c
-            div_bytes += div_temp_c
-
-        deco = sample_data(data, i, j, div_deco_s, div_deco_c)
-        if deco is not None:
-            assert len(deco) == div_deco_c
-            deco_depth, deco_time = deco
-            i += div_deco_c
-            div_bytes += div_deco_c
-            log.debug('deco time {}, depth {}'.format(deco_time, deco_depth))
-        else:
-            deco_depth, deco_time = None, None
-
-        gf = sample_data(data, i, j, div_gf_s, div_gf_c)
-        if gf is not None:
-            i += div_gf_c
-            div_bytes += div_gf_c
-
-        ppo2 = sample_data(data, i, j, div_ppo2_s, div_ppo2_c)
-        if ppo2 is not None:
-            i += div_ppo2_c
-            div_bytes += div_ppo2_c
-            log.debug('ppo2 {}'.format(hexlify(ppo2)))
-
-        deco_debug = sample_data(data, i, j, div_deco_debug_s, div_deco_debug_c)
-        if deco_debug is not None:
-            i += div_deco_debug_c
-            div_bytes += div_deco_debug_c
-            log.debug('deco debug {}'.format(hexlify(deco_debug)))
-
-        cns = sample_data(data, i, j, div_cns_s, div_cns_c)
-        if cns is not None:
-            i += div_cns_c
-            div_bytes += div_cns_c
-            log.debug('cns {}'.format(hexlify(cns)))
+        temp_c, deco_c, gf_c, ppo2_c, deco_debug_c, cns_c, div_bytes \
+            = layout(j)
+
+        temp = None
+        if temp_c is not None:
+            if temp_c != 2:
+                raise ValueError('Unsupported size of temperature sample: {}'
+                    .format(temp_c))
+            temp = unpack_temp(data, i)[0] / 10.0
+            i += temp_c
+
+        deco_depth, deco_time = None, None
+        if deco_c is not None:
+            deco_depth, deco_time = data[i:i + deco_c]
+            i += deco_c
+            if debug:
+                log.debug('deco time {}, depth {}'.format(deco_time,
+                    deco_depth))
+
+        gf = None
+        if gf_c is not None:
+            gf = bytes(data[i:i + gf_c])
+            i += gf_c
+
+        ppo2 = None
+        if ppo2_c is not None:
+            ppo2 = bytes(data[i:i + ppo2_c])
+            i += ppo2_c
+            if debug:
+                log.debug('ppo2 {}'.format(hexlify(ppo2)))
+
+        deco_debug = None
+        if deco_debug_c is not None:
+            deco_debug = bytes(data[i:i + deco_debug_c])
+            i += deco_debug_c
+            if debug:
+                log.debug('deco debug {}'.format(hexlify(deco_debug)))
+
+        cns = None
+        if cns_c is not None:
+            cns = bytes(data[i:i + cns_c])
+            i += cns_c
+            if debug:
+                log.debug('cns {}'.format(hexlify(cns)))
 
         if setpoint_change:
             setpoint = data[i]
             i += 1
             setpoint_change = 1
-            log.debug('setpoint change {}'.format(setpoint))
-            
+            if debug:
+                log.debug('setpoint change {}'.format(setpoint))
+
         if size != event + gas_set + gas_change + setpoint_change + div_bytes:
             log.debug('invalid dive data, sample = {}, depth = {:.2f},' \
                 ' pfb = {:x}, size = {}, event = {}, alarm = {}, temp = {},' \
@@ -240,10 +440,10 @@ def dive_data(header, data):
             raise ValueError('Invalid dive')
 
         # is a sample within dive total time? if not, then skip sample
-        if header.sampling * (j - 1) <= dive_total_time:
+        if sampling * (j - 1) <= dive_total_time:
             yield DiveSample(depth, alarm, gas_set_o2, gas_set_he, current_gas,
                     setpoint, temp, deco_depth, deco_time, gf, ppo2, cns)
-        else:
+        elif debug:
             log.debug('skipped sample {} (out of dive time), seek {}'
                 .format(j, i))
         j += 1
@@ -251,6 +451,168 @@ def dive_data(header, data):
     assert data[i:i + 2] == b'\xfd\xfd'
 
 
+def dive_columns(header, data):
+    """
+    Parse OSTC dive profile data block into columns (struct of arrays).
+
+    Offsets of samples are found by scanning profile flag bytes. Then,
+    the sample items are extracted for all samples at once with NumPy
+    indexing. If size of temperature or deco sample item is not two bytes,
+    then the data block is parsed with :py:func:`dive_data` function.
+
+    Dive columns record (:py:class:`DiveColumns`) is returned. Temperature
+    column is an array of floats with NaN for missing values. Alarm, gas
+    mix, setpoint and deco columns are arrays of 16-bit integers with -1
+    for missing values. Gradient factor, ppO2 and CNS data is not parsed.
+
+    NumPy module is required.
+
+    :Parameters:
+     header
+        Dive profile header.
+     data
+        Dive profile block data.
+
+    .. seealso:: :py:func:`dive_data`
+    """
+    import numpy as np
+
+    divs = [divisor(getattr(header, name)) for name in DIVISORS]
+    (temp_s, temp_c), (deco_s, deco_c) = divs[:2]
+    if temp_s and temp_c != 2 or deco_s and deco_c != 2:
+        log.debug('unsupported sample layout, parsing samples one by one')
+        return _dive_columns(dive_data(header, data))
+
+    # find samples offsets using profile flag bytes
+    offsets = []
+    n = len(data) - 2 # skip profile block data end
+    i = 0
+    while i < n:
+        if i + 2 >= n:
+            raise ValueError('Invalid dive')
+        offsets.append(i)
+        i += 3 + (data[i + 2] & 0x7f)
+
+    # pad the data, so no index is out of range for invalid data block
+    buff = np.frombuffer(data, dtype=np.uint8)
+    buff = np.concatenate((buff, np.zeros(2048, dtype=np.uint8)))
+    value = lambda pos: buff[pos].astype(np.int16)
+    value16 = lambda pos: buff[pos] + buff[pos + 1].astype(np.uint16) * 256
+    item = lambda present, pos: np.where(present, value(pos), -1) \
+        .astype(np.int16)
+
+    k = np.arange(1, len(offsets) + 1) # sample numbers
+    pos = np.array(offsets, dtype=np.int64)
+    depth = value16(pos) / 100.0
+
+    pfb = buff[pos + 2]
+    size = pfb & 0x7f
+    event = pfb >> 7
+    pos += 3
+
+    # parse event byte information
+    ev = np.where(event, value(pos), 0)
+    alarm = np.where(event, ev & 0x0f, -1).astype(np.int16)
+    gas_set = (ev & 0x10) > 0
+    gas_change = (ev & 0x20) > 0
+    setpoint_change = (ev & 0x40) > 0
+    pos += event
+
+    gas_set_o2 = item(gas_set, pos)
+    gas_set_he = item(gas_set, pos + 1)
+    pos += 2 * gas_set
+    current_gas = item(gas_change, pos)
+    pos += gas_change
+
+    # parse divisors data
+    div_bytes = np.zeros(len(k), dtype=np.int64)
+    present = [k % s == 0 if s else np.zeros(len(k), dtype=bool)
+        for s, c in divs]
+    temp = np.where(present[0], value16(pos) / 10.0, np.nan)
+    deco_depth = item(present[1], pos + 2 * present[0])
+    deco_time = item(present[1], pos + 2 * present[0] + 1)
+    for p, (s, c) in zip(present, divs):
+        pos += p * c
+        div_bytes += p * c
+
+    setpoint = item(setpoint_change, pos)
+
+    invalid = size != event + 2 * gas_set + gas_change + setpoint_change \
+        + div_bytes
+    if invalid.any():
+        log.debug('invalid dive data, sample = {}'
+            .format(np.flatnonzero(invalid)[0] + 1))
+        raise ValueError('Invalid dive')
+
+    assert data[i:i + 2] == b'\xfd\xfd'
+
+    # skip samples out of dive time
+    total_time = header.dive_time_m * 60 + header.dive_time_s
+    mask = header.sampling * (k - 1) <= total_time
+    return DiveColumns(*(c[mask] for c in (depth, alarm, gas_set_o2,
+        gas_set_he, current_gas, setpoint, temp, deco_depth, deco_time)))
+
+
+def _dive_columns(samples):
+    """
+    Convert OSTC dive samples into dive columns record.
+
+    :Parameters:
+     samples
+        Collection of dive samples.
+
+    .. seealso:: :py:func:`dive_columns`
+    """
+    import numpy as np
+
+    samples = list(samples)
+    column = lambda name, dtype, na: np.array(
+        [na if v is None else v for v in (getattr(s, name) for s in samples)],
+        dtype=dtype)
+    columns = (column(name, np.int16, -1) for name in DiveColumns._fields)
+    return DiveColumns(*columns)._replace(
+        depth=column('depth', float, np.nan),
+        temp=column('temp', float, np.nan))
+
+
+def sample_layout(header):
+    """
+    Create dive profile sample layout function using dive header divisors.
+
+    The function returns tuple of data byte counts of temperature, deco,
+    gradient factor, ppO2, deco debug and CNS sample items, and the total
+    of the byte counts for a sample number (starts from 1). The byte count
+    is `None` if a sample item is not stored in a sample.
+
+    The layout repeats every `n` samples, where `n` is least common
+    multiple of divisors sampling information, so it is computed once for
+    each sample number modulo `n`.
+
+    :Parameters:
+     header
+        Dive profile header.
+
+    .. seealso:: :py:func:`divisor`
+    """
+    divs = [divisor(getattr(header, name)) for name in DIVISORS]
+
+    n = 1
+    for s, _ in divs:
+        if s:
+            n = n * s // gcd(n, s)
+
+    cache = {}
+    def layout(sample):
+        k = sample % n
+        v = cache.get(k)
+        if v is None:
+            v = tuple(c if s and k % s == 0 else None for s, c in divs)
+            v = cache[k] = v + (sum(c for c in v if c is not None),)
+        return v
+
+    return layout
+
+
 def sample_data(data, i, sample, div_sample, div_count):
     """
     Parse sample item like temperature, deco, etc.
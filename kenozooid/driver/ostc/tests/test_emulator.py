@@ -0,0 +1,120 @@
+#
+# Kenozooid - dive planning and analysis toolbox.
+#
+# Copyright (C) 2009-2017 by Artur Wroblewski <wrobell@riseup.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+OSTC dive computer emulator tests.
+"""
+
+import time
+import unittest
+
+from kenozooid.driver.ostc import OSTCDriver, OSTCDataParser, OSTCSimulator
+from kenozooid.driver.ostc.emulator import OSTCEmulator
+
+from . import data as od
+
+
+class EmulatorTestCase(unittest.TestCase):
+    """
+    OSTC dive computer emulator tests.
+    """
+    def connect(self, **params):
+        """
+        Start OSTC dive computer emulator and connect OSTC driver to it.
+        """
+        dev = OSTCEmulator(od.RAW_DATA_OSTC_MK2_196, **params)
+        dev.start()
+        self.addCleanup(dev.stop)
+
+        drv = OSTCDriver(dev.port)
+        self.addCleanup(drv._device.close)
+        return dev, drv
+
+
+    def dump(self, drv):
+        """
+        Download OSTC memory dump with OSTC driver.
+        """
+        dc = OSTCDataParser()
+        dc.driver = drv
+        return dc.dump()
+
+
+    def test_version(self):
+        """
+        Test OSTC dive computer emulator version command
+        """
+        dev, drv = self.connect()
+        self.assertEqual('OSTC 1.96', drv.version())
+        self.assertEqual([b'e'], dev.commands)
+
+
+    def test_simulation(self):
+        """
+        Test OSTC dive computer emulator dive simulation
+        """
+        dev, drv = self.connect()
+        sim = OSTCSimulator()
+        sim.driver = drv
+        sim.start()
+        sim.depth(5)
+        sim.depth(12)
+        sim.stop()
+
+        # check version to wait for the end of simulation
+        drv.version()
+        self.assertEqual([b'c', b'e'], dev.commands)
+        self.assertEqual([5, 12], dev.depths)
+
+
+    def test_dump(self):
+        """
+        Test OSTC dive computer emulator memory dump command
+        """
+        dev, drv = self.connect()
+        self.assertEqual(od.RAW_DATA_OSTC_MK2_196, self.dump(drv))
+
+
+    def test_dump_baudrate(self):
+        """
+        Test OSTC dive computer emulator data transfer rate limit
+        """
+        dev, drv = self.connect(baudrate=2000000)
+        t = time.perf_counter()
+        data = self.dump(drv)
+        t = time.perf_counter() - t
+
+        self.assertEqual(od.RAW_DATA_OSTC_MK2_196, data)
+        self.assertTrue(t >= 65802 / 200000, t)
+
+
+    def test_dump_corrupt(self):
+        """
+        Test OSTC dive computer emulator data corruption
+        """
+        dev, drv = self.connect(corrupt=(1000, 2000))
+        data = self.dump(drv)
+
+        expected = bytearray(od.RAW_DATA_OSTC_MK2_196)
+        expected[1000] ^= 0xff
+        expected[2000] ^= 0xff
+        self.assertEqual(expected, data)
+
+
+# vim: sw=4:et:ai
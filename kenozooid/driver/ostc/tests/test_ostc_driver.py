@@ -22,13 +22,18 @@ OSTC driver tests.
 """
 
 from collections import namedtuple
+import asyncio
 from datetime import datetime
+import time
 import unittest
 from unittest import mock
 
 import kenozooid.data as kd
 import kenozooid.driver.ostc.parser as ostc_parser
-from kenozooid.driver.ostc import pressure, OSTCDataParser
+from kenozooid.driver import DeviceError
+from kenozooid.driver.ostc import pressure, OSTCDriver, OSTCDataParser, \
+    OSTCAsyncDataParser
+from kenozooid.driver.ostc.emulator import OSTCEmulator
 
 from . import data as od
 
@@ -81,6 +86,21 @@ class DataModelTestCase(unittest.TestCase):
         self.assertTrue(dive.mode is None)
 
 
+    def test_conversion_columns(self):
+        """
+        Test OSTC data to data model conversion with dive columns
+        """
+        dump = kd.BinaryData(datetime=datetime.now(), data=od.RAW_DATA_OSTC)
+        dc = OSTCDataParser()
+        with mock.patch.object(ostc_parser, 'dive_columns',
+                    wraps=ostc_parser.dive_columns) as f, \
+                mock.patch.object(ostc_parser, 'dive_data') as fd:
+            dives = list(dc.dives(dump))
+            self.assertEquals(5, f.call_count)
+            self.assertFalse(fd.called)
+        self.assertEquals(self.dives, dives)
+
+
     def test_dive_mode(self):
         """
         Test OSTC dive mode parsing
@@ -227,6 +247,140 @@ class DataModelTestCase(unittest.TestCase):
 
 
 
+class ParallelDataParserTestCase(unittest.TestCase):
+    """
+    OSTC dive data parsing with pool of processes tests.
+    """
+    def setUp(self):
+        """
+        Create OSTC dump data and parse the dives in current process.
+        """
+        self.dump = kd.BinaryData(datetime=datetime.now(),
+                data=od.RAW_DATA_OSTC_MK2_196)
+        self.dc = OSTCDataParser()
+        self.dives = list(self.dc.dives(self.dump))
+
+
+    def test_dives_jobs(self):
+        """
+        Test OSTC dive data parsing with pool of processes
+        """
+        dives = list(self.dc.dives(self.dump, jobs=2))
+        self.assertEquals(8, len(dives))
+        self.assertEquals(self.dives, dives)
+
+
+
+class FingerprintTestCase(unittest.TestCase):
+    """
+    OSTC dive fingerprint tests.
+    """
+    def test_fingerprint(self):
+        """
+        Test OSTC serial number and newest dive fingerprint
+        """
+        dc = OSTCDataParser()
+        serial, fp = dc.fingerprint(od.RAW_DATA_OSTC)
+        self.assertEquals(155, serial)
+
+        h, p = list(ostc_parser.profiles(od.RAW_DATA_OSTC))[-1]
+        self.assertEquals(h.hex(), fp)
+
+
+    def test_dives_fingerprint(self):
+        """
+        Test converting OSTC dives newer than a fingerprint
+        """
+        dump = kd.BinaryData(datetime=datetime.now(),
+                data=od.RAW_DATA_OSTC)
+        dc = OSTCDataParser()
+        dives = list(dc.dives(dump))
+
+        h, p = list(ostc_parser.profiles(od.RAW_DATA_OSTC))[2]
+        result = list(dc.dives(dump, fingerprint=h.hex()))
+        self.assertEquals(dives[3:], result)
+
+        serial, fp = dc.fingerprint(od.RAW_DATA_OSTC)
+        self.assertEquals([], list(dc.dives(dump, fingerprint=fp)))
+
+
+
+class DiveKeysTestCase(unittest.TestCase):
+    """
+    OSTC dive keys tests.
+    """
+    def test_dive_keys(self):
+        """
+        Test OSTC dive keys
+        """
+        dump = kd.BinaryData(datetime=datetime.now(),
+                data=od.RAW_DATA_OSTC)
+        dc = OSTCDataParser()
+        dives = list(dc.dives(dump))
+        keys = list(dc.dive_keys(dump))
+        self.assertEquals([d.datetime for d in dives],
+            [k.datetime for k in keys])
+
+        keys.reverse()
+        self.assertEquals(dives[::-1], list(dc.dives(dump, keys=keys)))
+
+
+    def test_dive_keys_fingerprint(self):
+        """
+        Test OSTC dive keys of dives newer than a fingerprint
+        """
+        dump = kd.BinaryData(datetime=datetime.now(),
+                data=od.RAW_DATA_OSTC)
+        dc = OSTCDataParser()
+        h, p = list(ostc_parser.profiles(od.RAW_DATA_OSTC))[2]
+        keys = list(dc.dive_keys(dump, fingerprint=h.hex()))
+        dives = list(dc.dives(dump, fingerprint=h.hex()))
+        self.assertEquals(dives, list(dc.dives(dump, keys=keys)))
+
+
+    def test_dive_keys_ring(self):
+        """
+        Test OSTC dive keys of dive wrapped around end of profile ring
+        buffer
+        """
+        data = od.RAW_DATA_OSTC_N2_191_HW
+        dump = kd.BinaryData(datetime=datetime.now(), data=data)
+        dc = OSTCDataParser()
+        dives = list(dc.dives(dump))
+        self.assertEquals(4, len(dives))
+
+        # rotate the ring buffer, so third dive wraps around end of the
+        # buffer
+        n = ostc_parser.LEN_STATUS
+        h, p = list(ostc_parser.profiles(data, n))[2]
+        k = data.find(p, n) + 10
+        data = data[:n] + data[k:] + data[n:k]
+        dump = kd.BinaryData(datetime=datetime.now(), data=data)
+
+        keys = list(dc.dive_keys(dump))
+        self.assertEquals([d.datetime for d in dives],
+            [k.datetime for k in keys])
+        self.assertEquals(dives, list(dc.dives(dump)))
+
+
+    def test_gases(self):
+        """
+        Test OSTC gas mixes of dives identified by dive keys
+        """
+        dump = kd.BinaryData(datetime=datetime.now(),
+                data=od.RAW_DATA_OSTC_MK2_196)
+        dc = OSTCDataParser()
+        keys = list(dc.dive_keys(dump))
+        dives = list(dc.dives(dump, keys=keys))
+        gases = list(dc.gases(dump, keys))
+
+        self.assertEquals(len(keys), len(gases))
+        for dive, g in zip(dives, gases):
+            expected = tuple(s.gas for s in dive.profile if s.gas is not None)
+            self.assertEquals(expected, g)
+
+
+
 class DataParserTestCase(unittest.TestCase):
     """
     OSTC data parser tests.
@@ -296,4 +450,163 @@ class DataParserTestCase(unittest.TestCase):
             self.assertEquals('OSTC 2C 2.01', ver)
 
 
+
+class SerialReadTestCase(unittest.TestCase):
+    """
+    OSTC driver serial port read tests using OSTC dive computer emulator.
+    """
+    def dump(self, data, chunk=1024, timeout=5, **errors):
+        """
+        Download data from OSTC dive computer emulator.
+        """
+        dev = OSTCEmulator(data, **errors)
+        dev.start()
+        self.addCleanup(dev.stop)
+
+        progress = []
+        drv = OSTCDriver(dev.port, chunk=chunk,
+            progress=lambda m: progress.append(m.bytes))
+        drv._device.timeout = timeout
+        self.addCleanup(drv._device.close)
+
+        dc = OSTCDataParser()
+        dc.driver = drv
+        data = dc.dump()
+        return data, drv.metrics, progress
+
+
+    def test_dump(self):
+        """
+        Test reading OSTC data in chunks
+        """
+        data, metrics, progress = self.dump(od.RAW_DATA_OSTC, chunk=4096)
+        self.assertEquals(od.RAW_DATA_OSTC, data)
+
+        self.assertEquals(33034, metrics.size)
+        self.assertEquals(33034, metrics.bytes)
+        self.assertEquals(0, metrics.retries)
+        self.assertEquals(9, metrics.chunks) # status + 8 chunks
+        self.assertTrue(metrics.rate > 0)
+
+        self.assertEquals(ostc_parser.LEN_STATUS, progress[0])
+        self.assertEquals(33034, progress[-1])
+        self.assertEquals(sorted(progress), progress)
+
+
+    def test_dump_ext(self):
+        """
+        Test reading OSTC data with firmware 1.91 additional data
+        """
+        data, metrics, progress = self.dump(od.RAW_DATA_OSTC_MK2_196)
+        self.assertEquals(od.RAW_DATA_OSTC_MK2_196, data)
+        self.assertEquals(65802, metrics.size)
+        self.assertEquals(65802, progress[-1])
+
+
+    def test_dump_timeout(self):
+        """
+        Test reading OSTC data with serial port read timeout
+        """
+        data, metrics, progress = self.dump(od.RAW_DATA_OSTC, timeout=0.1,
+            stall=(10000, 0.25))
+        self.assertEquals(od.RAW_DATA_OSTC, data)
+        self.assertTrue(metrics.retries > 0, metrics.retries)
+
+
+    def test_dump_error(self):
+        """
+        Test reading OSTC data from not responding device
+        """
+        with mock.patch('kenozooid.driver.ostc.READ_RETRIES', 2):
+            self.assertRaises(DeviceError, self.dump, od.RAW_DATA_OSTC,
+                timeout=0.1, drop=1000)
+
+
+
+class AsyncDumpTestCase(unittest.TestCase):
+    """
+    Asynchronous OSTC data dump tests using OSTC dive computer emulators.
+    """
+    def parser(self, data, timeout=5, **params):
+        """
+        Start OSTC dive computer emulator and create asynchronous OSTC data
+        parser connected to it.
+        """
+        dev = OSTCEmulator(data, **params)
+        dev.start()
+        self.addCleanup(dev.stop)
+
+        drv = OSTCDriver(dev.port)
+        drv._device.timeout = timeout
+        self.addCleanup(drv._device.close)
+
+        dc = OSTCAsyncDataParser()
+        dc.driver = drv
+        return dc
+
+
+    def test_dump(self):
+        """
+        Test asynchronous OSTC data dump
+        """
+        dc = self.parser(od.RAW_DATA_OSTC_MK2_196)
+        progress = []
+        dc.driver.progress = lambda m: progress.append(m.bytes)
+
+        data = asyncio.run(dc.dump())
+        self.assertEqual(od.RAW_DATA_OSTC_MK2_196, data)
+
+        metrics = dc.driver.metrics
+        self.assertEqual(65802, metrics.size)
+        self.assertEqual(65802, metrics.bytes)
+        self.assertEqual(0, metrics.retries)
+        self.assertEqual(65802, progress[-1])
+        self.assertEqual(sorted(progress), progress)
+
+
+    def test_dump_concurrent(self):
+        """
+        Test asynchronous OSTC data dump from two dive computers at once
+        """
+        dc1 = self.parser(od.RAW_DATA_OSTC_MK2_196, baudrate=250000)
+        dc2 = self.parser(od.RAW_DATA_OSTC, baudrate=250000)
+
+        # time of the first and the last data chunk received by each
+        # driver
+        times1, times2 = [], []
+        dc1.driver.progress = lambda m: times1.append(time.perf_counter())
+        dc2.driver.progress = lambda m: times2.append(time.perf_counter())
+
+        async def dump():
+            return await asyncio.gather(dc1.dump(), dc2.dump())
+
+        data1, data2 = asyncio.run(dump())
+
+        self.assertEqual(od.RAW_DATA_OSTC_MK2_196, data1)
+        self.assertEqual(od.RAW_DATA_OSTC, data2)
+
+        # the downloads overlap
+        self.assertTrue(times1[0] < times2[-1], (times1[0], times2[-1]))
+        self.assertTrue(times2[0] < times1[-1], (times2[0], times1[-1]))
+
+
+    def test_dump_timeout(self):
+        """
+        Test asynchronous OSTC data dump with serial port read timeout
+        """
+        dc = self.parser(od.RAW_DATA_OSTC, timeout=0.1, stall=(10000, 0.25))
+        data = asyncio.run(dc.dump())
+        self.assertEqual(od.RAW_DATA_OSTC, data)
+        self.assertTrue(dc.driver.metrics.retries > 0)
+
+
+    def test_dump_error(self):
+        """
+        Test asynchronous OSTC data dump from not responding device
+        """
+        dc = self.parser(od.RAW_DATA_OSTC, timeout=0.1, drop=1000)
+        with mock.patch('kenozooid.driver.ostc.READ_RETRIES', 2):
+            self.assertRaises(DeviceError, asyncio.run, dc.dump())
+
+
 # vim: sw=4:et:ai
@@ -117,6 +117,72 @@ class ParserTestCase(unittest.TestCase):
             self.assertEquals(b'\xfd\xfd', block[-2:])
 
 
+    def test_data_get_view(self):
+        """
+        Test OSTC data getting with views of raw data
+        """
+        data = od.RAW_DATA_OSTC_MK2_194
+        expected = [(h, p) for h, _, p in
+            ostc_parser.RE_PROFILES.findall(data[ostc_parser.LEN_STATUS:])]
+
+        profile = tuple(ostc_parser.profiles(data, ostc_parser.LEN_STATUS))
+        self.assertEquals(9, len(profile))
+        for (h, p), (eh, ep) in zip(profile, expected):
+            self.assertTrue(isinstance(h, memoryview))
+            self.assertTrue(isinstance(p, memoryview))
+            self.assertTrue(h.obj is data)
+            self.assertEquals(eh, h)
+            self.assertEquals(ep, p)
+
+
+    def test_data_get_memoryview(self):
+        """
+        Test OSTC data getting with view of raw data
+        """
+        data = od.RAW_DATA_OSTC_MK2_194
+        dump = ostc_parser.get_data(data)
+        expected = [(h, p) for h, _, p in
+            ostc_parser.RE_PROFILES.findall(data[ostc_parser.LEN_STATUS:])]
+
+        profile = tuple(ostc_parser.profiles(dump.profiles))
+        self.assertEquals(9, len(profile))
+        for (h, p), (eh, ep) in zip(profile, expected):
+            # views of raw data, the view of raw data is not copied
+            self.assertTrue(h.obj is data)
+            self.assertTrue(p.obj is data)
+            self.assertEquals(eh, h)
+            self.assertEquals(ep, p)
+
+
+    def test_data_get_ring(self):
+        """
+        Test OSTC data getting from profile ring buffer
+        """
+        dump = ostc_parser.get_data(od.RAW_DATA_OSTC_N2_191_HW)
+        data = dump.profiles.tobytes()
+        expected = [(bytes(h), bytes(p)) for h, p in
+            ostc_parser.profiles(data)]
+        self.assertEquals(4, len(expected))
+
+        profile = ostc_parser.ring_profiles(data)
+        self.assertEquals(expected, [(bytes(h), bytes(p)) for h, p in profile])
+
+        # rotate the ring buffer, so third dive wraps around end of the
+        # buffer
+        k = data.find(expected[2][1])
+        data = data[k + 10:] + data[:k + 10]
+        self.assertEquals(3, len(tuple(ostc_parser.profiles(data))))
+
+        profile = ostc_parser.ring_profiles(data)
+        self.assertEquals(expected, [(bytes(h), bytes(p)) for h, p in profile])
+
+        # the view of ring buffer is not copied, except the wrapped dive
+        profile = list(ostc_parser.ring_profiles(memoryview(data)))
+        self.assertEquals(expected, [(bytes(h), bytes(p)) for h, p in profile])
+        self.assertEquals([True, True, False, True],
+            [h.obj is data for h, p in profile])
+
+
     def test_dive_profile_header_parsing(self):
         """
         Test dive profile header parsing (< 1.91)
@@ -247,6 +313,86 @@ class ParserTestCase(unittest.TestCase):
         self.assertEquals(1, dive[23].deco_time)
 
 
+    def test_dive_profile_block_memoryview(self):
+        """
+        Test dive profile data block parsing using memoryview
+        """
+        dump = ostc_parser.get_data(od.RAW_DATA_OSTC)
+        h, p = next(ostc_parser.profiles(dump.profiles))
+        header = ostc_parser.header(h)
+
+        dive = tuple(ostc_parser.dive_data(header, p))
+        self.assertEquals(dive,
+            tuple(ostc_parser.dive_data(header, memoryview(p))))
+
+
+    def test_dive_columns(self):
+        """
+        Test dive profile data block parsing into columns
+        """
+        import numpy as np
+
+        for raw in (od.RAW_DATA_OSTC, od.RAW_DATA_OSTC_MK2_194):
+            dump = ostc_parser.get_data(raw)
+            for h, p in ostc_parser.profiles(dump.profiles):
+                header = ostc_parser.header(h)
+                try:
+                    dive = tuple(ostc_parser.dive_data(header, p))
+                except ValueError:
+                    self.assertRaises(ValueError, ostc_parser.dive_columns,
+                        header, p)
+                    continue
+                columns = ostc_parser.dive_columns(header, p)
+
+                self.assertEquals(len(dive), len(columns.depth))
+                self.assertEquals([s.depth for s in dive], list(columns.depth))
+                self.assertEquals([-1 if s.current_gas is None
+                    else s.current_gas for s in dive],
+                    list(columns.current_gas))
+                self.assertTrue(np.array_equal([np.nan if s.temp is None
+                    else s.temp for s in dive], columns.temp, equal_nan=True))
+                self.assertEquals([-1 if s.deco_time is None
+                    else s.deco_time for s in dive], list(columns.deco_time))
+
+
+    def test_dive_columns_invalid(self):
+        """
+        Test parsing invalid profile into columns
+        """
+        data = tuple(ostc_parser.profiles(ku._dump_decode(od.DATA_OSTC_BROKEN)))
+        h, p = data[30]
+        header = ostc_parser.header(h)
+        self.assertRaises(ValueError, ostc_parser.dive_columns, header, p)
+
+
+    def test_sample_layout(self):
+        """
+        Test dive profile sample layout
+        """
+        dump = ostc_parser.get_data(od.RAW_DATA_OSTC)
+        h, p = next(ostc_parser.profiles(dump.profiles))
+        header = ostc_parser.header(h)._replace(div_temp=0x26, div_deco=0x24,
+            div_gf=0, div_ppo2=0x30, div_deco_debug=0, div_cns=0x03)
+        layout = ostc_parser.sample_layout(header)
+
+        self.assertEquals((None,) * 6 + (0,), layout(1))
+        self.assertEquals((None, None, None, None, None, 0, 0), layout(3))
+        self.assertEquals((None, 2) + (None,) * 4 + (2,), layout(4))
+        self.assertEquals((2, None, None, None, None, 0, 2), layout(6))
+        self.assertEquals((2, 2, None, None, None, 0, 4), layout(12))
+        self.assertEquals(layout(12), layout(24))
+
+
+    def test_sample_layout_invalid_temp(self):
+        """
+        Test parsing dive profile with unsupported temperature sample size
+        """
+        dump = ostc_parser.get_data(od.RAW_DATA_OSTC)
+        h, p = next(ostc_parser.profiles(dump.profiles))
+        header = ostc_parser.header(h)._replace(div_temp=0x31)
+        self.assertRaises(ValueError, list, ostc_parser.dive_data(header, p))
+
+
     def test_sample_data_parsing(self):
         """
         Test sample data parsing
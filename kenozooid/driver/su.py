@@ -29,16 +29,17 @@ Tested with libdivecomputer version: 781f0db71f7a06591e819f7960dd5b504b4f16a0.
 
 import ctypes as ct
 from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 from dateutil.parser import parse as dparse
 from struct import unpack, pack
 from collections import namedtuple
 from lxml import etree as et
-from functools import partial
+from functools import partial, lru_cache
 from queue import Queue, Full, Empty
 from concurrent.futures import ThreadPoolExecutor
+import threading
 import time
-import operator
 
 import logging
 log = logging.getLogger('kenozooid.driver.su')
@@ -49,6 +50,9 @@ import kenozooid.component as kc
 from kenozooid.driver import DeviceDriver, DataParser, DeviceError
 from kenozooid.units import C2K
 
+# libdivecomputer library name, see libdc
+LIBDC = 'libdivecomputer.so.0'
+
 SIZE_MEM_USER = 16384
 SIZE_MEM_DATA = 2080768
 SIZE_MEM_HANDSHAKE = 24
@@ -68,6 +72,8 @@ DiveHeader = namedtuple('DiveHeader', 'time interval threshold'
     ' endcount averaging')
 # 4 bytes of padding, it is start of the header (0x00000000)
 FMT_DIVE_HEADER = '<4xL4H'
+SIZE_DIVE_HEADER = 16
+SIZE_SAMPLE = 4
 
 #
 # libdivecomputer data structures and constants
@@ -126,12 +132,133 @@ class SampleValue(ct.Union):
     ]
 
 
+# amount of dives passed at once from dive extraction thread to dives
+# iterator and maximum amount of dive batches waiting in the queue
+DIVE_BATCH = 8
+QUEUE_SIZE = 4
+
+# time of waiting for free queue slot before dive extraction is stopped
+# [s]
+QUEUE_TIMEOUT = 30
+
+# time of waiting for dives before dives iterator checks if dive
+# extraction is stopped [s]
+QUEUE_POLL = 0.1
+
+# end of dive extraction marker
+_END = object()
+
+
+class ExtractMetrics(object):
+    """
+    Sensus Ultra dive extraction metrics.
+
+    If dive extraction thread waits for free queue slot, then dives
+    iterator consumer is the bottleneck. If dives iterator waits for dives,
+    then libdivecomputer library and dive callbacks are the bottleneck.
+
+    :var dives: Amount of extracted dives.
+    :var samples: Amount of extracted dive samples.
+    :var batches: Amount of dive batches passed to dives iterator.
+    :var queue_depth: Maximum amount of dive batches waiting in the queue.
+    :var extract_time: Time of dive extraction thread [s].
+    :var callback_time: Time spent in dive and sample callbacks [s].
+    :var put_wait: Time dive extraction thread waited for free queue slot
+        [s].
+    :var get_wait: Time dives iterator waited for dives [s].
+    """
+    def __init__(self):
+        self.dives = 0
+        self.samples = 0
+        self.batches = 0
+        self.queue_depth = 0
+        self.extract_time = 0
+        self.callback_time = 0
+        self.put_wait = 0
+        self.get_wait = 0
+
+
+class SampleColumns(object):
+    """
+    Preallocated columns of dive samples data filled by sample data
+    callback.
+
+    The columns grow if the estimated amount of samples is exceeded.
+
+    :var time: Sample time column.
+    :var temp: Sample temperature column.
+    :var depth: Sample depth column.
+    :var size: Amount of samples stored in the columns.
+    """
+    __slots__ = ('time', 'temp', 'depth', 'size')
+
+    def reset(self, n):
+        """
+        Allocate new columns for maximum amount of samples.
+
+        :Parameters:
+         n
+            Maximum amount of samples.
+        """
+        self.time = [None] * n
+        self.temp = [None] * n
+        self.depth = [None] * n
+        self.size = 0
+
+
+    def grow(self):
+        """
+        Extend the columns by one sample.
+        """
+        self.time.append(None)
+        self.temp.append(None)
+        self.depth.append(None)
+
+
 # dive and sample data callbacks 
 FuncDive = ct.CFUNCTYPE(ct.c_uint, ct.POINTER(ct.c_char), ct.c_uint,
     ct.POINTER(ct.c_char), ct.c_uint, ct.c_void_p)
 FuncSample = ct.CFUNCTYPE(None, ct.c_int, SampleValue, ct.c_void_p)
 
 
+@lru_cache(maxsize=1)
+def libdc():
+    """
+    Load libdivecomputer library and declare prototypes of its functions
+    used by the driver.
+
+    The library is loaded once.
+    """
+    lib = ct.CDLL(LIBDC)
+    log.debug('loaded libdivecomputer library {}'.format(LIBDC))
+
+    def proto(name, restype, *argtypes):
+        f = getattr(lib, name)
+        f.restype = restype
+        f.argtypes = argtypes
+
+    proto('reefnet_sensusultra_device_open', ct.c_int,
+        ct.POINTER(ct.c_void_p), ct.c_char_p)
+    proto('reefnet_sensusultra_device_sense', ct.c_int,
+        ct.c_void_p, ct.c_char_p, ct.c_uint)
+    proto('reefnet_sensusultra_device_get_handshake', ct.c_int,
+        ct.c_void_p, ct.c_char_p, ct.c_uint)
+    proto('reefnet_sensusultra_device_read_user', ct.c_int,
+        ct.c_void_p, ct.c_char_p, ct.c_uint)
+    proto('dc_buffer_new', ct.c_void_p, ct.c_size_t)
+    proto('device_dump', ct.c_int, ct.c_void_p, ct.c_void_p)
+
+    proto('reefnet_sensusultra_parser_create', ct.c_int,
+        ct.POINTER(ct.c_void_p))
+    proto('parser_destroy', ct.c_int, ct.c_void_p)
+    proto('parser_set_data', ct.c_int, ct.c_void_p, ct.c_void_p, ct.c_uint)
+    proto('parser_samples_foreach', ct.c_int,
+        ct.c_void_p, FuncSample, ct.c_void_p)
+    proto('reefnet_sensusultra_extract_dives', ct.c_int,
+        ct.c_void_p, ct.c_void_p, ct.c_uint, FuncDive, ct.c_void_p)
+    return lib
+
+
 @kc.inject(DeviceDriver, id='su', name='Sensus Ultra Driver',
         models=('Sensus Ultra',))
 class SensusUltraDriver(object):
@@ -152,7 +279,7 @@ class SensusUltraDriver(object):
         Library `libdivecomputer` is used, therefore no scanning and port
         shall be specified.
         """
-        lib = ct.CDLL('libdivecomputer.so.0')
+        lib = libdc()
 
         dev = ct.c_void_p()
         rc = 0
@@ -189,11 +316,14 @@ class SensusUltraDriver(object):
 
 
 
-@kc.inject(DataParser, id='su', data=())
+@kc.inject(DataParser, id='su', data=('index',))
 class SensusUltraDataParser(object):
     """
     Reefnet Sensus Ultra dive logger data parser.
+
+    :var metrics: Metrics of last dive extraction, see `ExtractMetrics`.
     """
+    metrics = None
 
     def dump(self):
         """
@@ -231,52 +361,140 @@ class SensusUltraDataParser(object):
         return hd.raw + ud.raw + dd.contents.data[:dd.contents.size]
 
 
-    def dives(self, dump):
+    def dives(self, dump, jobs=None, keys=None):
         """
         Convert Reefnet Sensus Ultra dive data into UDDF format.
-        """
-        #dev = self.driver.dev
-        #lib = self.driver.lib
-        lib = ct.CDLL('libdivecomputer.so.0')
 
-        parser = ct.c_void_p()
-        rc = lib.reefnet_sensusultra_parser_create(ct.byref(parser))
-        if rc != 0:
-            raise DeviceError('Cannot create data parser')
-        
-        hd = dump.data[:END_HANDSHAKE]
-        assert len(hd) == SIZE_MEM_HANDSHAKE, len(hd)
-        hdp = _handshake(hd)
+        Dive data is parsed with libdivecomputer in current process, so
+        amount of jobs is ignored.
 
-        ud = dump.data[START_USER : END_USER]
-        assert len(ud) == SIZE_MEM_USER, len(ud)
+        One libdivecomputer parser is used to parse all dives and the dive
+        data is passed to libdivecomputer without copying it.
 
-        dd = ct.create_string_buffer(SIZE_MEM_DATA)
-        dd.raw = dump.data[START_DATA:]
-        assert len(dd.raw) == SIZE_MEM_DATA, len(dd.raw)
+        If dive keys are specified, then the dives identified by the keys
+        are parsed one by one in order of the keys.
 
-        # boot time = host time - device time (sensus time)
-        btime = time.mktime(dump.datetime.timetuple()) - hdp.time
+        :Parameters:
+         dump
+            Sensus Ultra binary data.
+         jobs
+            Ignored.
+         keys
+            Dive keys, see :py:meth:`SensusUltraDataParser.dive_keys`.
+        """
+        if keys is None:
+            yield from self._extract(dump)
+        else:
+            yield from self._parse(keys)
 
-        dq = Queue(10)
-        parse_dive = partial(self.parse_dive,
-                parser=parser, boot_time=btime, dives=dq)
-        f = FuncDive(parse_dive)
-        extract_dives = partial(lib.reefnet_sensusultra_extract_dives,
-                None, dd, SIZE_MEM_DATA, f, None)
 
-        return _iterate(dq, extract_dives)
+    def dive_keys(self, dump):
+        """
+        Get keys of Sensus Ultra dives.
 
+        Sensus Ultra memory is a ring buffer, therefore the key of a dive
+        is copy of dive binary data block. Dive samples are not parsed.
 
-    def gases(self, data):
+        :Parameters:
+         dump
+            Sensus Ultra binary data.
+        """
+        lib = libdc()
+        data, btime = _dive_data(dump)
+        keys = []
+
+        def index(buffer, size, fingerprint, fsize, pdata):
+            header = _dive_header(buffer)
+            st = _dive_start(btime, header)
+            key = ct.string_at(buffer, size)
+            keys.append(kd.DiveKey(datetime=st, key=key))
+            return 1
+
+        dd = _data_ptr(data)
+        rc = lib.reefnet_sensusultra_extract_dives(None, dd, SIZE_MEM_DATA,
+            FuncDive(index), None)
+        if rc != 0:
+            raise DeviceError('Failed to extract data properly')
+        log.debug('found {} dive keys'.format(len(keys)))
+        return keys
+
+
+    def gases(self, data, keys=None):
         """
         Return empty tuple - no gas information stored by Sensus Ultra.
+
+        If dive keys are specified, then empty tuple is returned for each
+        dive.
         
         :Parameters:
          data
             Sensus Ultra data.
+         keys
+            Dive keys, see :py:meth:`SensusUltraDataParser.dive_keys`.
+        """
+        return () if keys is None else tuple(() for k in keys)
+
+
+    def _extract(self, dump):
         """
-        return ()
+        Extract and parse all dives from Sensus Ultra binary data.
+
+        :Parameters:
+         dump
+            Sensus Ultra binary data.
+        """
+        lib = libdc()
+        data, btime = _dive_data(dump)
+
+        # pointer to dive data within raw data; the raw data is referenced
+        # by this generator, so it is alive during dives extraction
+        dd = _data_ptr(data)
+
+        metrics = self.metrics = ExtractMetrics()
+        columns = SampleColumns()
+        parse_sample = FuncSample(partial(self.parse_sample,
+            columns=columns))
+
+        with _parser() as parser:
+            dq = Queue(QUEUE_SIZE)
+            stop = threading.Event()
+            batch = []
+            parse_dive = partial(self.parse_dive,
+                    parser=parser, boot_time=btime, dives=dq, stop=stop,
+                    batch=batch, parse_sample=parse_sample, columns=columns,
+                    metrics=metrics)
+            f = FuncDive(parse_dive)
+            extract_dives = partial(lib.reefnet_sensusultra_extract_dives,
+                    None, dd, SIZE_MEM_DATA, f, None)
+
+            dives = _iterate(dq, stop, extract_dives, batch, metrics)
+            yield from (_dive(*d) for d in dives)
+
+
+    def _parse(self, keys):
+        """
+        Parse Sensus Ultra dives identified by dive keys.
+
+        :Parameters:
+         keys
+            Dive keys, see :py:meth:`SensusUltraDataParser.dive_keys`.
+        """
+        lib = libdc()
+        columns = SampleColumns()
+        parse_sample = FuncSample(partial(self.parse_sample,
+            columns=columns))
+
+        with _parser() as parser:
+            for k in keys:
+                buffer = k.key
+                lib.parser_set_data(parser, buffer, len(buffer))
+                header = _dive_header(buffer)
+
+                columns.reset((len(buffer) - SIZE_DIVE_HEADER) // SIZE_SAMPLE)
+                lib.parser_samples_foreach(parser, parse_sample, None)
+                n = columns.size - header.endcount
+                yield _dive(k.datetime, header, columns.time, columns.temp,
+                    columns.depth, n)
 
 
     def version(self, data):
@@ -292,10 +510,14 @@ class SensusUltraDataParser(object):
 
     
     def parse_dive(self, buffer, size, fingerprint, fsize, pdata, parser,
-            boot_time, dives):
+            boot_time, dives, stop, batch, parse_sample, columns, metrics):
         """
         Callback used by libdivecomputer's library function to extract
-        dives from a device and put it into dives queue.
+        dives from a device and put them into dives queue.
+
+        The dive samples are stored in preallocated columns and the dives
+        are put into the queue in batches. If dive extraction is stopped,
+        then dive extraction is interrupted.
 
         :Parameters:
          buffer
@@ -313,61 +535,56 @@ class SensusUltraDataParser(object):
          boot_time
             Sensus Ultra boot time.
          dives
-            Queue of dives to be consumed by caller.
+            Queue of dive batches to be consumed by caller.
+         stop
+            Dive extraction stop event.
+         batch
+            Batch of dives to be put into the queue.
+         parse_sample
+            Sample data callback, see `parse_sample`.
+         columns
+            Sample data columns filled by sample data callback.
+         metrics
+            Dive extraction metrics.
         """
-        lib = ct.CDLL('libdivecomputer.so.0')
+        if stop.is_set():
+            return 0
+
+        t = time.perf_counter()
+        lib = libdc()
         lib.parser_set_data(parser, buffer, size)
 
         header = _dive_header(buffer)
         log.debug('parsing dive: {0}'.format(header))
 
-        # dive time is in seconds since boot time
-        # interval is substracted due to depth=0, time=0 sample injection
-        st = datetime.fromtimestamp(boot_time - header.interval + header.time)
+        st = _dive_start(boot_time, header)
         log.debug('got dive time: {0}'.format(st))
 
-        samples = []
-        parse_sample = partial(self.parse_sample,
-                dive_header=header,
-                sdata={},
-                sq=samples)
-        
-        f = FuncSample(parse_sample)
-        lib.parser_samples_foreach(parser, f, None)
+        # dive data is header, 4 bytes samples and 4 bytes footer
+        columns.reset((size - SIZE_DIVE_HEADER) // SIZE_SAMPLE)
+        lib.parser_samples_foreach(parser, parse_sample, None)
 
         log.debug('removing {} endcount samples'.format(header.endcount))
-        del samples[-header.endcount:]
-
-        # dive summary after endcount removal
-        max_depth = max(samples, key=operator.attrgetter('depth')).depth
-        min_temp = min(samples, key=operator.attrgetter('temp')).temp
-        duration = samples[-1].time + header.interval
-        
-        # each dive starts below DiveHeader.threshold, therefore inject
-        # first sample required by UDDF
-        samples.insert(0, kd.Sample(depth=0.0, time=0))
+        n = columns.size - header.endcount
+        batch.append((st, header, columns.time, columns.temp,
+            columns.depth, n))
 
-        # each dive ends at about DiveHeader.threshold depth, therefore
-        # inject last sample required by UDDF
-        samples.append(kd.Sample(depth=0.0, time=duration))
+        metrics.dives += 1
+        metrics.samples += n
+        metrics.callback_time += time.perf_counter() - t
 
-        # finally, create dive data
-        dive = kd.Dive(datetime=st, depth=max_depth, duration=duration,
-                temp=min_temp, profile=samples)
-
-        try:
-            dives.put(dive, timeout=30)
-        except Full:
-            log.error('could not parse dives due to internal queue timeout')
-            return 0
+        if len(batch) == DIVE_BATCH:
+            if not _put(dives, stop, batch[:], metrics):
+                return 0
+            del batch[:]
 
         return 1
 
 
-    def parse_sample(self, st, sample, pdata, dive_header, sdata, sq):
+    def parse_sample(self, st, sample, pdata, columns):
         """
-        Convert dive samples data generated with libdivecomputer library
-        into UDDF waypoint structure.
+        Store dive samples data generated with libdivecomputer library in
+        sample data columns.
 
         :Parameters:
          st
@@ -376,33 +593,139 @@ class SensusUltraDataParser(object):
             Sample data.
          pdata
             Parser user data (nothing at the moment).
-         dive_header
-            Dive header of parsed dive.
-         sdata
-            Temporary sample data.
-         sq
-            List of samples. 
+         columns
+            Sample data columns.
         """
+        # the estimated amount of samples is exceeded; an exception raised
+        # here would be swallowed by ctypes callback and samples lost
+        if columns.size == len(columns.depth):
+            columns.grow()
+
         # depth is the last sample type generated by libdivecomputer,
-        # create the waypoint then
+        # move to next sample then
         if st == SampleType.time:
-            sdata['time'] = sample.time
+            columns.time[columns.size] = sample.time
         elif st == SampleType.temperature:
-            sdata['temp'] = round(C2K(sample.temperature), 1)
+            columns.temp[columns.size] = round(C2K(sample.temperature), 1)
         elif st == SampleType.depth:
             # Sensus Ultra might return negative values near 0, so use max
-            sdata['depth'] = round(max(sample.depth, 0), 1)
-
-            s = kd.Sample(**sdata)
-            log.debug('got sample {}'.format(sdata))
-
-            sq.append(s)
-            sdata.clear() # clear temporary data
+            columns.depth[columns.size] = round(max(sample.depth, 0), 1)
+            columns.size += 1
         else:
             log.warn('unknown sample type', st)
         return 1
 
 
+def _dive(st, header, times, temps, depths, n):
+    """
+    Create dive data record from dive samples data columns.
+
+    :Parameters:
+     st
+        Dive start time.
+     header
+        Dive header.
+     times
+        Sample time column.
+     temps
+        Sample temperature column.
+     depths
+        Sample depth column.
+     n
+        Amount of samples after endcount removal.
+    """
+    # dive summary after endcount removal
+    max_depth = max(depths[:n])
+    min_temp = min(temps[:n])
+    duration = times[n - 1] + header.interval
+
+    # each dive starts below DiveHeader.threshold, therefore inject
+    # first sample required by UDDF
+    samples = [kd.Sample(depth=0.0, time=0)]
+    samples.extend(kd.Sample(depth=d, time=t, temp=v)
+        for t, v, d in zip(times[:n], temps[:n], depths[:n]))
+
+    # each dive ends at about DiveHeader.threshold depth, therefore
+    # inject last sample required by UDDF
+    samples.append(kd.Sample(depth=0.0, time=duration))
+
+    # finally, create dive data
+    return kd.Dive(datetime=st, depth=max_depth, duration=duration,
+            temp=min_temp, profile=samples)
+
+
+@contextmanager
+def _parser():
+    """
+    Create libdivecomputer Sensus Ultra parser, which is destroyed on
+    exit of the context.
+    """
+    lib = libdc()
+    parser = ct.c_void_p()
+    rc = lib.reefnet_sensusultra_parser_create(ct.byref(parser))
+    if rc != 0:
+        raise DeviceError('Cannot create data parser')
+    try:
+        yield parser
+    finally:
+        lib.parser_destroy(parser)
+
+
+def _dive_data(dump):
+    """
+    Validate Sensus Ultra binary data and calculate Sensus Ultra boot time.
+
+    Tuple of binary data as bytes and boot time is returned.
+
+    :Parameters:
+     dump
+        Sensus Ultra binary data.
+    """
+    data = dump.data
+    if not isinstance(data, bytes):
+        data = bytes(data)
+
+    hd = data[:END_HANDSHAKE]
+    assert len(hd) == SIZE_MEM_HANDSHAKE, len(hd)
+    hdp = _handshake(hd)
+
+    assert len(data) - START_USER >= SIZE_MEM_USER, len(data)
+    assert len(data) - START_DATA == SIZE_MEM_DATA, len(data)
+
+    # boot time = host time - device time (sensus time)
+    btime = time.mktime(dump.datetime.timetuple()) - hdp.time
+    return data, btime
+
+
+def _data_ptr(data):
+    """
+    Get pointer to dive data within Sensus Ultra binary data.
+
+    The pointer is valid as long as the binary data is referenced.
+
+    :Parameters:
+     data
+        Sensus Ultra binary data.
+    """
+    return ct.c_void_p(ct.cast(ct.c_char_p(data), ct.c_void_p).value
+        + START_DATA)
+
+
+def _dive_start(boot_time, header):
+    """
+    Get date and time of the start of a dive.
+
+    :Parameters:
+     boot_time
+        Sensus Ultra boot time.
+     header
+        Dive header.
+    """
+    # dive time is in seconds since boot time
+    # interval is substracted due to depth=0, time=0 sample injection
+    return datetime.fromtimestamp(boot_time - header.interval + header.time)
+
+
 def _handshake(data):
     """
     Convert binary data into HandshakeDump structure.
@@ -426,33 +749,123 @@ def _dive_header(data):
     return DiveHeader._make(unpack(FMT_DIVE_HEADER, data[:16]))
 
 
-def _iterate(queue, f):
+def _iterate(queue, stop, f, batch, metrics):
     """
     Create iterator for stateful function.
 
-    Stateful function pushes items into to the queue, while this function
-    pull items from the queue and returns them one by one.
+    Stateful function is executed in a thread and puts batches of items
+    into the queue, while this function pulls the batches from the queue
+    and returns items one by one. The queue is bounded, so the stateful
+    function waits when the items are not consumed fast enough.
+
+    The stop event is set when a batch of items cannot be put into the
+    queue or when the iterator is closed, so the stateful function
+    finishes as soon as possible. The iterator raises error if the stop
+    event is set by the stateful function.
 
     :Parameters:
      queue
         Queue holding stateful function items.
+     stop
+        Stop event.
      f
         Stateful function.
+     batch
+        Last, incomplete batch of stateful function items.
+     metrics
+        Dive extraction metrics.
     """
+    def extract():
+        t = time.perf_counter()
+        try:
+            rc = f()
+            if batch:
+                _put(queue, stop, batch[:], metrics)
+            return rc
+        finally:
+            metrics.extract_time = time.perf_counter() - t
+            _put(queue, stop, _END, metrics)
+
     with ThreadPoolExecutor(max_workers=1) as e:
-        fn = e.submit(f)
-        
-        while not (fn.done() and queue.empty()):
-            try:
-                n = queue.get(timeout=1)
-                yield n
-            except Empty:
-                if not fn.done():
-                    log.warn('su driver possible queue miss')
-
-        if fn.result() == 0:
-            raise StopIteration()
-        else:
+        fn = e.submit(extract)
+
+        try:
+            while True:
+                t = time.perf_counter()
+                try:
+                    items = queue.get(timeout=QUEUE_POLL)
+                except Empty:
+                    items = _END if stop.is_set() else None
+                metrics.get_wait += time.perf_counter() - t
+                if items is _END:
+                    break
+                elif items is not None:
+                    yield from items
+        finally:
+            if not fn.done():
+                # the iterator is closed, release stateful function
+                # waiting for free queue slot
+                stop.set()
+                _drain(queue)
+
+        log.debug('extracted {0.dives} dives, {0.samples} samples in' \
+            ' {0.batches} batches, queue depth {0.queue_depth}, extract' \
+            ' {0.extract_time:.3f}s, callbacks {0.callback_time:.3f}s, put' \
+            ' wait {0.put_wait:.3f}s, get wait {0.get_wait:.3f}s' \
+            .format(metrics))
+
+        if fn.result() != 0 or stop.is_set():
             raise DeviceError('Failed to extract data properly')
 
+
+def _put(queue, stop, items, metrics):
+    """
+    Put batch of items into the queue.
+
+    False is returned if the queue is full for too long or if the stop
+    event is set. The stop event is set when the queue is full for too
+    long.
+
+    :Parameters:
+     queue
+        Queue of batches of items.
+     stop
+        Stop event.
+     items
+        Batch of items.
+     metrics
+        Dive extraction metrics.
+    """
+    if stop.is_set():
+        return False
+
+    metrics.queue_depth = max(metrics.queue_depth, queue.qsize())
+    t = time.perf_counter()
+    try:
+        queue.put(items, timeout=QUEUE_TIMEOUT)
+        if items is not _END:
+            metrics.batches += 1
+        return True
+    except Full:
+        log.error('could not parse dives due to internal queue timeout')
+        stop.set()
+        return False
+    finally:
+        metrics.put_wait += time.perf_counter() - t
+
+
+def _drain(queue):
+    """
+    Remove all items from the queue.
+
+    :Parameters:
+     queue
+        Queue to drain.
+    """
+    try:
+        while True:
+            queue.get_nowait()
+    except Empty:
+        pass
+
 # vim: sw=4:et:ai
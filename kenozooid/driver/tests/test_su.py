@@ -27,8 +27,14 @@ from datetime import datetime
 from binascii import unhexlify
 import lxml.etree as et
 import unittest
+from unittest import mock
+from queue import Queue
+from threading import Event
+import time
 
 import kenozooid.uddf as ku
+import kenozooid.driver.su as su
+from kenozooid.driver import DeviceError
 from kenozooid.driver.su import SensusUltraDataParser, _handshake, _dive_header
 
 SU_DATA_DOWNLOAD_TIME = datetime(2010, 2, 22, 21, 34, 22)
@@ -736,6 +742,102 @@ class ParserTestCase(unittest.TestCase):
         self.assertEquals(1, v.averaging)
 
 
+class IterateTestCase(unittest.TestCase):
+    """
+    Dive extraction iterator tests.
+    """
+    def extract(self, queue, stop, batch, metrics, rc=0, n=10):
+        """
+        Create stateful function putting batches of items into the queue.
+        """
+        def f():
+            for i in range(n):
+                batch.append(i)
+                if len(batch) == 3:
+                    if not su._put(queue, stop, batch[:], metrics):
+                        return rc
+                    del batch[:]
+            return rc
+        return f
+
+
+    def test_iterate(self):
+        """
+        Test dive extraction iterator
+        """
+        queue = Queue(2)
+        stop = Event()
+        batch = []
+        metrics = su.ExtractMetrics()
+        f = self.extract(queue, stop, batch, metrics)
+
+        items = list(su._iterate(queue, stop, f, batch, metrics))
+        self.assertEquals(list(range(10)), items)
+        self.assertEquals(4, metrics.batches)
+        self.assertTrue(metrics.queue_depth <= 2)
+        self.assertTrue(metrics.extract_time > 0)
+        self.assertFalse(stop.is_set())
+
+
+    def test_iterate_error(self):
+        """
+        Test dive extraction iterator error
+        """
+        queue = Queue(2)
+        stop = Event()
+        batch = []
+        metrics = su.ExtractMetrics()
+        f = self.extract(queue, stop, batch, metrics, rc=1)
+
+        items = su._iterate(queue, stop, f, batch, metrics)
+        self.assertRaises(DeviceError, list, items)
+
+
+    @mock.patch('kenozooid.driver.su.QUEUE_TIMEOUT', 0.1)
+    def test_iterate_timeout(self):
+        """
+        Test dive extraction iterator with queue timeout
+        """
+        queue = Queue(2)
+        stop = Event()
+        batch = []
+        metrics = su.ExtractMetrics()
+        f = self.extract(queue, stop, batch, metrics)
+
+        items = su._iterate(queue, stop, f, batch, metrics)
+        self.assertEquals(0, next(items))
+
+        # stateful function times out and its end marker is not put into
+        # the queue, the iterator still finishes
+        time.sleep(0.3)
+        self.assertTrue(stop.is_set())
+        self.assertRaises(DeviceError, list, items)
+
+
+    def test_iterate_close(self):
+        """
+        Test closing dive extraction iterator
+        """
+        queue = Queue(2)
+        stop = Event()
+        batch = []
+        metrics = su.ExtractMetrics()
+        f = self.extract(queue, stop, batch, metrics, n=1000)
+
+        items = su._iterate(queue, stop, f, batch, metrics)
+        self.assertEquals(0, next(items))
+
+        t = time.perf_counter()
+        items.close()
+        t = time.perf_counter() - t
+
+        # stateful function is stopped without waiting for queue timeout
+        self.assertTrue(stop.is_set())
+        self.assertTrue(t < 1, t)
+        self.assertTrue(metrics.batches < 10, metrics.batches)
+
+
+
 class DataParserTestCase(unittest.TestCase):
     """
     Sensus Ultra data parser driver tests.
@@ -750,6 +852,23 @@ class DataParserTestCase(unittest.TestCase):
         self.assertEquals('Sensus Ultra 3.2', ver)
 
 
+    def test_libdc(self):
+        """
+        Test loading of libdivecomputer library
+        """
+        su.libdc.cache_clear()
+        try:
+            with mock.patch('ctypes.CDLL') as f:
+                lib = su.libdc()
+                self.assertTrue(lib is su.libdc())
+                f.assert_called_once_with(su.LIBDC)
+
+                fp = lib.reefnet_sensusultra_extract_dives
+                self.assertEquals(su.FuncDive, fp.argtypes[3])
+        finally:
+            su.libdc.cache_clear()
+
+
     def test_gases(self):
         """
         Test Sensus Ultra gases parsing from raw data
@@ -761,5 +880,26 @@ class DataParserTestCase(unittest.TestCase):
         self.assertEquals((), tuple(drv.gases(data)))
 
 
+    def test_parse_sample_overflow(self):
+        """
+        Test storing more samples than estimated in sample data columns
+        """
+        drv = SensusUltraDataParser()
+        columns = su.SampleColumns()
+        columns.reset(1)
+
+        Sample = namedtuple('Sample', 'time temperature depth')
+        for i in range(3):
+            sample = Sample(i * 10, 20.0, 1.5 + i)
+            drv.parse_sample(su.SampleType.time, sample, None, columns)
+            drv.parse_sample(su.SampleType.temperature, sample, None, columns)
+            drv.parse_sample(su.SampleType.depth, sample, None, columns)
+
+        self.assertEquals(3, columns.size)
+        self.assertEquals([0, 10, 20], columns.time)
+        self.assertEquals([293.1, 293.1, 293.1], columns.temp)
+        self.assertEquals([1.5, 2.5, 3.5], columns.depth)
+
+
 
 # vim: sw=4:et:ai
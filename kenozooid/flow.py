@@ -22,9 +22,6 @@ Kenozooid data flow processing functions and coroutines.
 """
 
 import itertools
-import os
-from contextlib import contextmanager
-from tempfile import mkstemp
 
 def coroutine(func):
     """
@@ -119,40 +116,4 @@ def sink(f):
         v = yield
         f(v)
 
-
-@coroutine
-def buffer(f, tc=None):
-    """
-    Coroutine buffer, which stores received data in a file.
-
-    When coroutine is closed, then file object is sent to target coroutine.
-
-    :Parameters:
-     f
-        File object to store buffered data.
-     tc
-        Target coroutine.
-    """
-    try:
-        while True:
-            lines = yield
-            f.writelines(lines)
-    except GeneratorExit:
-        if tc is not None:
-            tc.send(f)
-
-
-@contextmanager
-def buffer_open(n):
-    """
-    Open ``n`` buffer files.
-    """
-    files = []
-    files.extend(mkstemp() for i in range(n))
-    fds = tuple(open(fd, 'w+') for fd, fn in files)
-    yield fds
-    for (_, fn), fd in zip(files, fds):
-        fd.close()
-        os.remove(fn)
-
 # vim: sw=4:et:ai
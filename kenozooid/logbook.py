@@ -30,6 +30,9 @@ import itertools
 ichain = itertools.chain.from_iterable
 from itertools import zip_longest as lzip
 from operator import itemgetter
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import pkg_resources
 
 import kenozooid.uddf as ku
@@ -39,11 +42,16 @@ from kenozooid.units import K2C
 log = logging.getLogger('kenozooid.logbook')
 
 
-def find_dive_nodes(files, nodes=None, dives=None):
+def find_dive_nodes(files, nodes=None, dives=None, jobs=None):
     """
     Find dive nodes in UDDF files using optional numeric ranges or total
     dive number as search parameters.
 
+    If amount of jobs is greater than one, then the files are parsed and
+    searched with a pool of processes. Found dive nodes are serialized by
+    the worker processes and parsed again in the calling process. The
+    order of dive nodes is the same as when searching without the pool.
+
     The collection of dive nodes is returned.
 
     :Parameters:
@@ -53,12 +61,18 @@ def find_dive_nodes(files, nodes=None, dives=None):
         Numeric ranges of nodes, `None` if all nodes.
      dives
         Numeric range of total dive number, `None` if any dive.
+     jobs
+        Amount of processes used to parse the files.
 
     .. seealso:: :py:func:`parse_range`
     .. seealso:: :py:func:`find_dives`
     """
     nodes = [] if nodes is None else nodes
-    data = (ku.find(f, ku.XP_FIND_DIVES, nodes=q, dives=dives) \
+    if jobs is not None and jobs > 1:
+        data = _pmap(_find_dive_nodes_job, files, nodes, dives, jobs)
+        return (et.fromstring(n) for n in ichain(data))
+
+    data = (ku.iterfind_dives(f, nodes=q, dives=dives) \
         for q, f in lzip(nodes, files))
     return ichain(data)
 
@@ -81,15 +95,33 @@ def find_dive_gas_nodes(files, nodes=None):
     nodes = [] if nodes is None else nodes
     data = (ku.find(f, ku.XP_FIND_DIVE_GASES, nodes=q) \
         for q, f in lzip(nodes, files))
-    nodes_by_id = ((n.get('id'), n) for n in ichain(data))
+    return _uniq_gas_nodes(ichain(data))
+
+
+def _uniq_gas_nodes(nodes):
+    """
+    Get gas nodes with unique ids, the last node of an id is used.
+
+    :Parameters:
+     nodes
+        Collection of gas nodes.
+    """
+    nodes_by_id = ((n.get('id'), n) for n in nodes)
     return dict(nodes_by_id).values()
 
 
-def find_dives(files, nodes=None, dives=None):
+def find_dives(files, nodes=None, dives=None, jobs=None):
     """
     Find dive data in UDDF files using optional node ranges or total dive
     number as search parameters.
 
+    If amount of jobs is greater than one, then the files are parsed and
+    searched with a pool of processes. Dive data is extracted by the worker
+    processes and dive data records of the same type as when searching
+    without the pool are returned, with dive profile being a list of
+    samples. The order of dives is the same as when searching without the
+    pool.
+
     The collection of dive data is returned.
 
     :Parameters:
@@ -99,12 +131,151 @@ def find_dives(files, nodes=None, dives=None):
         Numeric ranges of nodes, `None` if all nodes.
      dives
         Numeric range of total dive number, `None` if any dive.
+     jobs
+        Amount of processes used to parse the files.
 
     .. seealso:: :py:func:`parse_range`
     .. seealso:: :py:func:`find_dive_nodes`
     """
+    if jobs is not None and jobs > 1:
+        nodes = [] if nodes is None else nodes
+        data = _pmap(_find_dives_job, files, nodes, dives, jobs)
+        return (_dive(d) for d in ichain(data))
+
     return (ku.dive_data(n) for n in find_dive_nodes(files, nodes, dives))
-        
+
+
+def _pmap(job, files, nodes, dives, jobs):
+    """
+    Execute dive search job for each UDDF file with a pool of processes.
+
+    Iterator of job results is returned in order of the files.
+
+    :Parameters:
+     job
+        Dive search job function.
+     files
+        Collection of UDDF files.
+     nodes
+        Numeric ranges of nodes.
+     dives
+        Numeric range of total dive number, `None` if any dive.
+     jobs
+        Amount of processes.
+    """
+    log.debug('searching dives with {} processes'.format(jobs))
+    args = ((f, q, dives) for q, f in lzip(nodes, files))
+    with ProcessPoolExecutor(max_workers=jobs) as e:
+        for data in e.map(job, args):
+            yield data
+
+
+def _find_dive_nodes_job(args):
+    """
+    Find dive nodes in UDDF file and serialize them.
+
+    :Parameters:
+     args
+        Tuple of UDDF file, numeric range of nodes and numeric range of
+        total dive number.
+    """
+    f, nodes, dives = args
+    return [et.tostring(n) for n in ku.iterfind_dives(f, nodes, dives)]
+
+
+def _find_dive_gas_nodes_job(args):
+    """
+    Find dive nodes and gas nodes referenced by the dives in UDDF file and
+    serialize them.
+
+    :Parameters:
+     args
+        Tuple of UDDF file, numeric range of nodes and numeric range of
+        total dive number.
+    """
+    f, nodes, dives = args
+    gases = ku.find(f, ku.XP_FIND_DIVE_GASES, nodes=nodes)
+    return _find_dive_nodes_job(args), [et.tostring(n) for n in gases]
+
+
+def _find_dives_job(args):
+    """
+    Find dive data in UDDF file and convert it into tuples, so it can be
+    sent to parent process.
+
+    :Parameters:
+     args
+        Tuple of UDDF file, numeric range of nodes and numeric range of
+        total dive number.
+
+    .. seealso:: :py:func:`_pack`
+    """
+    f, nodes, dives = args
+    data = []
+    for n in ku.iterfind_dives(f, nodes, dives):
+        d = ku.dive_data(n)
+        profile = [_pack(s._replace(gas=_pack(s.gas))) for s in d.profile]
+        data.append(_pack(d._replace(profile=profile)))
+    return data
+
+
+def _dive(data):
+    """
+    Create dive data record from dive data tuple.
+
+    :Parameters:
+     data
+        Dive data tuple.
+
+    .. seealso:: :py:func:`_find_dives_job`
+    """
+    d = _unpack(data)
+    profile = [_unpack(s) for s in d.profile]
+    profile = [s._replace(gas=_unpack(s.gas)) for s in profile]
+    return d._replace(profile=profile)
+
+
+def _pack(record):
+    """
+    Convert data record into tuple of record name, record fields and
+    record values.
+
+    The data records created by :py:func:`kenozooid.uddf.find_data` are
+    of types created at runtime, which cannot be sent to parent process.
+
+    :Parameters:
+     record
+        Data record or `None`.
+    """
+    if record is None:
+        return None
+    return type(record).__name__, record._fields, tuple(record)
+
+
+def _unpack(data):
+    """
+    Create data record from tuple of record name, record fields and
+    record values.
+
+    :Parameters:
+     data
+        Tuple of record name, record fields and record values or `None`.
+
+    .. seealso:: :py:func:`_pack`
+    """
+    if data is None:
+        return None
+    name, fields, values = data
+    return _record_type(name, fields)(values)
+
+
+@lru_cache()
+def _record_type(name, fields):
+    """
+    Get data record factory for record name and record fields.
+    """
+    return namedtuple(name, fields)._make
+
 
 def list_dives(dives):
     """
@@ -162,7 +333,7 @@ def add_dive(dive, lfile, qsite=None, qbuddies=()):
         Buddy search terms.
     """
     if os.path.exists(lfile):
-        doc = et.parse(lfile).getroot()
+        doc = ku.parse(lfile).getroot()
     else:
         doc = ku.create()
 
@@ -230,12 +401,18 @@ def upgrade_file(fin):
     return doc
 
 
-def copy_dives(files, nodes, n_dives, lfile):
+def copy_dives(files, nodes, n_dives, lfile, jobs=None):
     """
     Copy dive nodes to logbook file.
 
     The logbook file is created if it does not exist.
 
+    If the logbook file has one repetition group and its dives are sorted
+    by dive start time (as done by Kenozooid), then the copied dives are
+    appended to the logbook file without rewriting it, see
+    :py:func:`kenozooid.uddf.append_dives`. Otherwise, all dives of the
+    logbook file are sorted and duplicate dives are removed.
+
     :Parameters:
      files
         Collection of files.
@@ -245,17 +422,41 @@ def copy_dives(files, nodes, n_dives, lfile):
         Numeric range of total dive number, `None` if any dive.
      lfile
         Logbook file.
+     jobs
+        Amount of processes used to parse the files.
     """
+    if jobs is not None and jobs > 1:
+        # find the gas nodes with the pool of processes as well, so the
+        # files are not parsed by current process
+        nodes = [] if nodes is None else nodes
+        data = list(_pmap(_find_dive_gas_nodes_job, files, nodes, n_dives,
+            jobs))
+        dives = (et.fromstring(n) for n in ichain(d for d, _ in data))
+        gases = _uniq_gas_nodes(et.fromstring(n)
+            for n in ichain(g for _, g in data))
+    else:
+        dives = find_dive_nodes(files, nodes, n_dives)
+        gases = find_dive_gas_nodes(files, nodes)
+
     if os.path.exists(lfile):
-        doc = et.parse(lfile).getroot()
+        n = ku.append_dives(lfile, dives, gases)
+        if n is not None:
+            if not n:
+                log.debug('no dives copied')
+            return
+        doc = ku.parse(lfile).getroot()
     else:
         doc = ku.create()
 
-    dives = find_dive_nodes(files, nodes, n_dives)
-    gases = find_dive_gas_nodes(files, nodes)
+    rgroups = list(ku.xp(doc, 'uddf:profiledata/uddf:repetitiongroup'))
+    append = len(rgroups) == 1 and ku.is_ordered(rgroups[0])
+    if append:
+        rg = rgroups[0]
+        log.debug('inserting dives into existing repetition group')
+    else:
+        _, rg = ku.create_node('uddf:profiledata/uddf:repetitiongroup',
+                parent=doc)
 
-    _, rg = ku.create_node('uddf:profiledata/uddf:repetitiongroup',
-            parent=doc)
     gn = ku.xp_first(doc, 'uddf:gasdefinitions')
     existing = gn is not None
     if not existing:
@@ -271,10 +472,16 @@ def copy_dives(files, nodes, n_dives, lfile):
 
         copied = False
         for n in dives:
-            copied = nc.copy(n, rg) is not None or copied
+            if append:
+                cn = nc.copy(n, None)
+                cn = cn if cn is None else ku.insert_dive(rg, cn)
+            else:
+                cn = nc.copy(n, rg)
+            copied = cn is not None or copied
 
         if copied:
-            ku.reorder(doc)
+            if not append:
+                ku.reorder(doc)
             ku.save(doc, lfile)
         else:
             log.debug('no dives copied')
@@ -296,10 +503,11 @@ def enum_dives(files, total=1):
         ku.XPath('@id'),
         ku.XPath('uddf:informationbeforedive/uddf:datetime/text()'),
     )
-    parsers = (str, lambda dt: ku.dparse(dt).date())
+    parsers = (str, lambda dt: ku.parse_datetime(dt).date())
 
-    fnodes = ((f, n) for f in files for n in
-        ku.find(f, ku.XP_FIND_DIVES, nodes=None, dives=None))
+    docs = [(f, ku.parse(f)) for f in files]
+    fnodes = ((f, n) for f, doc in docs
+        for n in ku.XP_FIND_DIVES(doc, nodes=None, dives=None))
     data = ((f, ku.dive_data(n, fields, queries, parsers)) for f, n in fnodes)
     data = ((item[0], item[1].id, item[1].date) for item in data) # flatten data
     data = sorted(data, key=itemgetter(2))
@@ -313,8 +521,7 @@ def enum_dives(files, total=1):
     cache = dict(((v[0], v[1]), (n, k)) for n, (k, v) in enumerate(data, total))
 
     # update data
-    for f in files:
-        doc = ku.parse(f)
+    for f, doc in docs:
         for n in ku.XP_FIND_DIVES(doc, nodes=None, dives=None):
             id = n.get('id')
             dnn = ku.xp_first(n, 'uddf:informationbeforedive/uddf:divenumber')
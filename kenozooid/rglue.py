@@ -22,6 +22,7 @@ rpy integration functions.
 
 from functools import partial
 from collections import OrderedDict
+from math import isnan
 import itertools
 
 import rpy2.robjects as ro
@@ -73,20 +74,53 @@ def dives_df(dives):
 def dive_profiles_df(dives):
     """
     Create R data frame for dive profiles using rpy interface.
+
+    The dive profile data is read as columns if a dive profile supports it
+    (see :py:meth:`kenozooid.uddf.DiveProfile.columns`), otherwise the
+    dive profile samples are iterated.
     """
     cols = ('dive', 'depth', 'time', 'temp', 'setpoint', 
         'deco_time', 'deco_depth', 'deco_alarm',
         'gas_name', 'gas_o2', 'gas_he', 'mod_low', 'mod_high')
     vf = (int_vec, ) + (float_vec, ) * 6 + (bool_vec, str_vec, int_vec,
             int_vec, float_vec, float_vec)
-    p = ((k, s.depth, s.time, s.temp, s.setpoint, s.deco_time, s.deco_depth, s.alarm,
-          None if s.gas is None else s.gas.name,
-          None if s.gas is None else s.gas.o2,
-          None if s.gas is None else s.gas.he,
-          None if s.gas is None else kcc.mod(s.gas.o2, 1.4),
-          None if s.gas is None else kcc.mod(s.gas.o2, 1.6),
-         ) for k, dive in enumerate(dives, 1) for s in dive.profile)
-    return df(cols, vf, p)
+    data = (_profile_data(k, dive.profile) for k, dive in enumerate(dives, 1))
+    data = (itertools.chain.from_iterable(c) for c in zip(*data))
+    od = OrderedDict((n, f(d)) for n, f, d in zip(cols, vf, data))
+    return ro.DataFrame(od)
+
+
+def _profile_data(k, profile):
+    """
+    Get dive profile data columns of dive profiles data frame.
+
+    :Parameters:
+     k
+        Dive number in data frame.
+     profile
+        Dive profile.
+    """
+    if hasattr(profile, 'columns'):
+        p = profile.columns()
+        nan = lambda c: [None if isnan(v) else v for v in c.tolist()]
+        floats = [nan(c) for c in p[:6]]
+        alarm = [None if a < 0 else p.alarms[a] for a in p.alarm.tolist()]
+        gas = [None if g < 0 else p.gases[g] for g in p.gas.tolist()]
+    else:
+        samples = list(profile)
+        fields = ('depth', 'time', 'temp', 'setpoint', 'deco_time',
+            'deco_depth')
+        floats = [[getattr(s, f) for s in samples] for f in fields]
+        alarm = [s.alarm for s in samples]
+        gas = [s.gas for s in samples]
+
+    gas_col = lambda f: [None if g is None else f(g) for g in gas]
+    return ([k] * len(gas), *floats, alarm,
+        gas_col(lambda g: g.name),
+        gas_col(lambda g: g.o2),
+        gas_col(lambda g: g.he),
+        gas_col(lambda g: kcc.mod(g.o2, 1.4)),
+        gas_col(lambda g: kcc.mod(g.o2, 1.6)))
 
 
 def inject_dive_data(dives):
@@ -22,6 +22,7 @@ Tests for Kenozooid data functions.
 """
 
 from datetime import datetime
+import pickle
 import unittest
 
 import kenozooid.data as kd
@@ -41,6 +42,73 @@ class DivesTestCase(unittest.TestCase):
         self.assertEquals(2, len(ud))
 
 
+    def test_pickle(self):
+        """
+        Test data record pickling
+        """
+        gas = kd.gas(32, 0)
+        dive = kd.Dive(datetime=datetime(2011, 5, 5),
+                profile=[kd.Sample(depth=10.0, time=60, gas=gas)])
+        v = pickle.loads(pickle.dumps(dive))
+        self.assertEquals(dive, v)
+        self.assertEquals(gas, v.profile[0].gas)
+        self.assertEquals(type(gas), type(v.profile[0].gas))
+
+
+    def test_simplify_profile(self):
+        """
+        Test dive profile simplification
+        """
+        depths = (0.0, 5.0, 10.1, 14.9, 20.0, 20.1, 19.9, 20.0, 10.0, 0.0)
+        samples = [kd.Sample(depth=d, time=k * 60)
+            for k, d in enumerate(depths)]
+        result = kd.simplify_profile(samples, 0.5)
+        self.assertEquals([0.0, 20.0, 20.1, 20.0, 0.0],
+            [s.depth for s in result])
+
+        result = kd.simplify_profile(samples, 0.05)
+        self.assertEquals([0.0, 10.1, 14.9, 20.0, 20.1, 19.9, 20.0, 0.0],
+            [s.depth for s in result])
+
+
+    def test_simplify_profile_events(self):
+        """
+        Test dive profile simplification keeping events
+        """
+        gas = kd.gas(50, 0)
+        samples = [
+            kd.Sample(depth=0.0, time=0),
+            kd.Sample(depth=1.0, time=60, alarm=('deco',)),
+            kd.Sample(depth=2.0, time=120),
+            kd.Sample(depth=3.0, time=180, deco_time=60, deco_depth=3),
+            kd.Sample(depth=4.0, time=240, deco_time=60, deco_depth=3),
+            kd.Sample(depth=5.0, time=300, gas=gas),
+            kd.Sample(depth=6.0, time=360),
+            kd.Sample(depth=7.0, time=420),
+        ]
+        result = kd.simplify_profile(samples, 1)
+        self.assertEquals([0, 60, 180, 300, 420], [s.time for s in result])
+
+
+    def test_simplify_short_profile(self):
+        """
+        Test dive profile simplification of a short dive profile
+        """
+        samples = [kd.Sample(depth=0.0, time=0), kd.Sample(depth=1.0, time=60)]
+        self.assertEquals(samples, kd.simplify_profile(iter(samples), 1))
+
+
+    def test_decimate(self):
+        """
+        Test dive profile simplification of dives
+        """
+        samples = [kd.Sample(depth=float(k), time=k * 60) for k in range(5)]
+        dives = [kd.Dive(datetime=datetime(2011, 5, 5), profile=samples)]
+        dive, = kd.decimate_dives(dives, 0.1)
+        self.assertEquals(datetime(2011, 5, 5), dive.datetime)
+        self.assertEquals([0, 240], [s.time for s in dive.profile])
+
+
     def test_gas_basic(self):
         """
         Test basic gas data creation
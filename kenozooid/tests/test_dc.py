@@ -0,0 +1,430 @@
+#
+# Kenozooid - dive planning and analysis toolbox.
+#
+# Copyright (C) 2009-2017 by Artur Wroblewski <wrobell@riseup.net>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Dive computer functionality tests.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os.path
+import pickle
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import kenozooid.data as kd_data
+import kenozooid.dc as kd
+import kenozooid.uddf as ku
+from kenozooid.driver import DeviceDriver, DataParser, AsyncDataParser, \
+    DeviceError
+from kenozooid.driver.ostc import OSTCDriver, OSTCDataParser, \
+    OSTCAsyncDataParser
+from kenozooid.driver.ostc.emulator import OSTCEmulator
+from kenozooid.driver.ostc.tests import data as od
+
+
+class SaveDivesTestCase(unittest.TestCase):
+    """
+    Dive data pipeline tests.
+    """
+    def test_simplify(self):
+        """
+        Test dive profile simplification in dive data pipeline
+        """
+        drv = OSTCDataParser()
+        registry = {DataParser: [(OSTCDataParser, {'id': 'ostc', 'data': ()})]}
+
+        with mock.patch.dict('kenozooid.component._registry', registry), \
+                mock.patch('kenozooid.uddf.create_dives',
+                    side_effect=lambda dives, **kw: list(dives)), \
+                mock.patch('kenozooid.uddf.xml_raw', side_effect=lambda n: n), \
+                mock.patch('kenozooid.uddf.create_uddf') as f, \
+                mock.patch('kenozooid.uddf.save'):
+
+            kd._save_dives(drv, None, od.RAW_DATA_OSTC, 'a.uddf')
+            dives = list(f.call_args[1]['dives'])
+
+            kd._save_dives(drv, None, od.RAW_DATA_OSTC, 'a.uddf',
+                tolerance=0.5)
+            sdives = list(f.call_args[1]['dives'])
+
+        self.assertEquals([d.datetime for d in dives],
+            [d.datetime for d in sdives])
+        n = sum(len(list(d.profile)) for d in dives)
+        k = sum(len(d.profile) for d in sdives)
+        self.assertTrue(k < n / 2, '{} vs. {}'.format(k, n))
+
+
+    def test_gases(self):
+        """
+        Test gas mixes collection in dive data pipeline
+        """
+        drv = OSTCDataParser()
+        registry = {DataParser: [
+            (OSTCDataParser, {'id': 'ostc', 'data': ('gas',)})
+        ]}
+
+        with mock.patch.dict('kenozooid.component._registry', registry), \
+                mock.patch('kenozooid.uddf.create_gas', side_effect=str), \
+                mock.patch('kenozooid.uddf.create_uddf') as f, \
+                mock.patch('kenozooid.uddf.save') as fs:
+
+            kd._save_dives(drv, None, od.RAW_DATA_OSTC, 'a.uddf')
+
+        gases = f.call_args[1]['gases']
+        self.assertEquals(len(gases), len(set(gases)))
+        self.assertTrue(len(gases) > 0)
+        self.assertTrue(all('Gas(' in g for g in gases))
+        self.assertEquals((f.return_value, 'a.uddf'), fs.call_args[0])
+
+
+    def test_spool(self):
+        """
+        Test spooling XML data in temporary file
+        """
+        with mock.patch('kenozooid.dc.SPOOL_CHUNK', 4):
+            data = list(kd._spool([['<a>', 'x</a>'], ['<b/>']]))
+        self.assertEquals(3, len(data))
+        self.assertEquals('<a>x</a><b/>', ''.join(str(s) for s in data))
+
+
+    def test_uniq_gases(self):
+        """
+        Test removal of duplicated gas mixes
+        """
+        air = kd_data.gas(21, 0)
+        ean = kd_data.gas(50, 0)
+        gases = [air, None, ean, air, None, ean]
+        self.assertEquals([air, ean], list(kd._uniq_gases(gases)))
+
+
+    def test_dive_keys(self):
+        """
+        Test dive keys pipeline
+        """
+        drv = OSTCDataParser()
+        p = {'id': 'ostc', 'data': ('gas',)}
+
+        def save(p):
+            registry = {DataParser: [(OSTCDataParser, p)]}
+            with mock.patch.dict('kenozooid.component._registry', registry), \
+                    mock.patch('kenozooid.uddf.create_dives',
+                        side_effect=lambda dives, **kw: list(dives)), \
+                    mock.patch('kenozooid.uddf.create_gas', side_effect=str), \
+                    mock.patch('kenozooid.uddf.xml_raw',
+                        side_effect=lambda n: n), \
+                    mock.patch('kenozooid.dc._spool', side_effect=list), \
+                    mock.patch('kenozooid.uddf.create_uddf') as f, \
+                    mock.patch('kenozooid.uddf.save'):
+                kd._save_dives(drv, None, od.RAW_DATA_OSTC, 'a.uddf')
+                return f.call_args[1]['gases'], list(f.call_args[1]['dives'])
+
+        with mock.patch.object(drv, 'dives', wraps=drv.dives) as f, \
+                mock.patch.object(drv, 'gases') as fg:
+            gases, dives = save(dict(p, data=('gas', 'index')))
+            self.assertTrue(f.call_args[1]['keys'] is not None)
+            self.assertFalse(fg.called) # gases found while dives decoded
+
+        expected_gases, expected_dives = save(p)
+        self.assertEquals(expected_gases, gases)
+        self.assertEquals(expected_dives, dives)
+
+
+DumpData = namedtuple('DumpData', 'dc_id dc_model datetime data')
+
+class ExtractDumpsTestCase(unittest.TestCase):
+    """
+    Tests for dive extraction from multiple dive computer dumps.
+    """
+    def setUp(self):
+        """
+        Create dive computer dump data of two UDDF files.
+        """
+        dt = datetime(2011, 7, 28)
+        d1 = DumpData('id-1', 'OSTC 1.26', dt, od.RAW_DATA_OSTC)
+        d2 = DumpData('id-2', 'OSTC Mk.2 1.96', dt, od.RAW_DATA_OSTC_MK2_196)
+        self.dumps = {'a.uddf': [d1], 'b.uddf': [d1, d2]}
+
+        self.patches = [
+            mock.patch('kenozooid.dc._mem_dump',
+                side_effect=lambda name: OSTCDataParser()),
+            mock.patch('kenozooid.dc._find_dumps', side_effect=self.dumps.get),
+        ]
+        for p in self.patches:
+            p.start()
+
+
+    def tearDown(self):
+        """
+        Remove patches.
+        """
+        for p in reversed(self.patches):
+            p.stop()
+
+
+    def test_extract_job(self):
+        """
+        Test extracting dives from dive computer dumps of a file
+        """
+        data = kd._extract_job(('b.uddf', None))
+        data = pickle.loads(pickle.dumps(data))
+        self.assertEquals(2, len(data))
+
+        dc_id, model, bdata, dives = data[1]
+        self.assertEquals('OSTC Mk.2 1.96', model)
+        self.assertEquals(od.RAW_DATA_OSTC_MK2_196, bdata.data)
+        self.assertTrue(len(dives) > 0)
+        self.assertTrue(all(d.equipment == (dc_id,) for d in dives))
+
+
+    def test_extract_dumps(self):
+        """
+        Test extracting dives from multiple files into one file
+        """
+        with mock.patch('kenozooid.uddf.create_dives',
+                    side_effect=lambda dives, **kw: list(dives)), \
+                mock.patch('kenozooid.uddf.xml_raw', side_effect=lambda n: n), \
+                mock.patch('kenozooid.uddf.create_dc_data') as fdc, \
+                mock.patch('kenozooid.uddf.create_dump_data') as fdd, \
+                mock.patch('kenozooid.uddf.create_uddf') as f, \
+                mock.patch('kenozooid.uddf.save'):
+
+            kd.extract_dumps(['a.uddf', 'b.uddf'], 'c.uddf')
+            args = f.call_args[1]
+            dives = list(args['dives'])
+            list(args['equipment'])
+            list(args['dump'])
+
+        # one dump is duplicated
+        self.assertEquals(2, fdd.call_count)
+        self.assertEquals(2, fdc.call_count)
+
+        dt = [d.datetime for d in dives]
+        self.assertEquals(sorted(set(dt)), dt)
+
+        expected = set()
+        for f in ('a.uddf', 'b.uddf'):
+            for *_, dives in kd._extract_job((f, None)):
+                expected.update(d.datetime for d in dives)
+        self.assertEquals(sorted(expected), dt)
+
+
+    def test_extract_dives_multiple_dumps(self):
+        """
+        Test extracting dives from file with multiple dive computer dumps
+        """
+        with mock.patch('kenozooid.dc.extract_dumps') as f, \
+                mock.patch('kenozooid.dc._save_dives') as fs:
+            kd.extract_dives('b.uddf', 'c.uddf', jobs=2)
+            f.assert_called_once_with(['b.uddf'], 'c.uddf', jobs=2,
+                tolerance=None)
+            self.assertFalse(fs.called)
+
+            kd.extract_dives('a.uddf', 'c.uddf')
+            self.assertEquals(1, f.call_count)
+            self.assertTrue(fs.called)
+
+
+    def test_extract_dumps_none(self):
+        """
+        Test extracting dives from files without dive computer dumps
+        """
+        self.dumps['c.uddf'] = []
+        self.assertRaises(ValueError, kd.extract_dumps, ['c.uddf'], 'd.uddf')
+
+
+    def test_executor(self):
+        """
+        Test pool of processes importing dive computer driver modules
+        """
+        registry = {
+            DataParser: [(OSTCDataParser, {'id': 'ostc', 'data': ()})],
+        }
+        with mock.patch.dict('kenozooid.component._registry', registry), \
+                mock.patch('kenozooid.dc.ProcessPoolExecutor') as pool, \
+                mock.patch('importlib.import_module') as f:
+            kd._executor(2)
+            args = pool.call_args[1]
+            self.assertEquals(2, args['max_workers'])
+            args['initializer'](*args['initargs'])
+
+        f.assert_called_once_with('kenozooid.driver.ostc')
+
+
+
+class FingerprintTestCase(unittest.TestCase):
+    """
+    Dive fingerprint store and incremental backup tests.
+    """
+    def setUp(self):
+        """
+        Create temporary directory to store fingerprint and backup files.
+        """
+        self.tdir = tempfile.mkdtemp()
+        self.fn = os.path.join(self.tdir, 'kz', 'fingerprints.json')
+
+
+    def tearDown(self):
+        """
+        Destroy temporary directory.
+        """
+        shutil.rmtree(self.tdir)
+
+
+    def test_fingerprint_store(self):
+        """
+        Test saving and loading of dive fingerprints
+        """
+        self.assertTrue(kd.load_fingerprint('ostc-155', self.fn) is None)
+
+        kd.save_fingerprint('ostc-155', 'fafa20', self.fn)
+        kd.save_fingerprint('ostc-2048', 'fafa21', self.fn)
+        kd.save_fingerprint('ostc-155', 'fafa22', self.fn)
+
+        self.assertEquals('fafa22', kd.load_fingerprint('ostc-155', self.fn))
+        self.assertEquals('fafa21', kd.load_fingerprint('ostc-2048', self.fn))
+
+
+    def test_backup_incremental(self):
+        """
+        Test incremental backup
+        """
+        drv = OSTCDataParser()
+        drv.dump = mock.MagicMock(return_value=od.RAW_DATA_OSTC_MK2_196)
+        serial, fp = drv.fingerprint(od.RAW_DATA_OSTC_MK2_196)
+        key = 'ostc-{}'.format(serial)
+        registry = {DataParser: [
+            (OSTCDataParser, {'id': 'ostc', 'data': ('gas', 'fingerprint')})
+        ]}
+
+        with mock.patch.dict('kenozooid.component._registry', registry), \
+                mock.patch('kenozooid.dc._mem_dump', return_value=drv), \
+                mock.patch('kenozooid.dc._save_dives') as f, \
+                mock.patch('kenozooid.dc.FINGERPRINT_FILE', self.fn):
+
+            kd.backup('ostc', None, 'backup-1.uddf', incremental=True)
+            self.assertTrue(f.call_args[1]['fingerprint'] is None)
+            self.assertEquals(fp, kd.load_fingerprint(key, self.fn))
+
+            kd.backup('ostc', None, 'backup-2.uddf', incremental=True)
+            self.assertEquals(fp, f.call_args[1]['fingerprint'])
+
+            kd.backup('ostc', None, 'backup-3.uddf')
+            self.assertTrue(f.call_args[1]['fingerprint'] is None)
+
+
+    def test_save_dives_no_new_dives(self):
+        """
+        Test incremental backup without new dives
+        """
+        drv = OSTCDataParser()
+        serial, fp = drv.fingerprint(od.RAW_DATA_OSTC)
+        registry = {DataParser: [
+            (OSTCDataParser, {'id': 'ostc',
+                'data': ('gas', 'fingerprint', 'index')})
+        ]}
+
+        with mock.patch.dict('kenozooid.component._registry', registry), \
+                mock.patch('kenozooid.uddf.create_dives') as fd, \
+                mock.patch('kenozooid.uddf.create_dump_data') as fdd, \
+                mock.patch('kenozooid.uddf.create_uddf') as f, \
+                mock.patch('kenozooid.uddf.save') as fs:
+
+            kd._save_dives(drv, datetime.now(), od.RAW_DATA_OSTC, 'a.uddf',
+                fingerprint=fp)
+
+        # no repetition group, dive computer data stored only
+        self.assertFalse(fd.called)
+        args = f.call_args[1]
+        self.assertTrue(args['dives'] is None)
+        self.assertEqual([], args['gases'])
+        self.assertTrue(args['dump'] is fdd.return_value)
+        self.assertEqual(od.RAW_DATA_OSTC, fdd.call_args[1]['data'])
+        fs.assert_called_once_with(f.return_value, 'a.uddf')
+
+
+
+class BackupAllTestCase(unittest.TestCase):
+    """
+    Tests of backup of several dive computers at once.
+    """
+    def setUp(self):
+        """
+        Start two OSTC dive computer emulators.
+        """
+        self.data = od.RAW_DATA_OSTC_MK2_196, od.RAW_DATA_OSTC
+        self.devices = [OSTCEmulator(d) for d in self.data]
+        for dev in self.devices:
+            dev.start()
+            self.addCleanup(dev.stop)
+
+        self.registry = {
+            DeviceDriver: [(OSTCDriver, {'id': 'ostc', 'models': ()})],
+            AsyncDataParser: [(OSTCAsyncDataParser, {'id': 'ostc'})],
+            DataParser: [(OSTCDataParser, {'id': 'ostc', 'data': ()})],
+        }
+
+
+    def test_backup_all(self):
+        """
+        Test backup of several dive computers at once
+        """
+        devices = [('ostc', dev.port, 'backup-{}.uddf'.format(i))
+            for i, dev in enumerate(self.devices)]
+
+        with mock.patch.dict('kenozooid.component._registry', self.registry), \
+                mock.patch('kenozooid.dc.ProcessPoolExecutor',
+                    side_effect=ThreadPoolExecutor) as pool, \
+                mock.patch('kenozooid.dc._save_dives') as f:
+            kd.backup_all(devices, jobs=2)
+
+        self.assertEqual(1, pool.call_count)
+        self.assertEqual(2, pool.call_args[1]['max_workers'])
+        self.assertEqual((['kenozooid.driver.ostc'],),
+            pool.call_args[1]['initargs'])
+        self.assertEqual(2, f.call_count)
+        result = sorted((c[0][3], c[0][2]) for c in f.call_args_list)
+        expected = [('backup-0.uddf', self.data[0]),
+            ('backup-1.uddf', self.data[1])]
+        self.assertEqual(expected, result)
+        self.assertTrue(all(type(c[0][0]) == OSTCDataParser
+            for c in f.call_args_list))
+
+
+    def test_backup_all_error(self):
+        """
+        Test backup of several dive computers at once with device error
+        """
+        devices = [('ostc', self.devices[0].port, 'backup-0.uddf'),
+            ('ostc', '/dev/kz-no-such-port', 'backup-1.uddf')]
+
+        with mock.patch.dict('kenozooid.component._registry', self.registry), \
+                mock.patch('kenozooid.dc.ProcessPoolExecutor',
+                    ThreadPoolExecutor), \
+                mock.patch('kenozooid.dc._save_dives') as f:
+            self.assertRaises(DeviceError, kd.backup_all, devices)
+
+        self.assertEqual(1, f.call_count)
+        self.assertEqual('backup-0.uddf', f.call_args[0][3])
+
+
+# vim: sw=4:et:ai
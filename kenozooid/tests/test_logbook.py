@@ -26,6 +26,7 @@ import tempfile
 from datetime import datetime
 from io import BytesIO
 import unittest
+from unittest import mock
 
 import kenozooid.logbook as kl
 import kenozooid.uddf as ku
@@ -171,6 +172,63 @@ class DiveCopyingIntegrationTestCase(IntegrationTestCaseBase):
             ku.xp_first(dn, './/uddf:diveduration/text()'))
 
 
+    def test_dive_copy_insert(self):
+        """
+        Test copying dives into logbook with sorted dives
+        """
+        fl = '{}/dive_copy_logbook.uddf'.format(self.tdir)
+        kl.copy_dives([self.fin], ['3'], None, fl)
+        kl.copy_dives([self.fin], ['1'], None, fl)
+        kl.copy_dives([self.fin], ['1-2'], None, fl)
+
+        self.assertEquals(1, len(list(ku.find(fl, '//uddf:repetitiongroup'))))
+        ids = list(ku.find(fl, '//uddf:dive/@id'))
+        self.assertEquals(['d01', 'd02', 'd03'], ids)
+
+
+    def test_dive_copy_append(self):
+        """
+        Test copying dives into logbook using dive index
+        """
+        fl = '{}/dive_copy_logbook.uddf'.format(self.tdir)
+        with mock.patch('kenozooid.uddf.CACHE_FILES', True):
+            kl.copy_dives([self.fin], ['1'], None, fl)
+            kl.copy_dives([self.fin], ['3'], None, fl) # create index
+            with mock.patch.object(ku, 'parse', wraps=ku.parse) as f:
+                kl.copy_dives([self.fin], ['1-2'], None, fl)
+                self.assertFalse(any(fl in c[0] for c in f.call_args_list))
+
+        ids = list(ku.find(fl, '//uddf:dive/@id'))
+        self.assertEquals(['d01', 'd02', 'd03'], ids)
+        ku.assert_valid(ku.parse(fl))
+
+        dives = list(ku.index_dives(fl))
+        self.assertEquals([1, 2, 3], [d.node for d in dives])
+        self.assertEquals(ids, [d.id for d in dives])
+
+
+    def test_dive_copy_unsorted(self):
+        """
+        Test copying dives into logbook with unsorted dives
+        """
+        fl = '{}/dive_copy_logbook.uddf'.format(self.tdir)
+        kl.copy_dives([self.fin], ['1-2'], None, fl)
+
+        # move 1st dive to the end and duplicate it
+        doc = ku.parse(fl)
+        rg = ku.xp_first(doc, '//uddf:repetitiongroup')
+        dn = ku.xp_first(rg, 'uddf:dive')
+        rg.append(dn)
+        dn = ku.deepcopy(dn)
+        dn.set('id', 'd01x')
+        rg.append(dn)
+        ku.save(doc.getroot(), fl)
+
+        kl.copy_dives([self.fin], ['3'], None, fl)
+        ids = list(ku.find(fl, '//uddf:dive/@id'))
+        self.assertEquals(['d01', 'd02', 'd03'], ids)
+
+
     def test_dive_copy_existing(self):
         """
         Test copying existing dive
@@ -184,6 +242,25 @@ class DiveCopyingIntegrationTestCase(IntegrationTestCaseBase):
         self.assertTrue(next(nodes, None) is None)
 
 
+    def test_dive_copy_jobs(self):
+        """
+        Test copying dives with a pool of processes
+        """
+        fl = '{}/dive_copy_logbook.uddf'.format(self.tdir)
+        fj = '{}/dive_copy_logbook_jobs.uddf'.format(self.tdir)
+        kl.copy_dives([self.fin], ['1-2'], None, fl)
+        with mock.patch('kenozooid.logbook.find_dive_gas_nodes') as f:
+            kl.copy_dives([self.fin, self.fin], ['1', '2-3'], None, fj,
+                jobs=2)
+            self.assertFalse(f.called)
+
+        ids = list(ku.find(fj, '//uddf:dive/@id'))
+        self.assertEquals(['d01', 'd02', 'd03'], ids)
+        gases = list(ku.find(fl, '//uddf:gasdefinitions/uddf:mix/@id'))
+        self.assertEquals(gases,
+            list(ku.find(fj, '//uddf:gasdefinitions/uddf:mix/@id')))
+
+
     @unittest.skip
     def test_dive_copy_with_site(self):
         """
@@ -319,6 +396,42 @@ class DiveFindingTestCase(unittest.TestCase):
         self.assertEquals(['d01'] * 3, ids)
 
 
+    def test_find_nodes_jobs(self):
+        """
+        Test finding dive nodes from UDDF files with a pool of processes
+        """
+        files = [self.f1, self.f2, self.f3]
+        nodes = list(kl.find_dive_nodes(files, ['2', None, '3'], jobs=2))
+        self.assertEquals(5, len(nodes))
+
+        ids = [ku.xp_first(n, '@id') for n in nodes]
+        self.assertEquals(['d02', 'd01', 'd02', 'd03', 'd03'], ids)
+
+
+    def test_find_dives_jobs(self):
+        """
+        Test finding dive data from UDDF files with a pool of processes
+        """
+        files = [BytesIO(ktu.UDDF_PROFILE) for i in range(3)]
+        expected = list(kl.find_dives(files, ['1-2', None, '3']))
+        for f in files:
+            f.seek(0)
+        dives = list(kl.find_dives(files, ['1-2', None, '3'], jobs=2))
+
+        self.assertEquals(6, len(dives))
+        expected = [e._replace(profile=list(e.profile)) for e in expected]
+        self.assertEquals(expected, dives)
+        for d, e in zip(dives, expected):
+            self.assertEquals(type(e).__name__, type(d).__name__)
+            self.assertEquals(e._fields, d._fields)
+            self.assertEquals(e.profile[0]._fields, d.profile[0]._fields)
+
+        d = dives[0]
+        self.assertEquals(301, d.number)
+        self.assertEquals(('air', 'ean39'),
+            tuple(s.gas.id for s in d.profile if s.gas))
+
+
 
 class DiveEnumIntegrationTestCase(IntegrationTestCaseBase):
     """
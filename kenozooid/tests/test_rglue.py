@@ -21,6 +21,7 @@ rpy integration functions tests.
 """
 
 from datetime import datetime
+from io import BytesIO
 import unittest
 
 import rpy2.robjects as ro
@@ -29,6 +30,8 @@ R = ro.r
 from kenozooid.rglue import _vec, bool_vec, float_vec, str_vec, int_vec, df, \
     dives_df, dive_profiles_df, inject_dive_data
 import kenozooid.data as kd
+import kenozooid.uddf as ku
+import kenozooid.tests.test_uddf as ktu
 
 class FloatVectorTestCase(unittest.TestCase):
     """
@@ -150,6 +153,23 @@ class DiveDataInjectTestCase(unittest.TestCase):
         self.assertEquals((0, 10, 20, 1, 11, 21, 2, 12, 22, 23, 25), tuple(d[2]))
 
 
+    def test_dive_profiles_df_columns(self):
+        """
+        Test dive profiles data frame creation with dive profile columns
+        """
+        nodes = ku.find(BytesIO(ktu.UDDF_PROFILE), '//uddf:dive')
+        dives = [ku.dive_data(n) for n in nodes]
+        d = dive_profiles_df(dives)
+        self.assertEquals(11, d.nrow)
+        self.assertEquals(13, d.ncol)
+        self.assertEquals((1, 1, 1, 2, 2, 2, 2, 3, 3, 3, 3), tuple(d[0]))
+
+        expected = dive_profiles_df(dive._replace(profile=list(dive.profile))
+            for dive in dives)
+        for c, e in zip(d, expected):
+            self.assertEquals(tuple(R['is.na'](e)), tuple(R['is.na'](c)))
+
+
     def test_dive_data_injection(self):
         """
         Test dive data injection
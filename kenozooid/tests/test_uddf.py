@@ -27,9 +27,12 @@ from datetime import datetime
 from functools import partial
 from dirty.xml import xml
 from collections import OrderedDict
+import base64
+import os
 import tempfile
 import shutil
 import unittest
+from unittest import mock
 
 import kenozooid.uddf as ku
 import kenozooid.data as kd
@@ -361,6 +364,136 @@ class FindDataTestCase(unittest.TestCase):
         self.assertEquals(kd.Sample(depth=8.32, time=30, temp=297.26), profile[3])
 
 
+    def test_dive_profile_lazy(self):
+        """
+        Test lazy dive profile of dive data
+        """
+        f = BytesIO(UDDF_PROFILE)
+        n1, n2, _ = ku.find(f, '//uddf:dive')
+        d1 = ku.dive_data(n1)
+        d2 = ku.dive_data(n2)
+
+        self.assertTrue(isinstance(d1.profile, ku.DiveProfile))
+        self.assertTrue(d1.profile.gases is d2.profile.gases)
+
+        # dive profile can be iterated more than once
+        p1 = list(d1.profile)
+        p2 = list(d1.profile)
+        self.assertEquals(3, len(p1))
+        self.assertEquals(p1, p2)
+        self.assertEquals(('air', None, 'ean39'),
+            tuple(None if s.gas is None else s.gas.id for s in p1))
+
+
+    def test_gas_map(self):
+        """
+        Test gas mixes map of a document
+        """
+        doc = ku.parse(BytesIO(UDDF_PROFILE))
+        n1, n2, _ = ku.xp(doc, '//uddf:dive')
+        gases = ku.gas_map(n1)
+        self.assertEquals(['air', 'ean39', 'tx1248'], sorted(gases))
+        self.assertTrue(gases is ku.gas_map(n2))
+
+        # gas mixes map is recreated on gas mixes modification
+        ku.remove_nodes(doc, ku.XPath('//uddf:mix[@id="air"]'))
+        self.assertEquals(['ean39', 'tx1248'], sorted(ku.gas_map(n1)))
+        self.assertEquals(['air', 'ean39', 'tx1248'], sorted(gases))
+
+
+    def test_dive_profile_detached(self):
+        """
+        Test dive profile of a dive detached from its document
+        """
+        f = BytesIO(UDDF_PROFILE)
+        dives = [ku.dive_data(n) for n in ku.iterfind_dives(f)]
+        p = list(dives[0].profile)
+        self.assertEquals('air', p[0].gas.id)
+        self.assertEquals('ean39', p[2].gas.id)
+
+
+    def test_profile_columns(self):
+        """
+        Test parsing UDDF dive profile data as columns
+        """
+        import numpy as np
+
+        f = BytesIO(UDDF_PROFILE)
+        n1, n2, _ = ku.find(f, '//uddf:dive')
+
+        p = ku.dive_profile_columns(n2)
+        self.assertEquals([2.61, 4.18, 6.25, 8.32], list(p.depth))
+        self.assertEquals([0, 10, 20, 30], list(p.time))
+        self.assertEquals(296.73, p.temp[0])
+        self.assertTrue(np.isnan(p.temp[1:3]).all())
+        self.assertEquals(297.26, p.temp[3])
+        self.assertTrue(np.isnan(p.setpoint).all())
+        self.assertEquals([-1] * 4, list(p.alarm))
+        self.assertEquals([-1] * 4, list(p.gas))
+        self.assertEquals((), p.alarms)
+        self.assertEquals((), p.gases)
+        self.assertTrue(all(c.dtype == np.float64 for c in p[:6]))
+
+        p = ku.dive_data(n1).profile.columns()
+        self.assertEquals([0, -1, 1], list(p.gas))
+        self.assertEquals(('air', 'ean39'), tuple(g.id for g in p.gases))
+
+
+    def test_iterfind_dives(self):
+        """
+        Test streaming search of dive nodes
+        """
+        f = BytesIO(UDDF_PROFILE)
+        ids = [n.get('id') for n in ku.iterfind_dives(f)]
+        self.assertEquals(['d01', 'd02', 'd03'], ids)
+
+        f = BytesIO(UDDF_PROFILE)
+        ids = [n.get('id') for n in ku.iterfind_dives(f, nodes='-1,3')]
+        self.assertEquals(['d01', 'd03'], ids)
+
+        f = BytesIO(UDDF_PROFILE)
+        ids = [n.get('id') for n in ku.iterfind_dives(f, dives='300-302')]
+        self.assertEquals(['d01'], ids)
+
+
+    def test_iterfind_dives_query(self):
+        """
+        Test streaming search of dive nodes is equivalent to dive XPath query
+        """
+        for nodes, dives in ((None, None), ('2-', None), ('1', '301')):
+            doc = et.parse(BytesIO(UDDF_PROFILE))
+            expected = [n.get('id') for n in
+                ku.XP_FIND_DIVES(doc, nodes=nodes, dives=dives)]
+            nodes = ku.iterfind_dives(BytesIO(UDDF_PROFILE), nodes, dives)
+            self.assertEquals(expected, [n.get('id') for n in nodes])
+
+
+    def test_iterfind_dives_detach(self):
+        """
+        Test streaming search of dive nodes detaches processed dive nodes
+        """
+        nodes = ku.iterfind_dives(BytesIO(UDDF_PROFILE))
+        n1 = next(nodes)
+        rg = n1.getparent()
+        self.assertTrue(rg is not None)
+
+        n2 = next(nodes)
+        self.assertTrue(n1.getparent() is None)
+        self.assertTrue(n2 is ku.xp_first(rg, 'uddf:dive'))
+
+        # detached dive node data is still available
+        self.assertEquals(301, ku.dive_data(n1).number)
+
+
+    def test_iterfind_dives_version(self):
+        """
+        Test streaming search of dive nodes with unsupported UDDF version
+        """
+        f = BytesIO(b'<uddf xmlns="http://www.streit.cc/uddf/3.1/"'
+                b' version="3.1.0"/>')
+        self.assertRaises(ValueError, list, ku.iterfind_dives(f))
+
+
     def test_dump_data(self):
         """
         Test parsing UDDF dive computer dump data
@@ -385,6 +518,40 @@ class FindDataTestCase(unittest.TestCase):
         self.assertEquals(b'01234567890abcdef', s)
 
 
+    def test_dump_data_codecs(self):
+        """
+        Test dive computer data encoding and decoding with all codecs
+        """
+        data = bytes(range(256)) * 1024
+        for codec in ku.DUMP_CODECS:
+            for level in (None, 1):
+                s = ku._dump_encode(data, codec, level).decode()
+                self.assertEquals(data, ku._dump_decode(s), codec)
+
+
+    def test_dump_data_decode_chunks(self):
+        """
+        Test dive computer data decoding in chunks
+        """
+        data = bytes(range(256)) * 1024
+        s = ku._dump_encode(data, 'zlib', 0).decode()
+        self.assertTrue(len(s) > ku.DUMP_CHUNK * 2)
+        self.assertEquals(data, ku._dump_decode(s))
+
+        # base64 data with new lines
+        s = '\n'.join(s[i:i + 76] for i in range(0, len(s), 76))
+        self.assertEquals(data, ku._dump_decode(s))
+
+
+    def test_dump_data_decode_error(self):
+        """
+        Test dive computer data decoding error
+        """
+        s = ku._dump_encode(b'01234567890abcdef', 'xz').decode()
+        self.assertRaises(ValueError, ku._dump_decode, s[:-8])
+        self.assertRaises(ValueError, ku._dump_decode, 'MDEyMzQ1Njc4OQ==')
+
+
     def test_site_data(self):
         """
         Test dive site data parsing
@@ -864,6 +1031,27 @@ class CreateDataTestCase(unittest.TestCase):
         self.assertEquals(b'QlpoOTFBWSZTWZdWXlwAAAAJAH/gPwAgACKMmAAUwAE0xwH5Gis6xNXmi7kinChIS6svLgA=', s)
 
 
+    def test_dump_data_encode_codec(self):
+        """
+        Test dive computer data encoding with default codec
+        """
+        with mock.patch('kenozooid.uddf.DUMP_CODEC', 'xz'):
+            s = ku._dump_encode(b'01234567890abcdef')
+        self.assertTrue(base64.b64decode(s).startswith(b'\xfd7zXZ'))
+
+
+    def test_dump_data_encode_level(self):
+        """
+        Test dive computer data encoding with invalid compression level
+        """
+        data = b'01234567890abcdef'
+        for codec, level in (('bz2', 0), ('xz', 10), ('zlib', 12)):
+            self.assertRaises(ValueError, ku._dump_encode, data, codec, level)
+        for codec, level in (('bz2', 1), ('xz', 0), ('zlib', 9)):
+            s = ku._dump_encode(data, codec, level)
+            self.assertEquals(data, ku._dump_decode(s.decode()))
+
+
     def test_create_site(self):
         """
         Test creating dive site data
@@ -1103,6 +1291,61 @@ class PostprocessingTestCase(unittest.TestCase):
         self.assertEquals(['2009-03-02T23:02:00', '2009-04-02T23:02:00'], times)
 
 
+    def test_insert_dive(self):
+        """
+        Test inserting dive into sorted repetition group
+        """
+        doc = ku.create()
+        _, rg = ku.create_node('uddf:profiledata/uddf:repetitiongroup',
+            parent=doc)
+        dive = lambda dt: ku.create_dive_data(datetime=dt, depth=10.0,
+            duration=600)
+
+        dates = (datetime(2010, 1, 2), datetime(2010, 1, 4),
+            datetime(2010, 1, 1), datetime(2010, 1, 3), datetime(2010, 1, 5))
+        for dt in dates:
+            self.assertTrue(ku.insert_dive(rg, dive(dt)) is not None)
+
+        # dive with the same start time is not inserted
+        self.assertTrue(ku.insert_dive(rg, dive(dates[0])) is None)
+
+        times = list(ku.xp(rg, 'uddf:dive/uddf:informationbeforedive/uddf:datetime/text()'))
+        self.assertEquals(['2010-01-0{}T00:00:00'.format(i) for i in range(1, 6)],
+            times)
+
+
+
+class DateTimeTestCase(unittest.TestCase):
+    """
+    Date and time parsing tests.
+    """
+    def test_iso(self):
+        """
+        Test parsing ISO 8601 date and time
+        """
+        dt = datetime(2010, 11, 7, 21, 13, 24)
+        self.assertEquals(dt, ku.parse_datetime('2010-11-07T21:13:24'))
+        self.assertEquals(dt, ku.parse_datetime('2010-11-07 21:13:24'))
+        self.assertEquals(dt, ku.parse_datetime(ku.FMT_DT(dt)))
+
+
+    def test_iso_tz(self):
+        """
+        Test parsing ISO 8601 date and time with time zone
+        """
+        dt = ku.dparse('2010-11-07T21:13:24+01:00')
+        self.assertEquals(dt, ku.parse_datetime('2010-11-07T21:13:24+01:00'))
+        self.assertEquals(dt, ku.parse_datetime(ku.FMT_DT(dt)))
+
+
+    def test_fallback(self):
+        """
+        Test parsing non-ISO 8601 date and time
+        """
+        dt = datetime(2010, 11, 7, 21, 13)
+        self.assertEquals(dt, ku.parse_datetime('Nov 7 2010 21:13'))
+
+
 
 class RangeTestCase(unittest.TestCase):
     """
@@ -1649,4 +1892,452 @@ class UDDFSaveTestCase(unittest.TestCase):
         self.assertEquals(b'BZh', data)
 
 
+    def test_save_invalid(self):
+        """
+        Test saving invalid UDDF document
+        """
+        f = '{}/save_test.uddf'.format(self.tdir)
+
+        doc = ku.create()
+        et.SubElement(doc, '{http://www.streit.cc/uddf/3.2/}invalid')
+        self.assertRaises(et.DocumentInvalid, ku.save, doc, f)
+        self.assertRaises(et.DocumentInvalid, ku.save, doc, f, 'fast')
+        self.assertFalse(os.path.exists(f))
+
+        ku.save(doc, f, validate='off')
+        self.assertTrue(os.path.exists(f))
+
+
+    def test_save_invalid_stream(self):
+        """
+        Test saving invalid UDDF data stream
+        """
+        f = '{}/save_test.uddf'.format(self.tdir)
+        data = et.tostring(ku.create()).decode()
+        data = data.replace('</uddf>', '<invalid/></uddf>')
+
+        self.assertRaises(et.DocumentInvalid, ku.save, [data], f)
+        ku.save([data], f, validate='fast')
+        ku.save([data], f, validate='off')
+
+
+    def test_save_validate_mode(self):
+        """
+        Test saving UDDF document with unknown validation mode
+        """
+        f = '{}/save_test.uddf'.format(self.tdir)
+        self.assertRaises(ValueError, ku.save, ku.create(), f, 'slow')
+
+
+    def test_schema_cache(self):
+        """
+        Test UDDF XML schema caching
+        """
+        self.assertTrue(ku.uddf_schema() is ku.uddf_schema())
+
+
+
+class DiveIndexTestCase(unittest.TestCase):
+    """
+    Dive index tests.
+    """
+    def setUp(self):
+        """
+        Create temporary directory with UDDF file.
+        """
+        self.tdir = tempfile.mkdtemp()
+        self.fn = '{}/index.uddf'.format(self.tdir)
+        with open(self.fn, 'wb') as f:
+            f.write(UDDF_PROFILE)
+
+        patcher = mock.patch('kenozooid.uddf.CACHE_FILES', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+    def tearDown(self):
+        """
+        Destroy temporary directory with test files.
+        """
+        shutil.rmtree(self.tdir)
+
+
+    def test_index_create(self):
+        """
+        Test dive index creation
+        """
+        self.assertTrue(ku.load_index(self.fn) is None)
+
+        dives = list(ku.index_dives(self.fn))
+        self.assertEquals(3, len(dives))
+        self.assertTrue(ku.load_index(self.fn) is not None)
+
+        d = dives[0]
+        self.assertEquals(301, d.number)
+        self.assertEquals(datetime(2009, 9, 19, 13, 10, 23), d.datetime)
+        self.assertEquals(30.2, d.depth)
+        self.assertEquals(20, d.duration)
+        self.assertEquals(251.4, d.temp)
+        self.assertEquals(10.1, d.avg_depth)
+        self.assertEquals('opencircuit', d.mode)
+        self.assertEquals('d01', d.id)
+        self.assertEquals(1, d.node)
+
+
+    def test_index_no_create(self):
+        """
+        Test dive index is not created by default
+        """
+        with mock.patch('kenozooid.uddf.CACHE_FILES', False):
+            dives = list(ku.index_dives(self.fn))
+            self.assertEquals(3, len(dives))
+            self.assertFalse(os.path.exists(ku.index_file(self.fn)))
+
+            # existing index is updated
+            ku._write_index(self.fn, [])
+            with open(self.fn, 'ab') as f:
+                f.write(b'\n')
+            self.assertEquals(3, len(list(ku.index_dives(self.fn))))
+            self.assertEquals(3, len(ku.load_index(self.fn)))
+        self.assertFalse(os.path.exists(ku.index_file(self.fn) + '.tmp'))
+
+
+    def test_index_query(self):
+        """
+        Test dive index search with node and dive number ranges
+        """
+        list(ku.index_dives(self.fn)) # create index
+
+        dives = ku.index_dives(self.fn, nodes='2-')
+        self.assertEquals(['d02', 'd03'], [d.id for d in dives])
+
+        dives = ku.index_dives(self.fn, dives='301')
+        self.assertEquals(['d01'], [d.id for d in dives])
+
+
+    def test_index_out_of_date(self):
+        """
+        Test dive index is not used when UDDF file changes
+        """
+        list(ku.index_dives(self.fn)) # create index
+
+        doc = ku.parse(self.fn)
+        ku.remove_nodes(doc, ku.XPath('//uddf:dive[@id="d02"]'))
+        et.ElementTree(doc.getroot()).write(self.fn + '.tmp')
+        shutil.move(self.fn + '.tmp', self.fn)
+
+        self.assertTrue(ku.load_index(self.fn) is None)
+        dives = ku.index_dives(self.fn)
+        self.assertEquals(['d01', 'd03'], [d.id for d in dives])
+
+
+    def test_index_save(self):
+        """
+        Test dive index update on UDDF file save
+        """
+        list(ku.index_dives(self.fn)) # create index
+
+        doc = ku.parse(self.fn)
+        ku.remove_nodes(doc, ku.XPath('//uddf:dive[@id="d01"]'))
+        ku.save(doc.getroot(), self.fn)
+
+        data = ku.load_index(self.fn)
+        self.assertEquals(['d02', 'd03'], [d[7] for d in data])
+
+
+
+class DocCacheTestCase(unittest.TestCase):
+    """
+    Parsed documents cache tests.
+    """
+    def setUp(self):
+        """
+        Create temporary directory with UDDF files.
+        """
+        ku._doc_cache.clear()
+        self.tdir = tempfile.mkdtemp()
+        self.files = ['{}/cache{}.uddf'.format(self.tdir, i) for i in range(3)]
+        for fn in self.files:
+            with open(fn, 'wb') as f:
+                f.write(UDDF_PROFILE)
+
+
+    def tearDown(self):
+        """
+        Destroy temporary directory with test files and clear the cache.
+        """
+        ku._doc_cache.clear()
+        shutil.rmtree(self.tdir)
+
+
+    def test_parse_cached(self):
+        """
+        Test parsing file with parsed documents cache
+        """
+        fn = self.files[0]
+        doc = ku.parse(fn, cache=True)
+        self.assertTrue(doc is ku.parse(fn, cache=True))
+        self.assertFalse(doc is ku.parse(fn))
+
+        n = next(ku.find(fn, '//uddf:dive'))
+        self.assertTrue(n.getroottree().getroot() is doc.getroot())
+
+
+    def test_parse_modified(self):
+        """
+        Test parsed documents cache is not changed by document modification
+        """
+        fn = self.files[0]
+        ids = list(ku.find(fn, '//uddf:dive/@id'))
+
+        doc = ku.parse(fn)
+        ku.remove_nodes(doc, ku.XPath('//uddf:dive[@id="d02"]'))
+        self.assertEquals(ids, list(ku.find(fn, '//uddf:dive/@id')))
+
+
+    def test_file_modified(self):
+        """
+        Test parsing modified file with parsed documents cache
+        """
+        fn = self.files[0]
+        doc = ku.parse(fn, cache=True)
+        with open(fn, 'ab') as f:
+            f.write(b'\n')
+        self.assertFalse(doc is ku.parse(fn, cache=True))
+
+
+    def test_save(self):
+        """
+        Test parsed documents cache invalidation on save
+        """
+        fn = self.files[0]
+        cached = ku.parse(fn, cache=True)
+        doc = ku.parse(fn)
+        ku.remove_nodes(doc, ku.XPath('//uddf:dive[@id="d02"]'))
+        ku.save(doc.getroot(), fn)
+
+        self.assertFalse(cached is ku.parse(fn, cache=True))
+        ids = list(ku.find(fn, '//uddf:dive/@id'))
+        self.assertEquals(['d01', 'd03'], ids)
+
+
+    def test_save_invalid(self):
+        """
+        Test parsed documents cache invalidation on saving invalid document
+        """
+        fn = self.files[0]
+        cached = ku.parse(fn, cache=True)
+        doc = ku.parse(fn)
+        et.SubElement(doc.getroot(), 'invalid')
+        self.assertRaises(et.DocumentInvalid, ku.save, doc.getroot(), fn)
+
+        self.assertFalse(cached is ku.parse(fn, cache=True))
+        ids = list(ku.find(fn, '//uddf:dive/@id'))
+        self.assertEquals(['d01', 'd02', 'd03'], ids)
+
+
+    def test_eviction(self):
+        """
+        Test parsed documents cache eviction
+        """
+        f1, f2, f3 = self.files
+        size = len(UDDF_PROFILE)
+
+        ku.DOC_CACHE_SIZE = 2
+        try:
+            d1 = ku.parse(f1, cache=True)
+            d2 = ku.parse(f2, cache=True)
+            ku.parse(f1, cache=True)  # f2 is least recently used now
+            ku.parse(f3, cache=True)
+        finally:
+            ku.DOC_CACHE_SIZE = 8
+        self.assertTrue(d1 is ku.parse(f1, cache=True))
+        self.assertFalse(d2 is ku.parse(f2, cache=True))
+
+        ku._doc_cache.clear()
+        ku.DOC_CACHE_BYTES = size * 2
+        try:
+            d1 = ku.parse(f1, cache=True)
+            ku.parse(f2, cache=True)
+            ku.parse(f3, cache=True)
+        finally:
+            ku.DOC_CACHE_BYTES = 64 * 1024 ** 2
+        self.assertEquals(2, len(ku._doc_cache))
+        self.assertFalse(d1 is ku.parse(f1, cache=True))
+
+
+    def test_iterfind_dives_cached(self):
+        """
+        Test finding dive nodes in cached document
+        """
+        fn = self.files[0]
+        doc = ku.parse(fn, cache=True)
+        nodes = list(ku.iterfind_dives(fn, nodes='1,3'))
+        self.assertEquals(['d01', 'd03'], [n.get('id') for n in nodes])
+        self.assertTrue(all(n.getroottree().getroot() is doc.getroot()
+            for n in nodes))
+
+
+
+class ProfileCacheTestCase(unittest.TestCase):
+    """
+    Dive profile cache tests.
+    """
+    def setUp(self):
+        """
+        Create temporary directory with UDDF file.
+        """
+        ku._doc_cache.clear()
+        self.tdir = tempfile.mkdtemp()
+        self.fn = '{}/profile.uddf'.format(self.tdir)
+        with open(self.fn, 'wb') as f:
+            f.write(UDDF_PROFILE)
+
+        patcher = mock.patch('kenozooid.uddf.CACHE_FILES', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+    def tearDown(self):
+        """
+        Destroy temporary directory with test files.
+        """
+        ku._doc_cache.clear()
+        shutil.rmtree(self.tdir)
+
+
+    def check_columns(self, p, expected):
+        """
+        Check dive profile columns against expected data.
+        """
+        import numpy as np
+
+        for c, e in zip(p[:-2], expected[:-2]):
+            self.assertEquals(e.dtype, c.dtype)
+            self.assertTrue(np.array_equal(c, e, equal_nan=True))
+        self.assertEquals(expected.alarms, p.alarms)
+        self.assertEquals(expected.gases, p.gases)
+
+
+    def test_cache_create(self):
+        """
+        Test dive profile cache creation
+        """
+        n1, n2, n3 = ku.find(BytesIO(UDDF_PROFILE), '//uddf:dive')
+        expected = [ku.dive_profile_columns(n) for n in (n1, n2, n3)]
+
+        nodes = list(ku.find(self.fn, '//uddf:dive'))
+        for n, e in zip(nodes, expected):
+            self.check_columns(ku.dive_profile_columns(n), e)
+        self.assertTrue(os.path.exists(ku.profile_file(self.fn)))
+
+        # read the cache for streamed dive nodes
+        ku._doc_cache.clear()
+        nodes = ku.iterfind_dives(self.fn)
+        for n, e in zip(nodes, expected):
+            p = ku.dive_profile_columns(n)
+            self.assertFalse(p.depth.flags.writeable)
+            self.check_columns(p, e)
+
+
+    def test_cache_no_create(self):
+        """
+        Test dive profile cache is not created by default
+        """
+        n = next(ku.find(self.fn, '//uddf:dive'))
+        with mock.patch('kenozooid.uddf.CACHE_FILES', False):
+            p = ku.dive_profile_columns(n)
+        self.assertTrue(p.depth.flags.writeable)
+        self.assertFalse(os.path.exists(ku.profile_file(self.fn)))
+
+
+    def test_cache_out_of_date(self):
+        """
+        Test reading dive profile data with out of date cache
+        """
+        n = next(ku.find(self.fn, '//uddf:dive'))
+        expected = ku.dive_profile_columns(n)
+
+        ku._doc_cache.clear()
+        with open(self.fn, 'ab') as f:
+            f.write(b'\n')
+
+        n = next(ku.iterfind_dives(self.fn))
+        p = ku.dive_profile_columns(n)
+        self.assertTrue(p.depth.flags.writeable)
+        self.check_columns(p, expected)
+
+
+    def test_cache_save(self):
+        """
+        Test dive profile cache update on save
+        """
+        import numpy as np
+
+        ku.dive_profile_columns(next(ku.find(self.fn, '//uddf:dive')))
+        doc = ku.parse(self.fn)
+        n = ku.xp_first(doc, '//uddf:dive[@id="d01"]')
+
+        ku.xp_first(n, './/uddf:waypoint/uddf:depth').text = '1.0'
+        ku.save(doc.getroot(), self.fn)
+
+        p = ku.dive_profile_columns(next(ku.iterfind_dives(self.fn)))
+        self.assertEquals(np.float64, p.depth.dtype)
+        self.assertEquals(1.0, p.depth[0])
+
+
+    def test_cache_save_error(self):
+        """
+        Test dive profile cache update error on save
+        """
+        ku.dive_profile_columns(next(ku.find(self.fn, '//uddf:dive')))
+        doc = ku.parse(self.fn)
+        n = ku.xp_first(doc, '//uddf:dive[@id="d01"]')
+        self.assertTrue(os.path.exists(ku.profile_file(self.fn)))
+
+        ku.xp_first(n, './/uddf:waypoint/uddf:depth').text = '1.0'
+        with mock.patch('kenozooid.uddf.save_profiles',
+                side_effect=ImportError('no numpy')):
+            ku.save(doc.getroot(), self.fn)
+
+        # the file is saved and the cache is removed
+        self.assertFalse(os.path.exists(ku.profile_file(self.fn)))
+        n = next(ku.find(self.fn, '//uddf:dive'))
+        self.assertEquals('1.0', ku.xp_first(n, './/uddf:depth/text()'))
+
+
+    def test_cache_missing_values(self):
+        """
+        Test dive profile cache with missing values and alarms
+        """
+        import numpy as np
+
+        doc = ku.parse(self.fn)
+        n = ku.xp_first(doc, '//uddf:dive[@id="d02"]')
+        wp = list(ku.xp(n, './/uddf:waypoint'))
+        wp[1].remove(ku.xp_first(wp[1], 'uddf:divetime'))
+        et.SubElement(wp[2], '{{{}}}alarm'.format(ku._NSMAP['uddf'])) \
+            .text = 'deco'
+        ku.save(doc.getroot(), self.fn, validate=False)
+
+        n = ku.xp_first(ku.parse(self.fn, cache=True),
+            '//uddf:dive[@id="d02"]')
+        expected = ku._profile_columns(n)
+        ku.dive_profile_columns(n)
+        self.assertTrue(os.path.exists(ku.profile_file(self.fn)))
+
+        # read the data from the cache
+        ku._doc_cache.clear()
+        n = list(ku.iterfind_dives(self.fn))[1]
+        p = ku.dive_profile_columns(n)
+        self.assertFalse(p.depth.flags.writeable)
+        self.assertTrue(np.isnan(p.time[1]))
+        self.assertEquals([-1, -1, 0, -1], list(p.alarm))
+        self.assertEquals(('deco',), p.alarms)
+        for c, e in zip(p[:-2], expected[:-2]):
+            self.assertEquals(e.dtype, c.dtype)
+            self.assertTrue(np.array_equal(c, e, equal_nan=True))
+
+
+
 # vim: sw=4:et:ai
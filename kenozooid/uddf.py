@@ -43,23 +43,30 @@ ElementTree XML data model is used for XML nodes.
 
 from collections import namedtuple, OrderedDict, Counter
 from lxml import etree as et
-from functools import partial
+from functools import partial, lru_cache
+from bisect import bisect_left
 from datetime import datetime
 from dateutil.parser import parse as dparse
 from io import FileIO
 from operator import itemgetter
 from uuid import uuid4 as uuid
 from copy import deepcopy
-from dirty.xml import xml
 from dirty import RawString
+from dirty.xml import xml
 import base64
 import bz2
 import itertools
 import hashlib
+import json
 import logging
+import lzma
+import mmap
 import os
 import os.path
 import pkg_resources
+import re
+import struct
+import zlib
 
 import kenozooid
 import kenozooid.util as kt
@@ -79,10 +86,37 @@ FMT_F2 = partial(str.format, '{0:.2f}')
 FMT_I = lambda v: '{}'.format(int(round(v)))
 FMT_DT = lambda dt: format(dt, '%Y-%m-%dT%H:%M:%S%z')
 
+
+def parse_datetime(s):
+    """
+    Parse UDDF date and time string.
+
+    Date and time in ISO 8601 format, i.e. formatted with `FMT_DT`, is
+    parsed with `datetime.fromisoformat`. Other strings are parsed with
+    much slower `dateutil.parser.parse` function.
+
+    :Parameters:
+     s
+        Date and time string.
+    """
+    try:
+        return datetime.fromisoformat(s)
+    except ValueError:
+        return dparse(s)
+
+
 #
 # Parsing and searching.
 #
 
+# maximum number of parsed documents and maximum total size of their files
+# kept in parsed documents cache
+DOC_CACHE_SIZE = 8
+DOC_CACHE_BYTES = 64 * 1024 ** 2
+
+# parsed documents cache: file path -> (file key, document)
+_doc_cache = OrderedDict()
+
 XPath = partial(et.XPath, namespaces=_NSMAP)
 XPath.__doc__ = """
     XPath query constructor for UDDF data.
@@ -128,6 +162,21 @@ XP_DEFAULT_GAS_DATA =  (
 
 # XPath query to locate dive profile sample
 XP_WAYPOINT = XPath('./uddf:samples/uddf:waypoint')
+
+# XPath queries for dive profile columns, see dive_profile_columns
+XP_PROFILE_COLUMNS = (
+    XPath('uddf:samples/uddf:waypoint/uddf:depth'),
+    XPath('uddf:samples/uddf:waypoint/uddf:divetime'),
+    XPath('uddf:samples/uddf:waypoint/uddf:temperature'),
+    XPath('uddf:samples/uddf:waypoint/uddf:setpo2'),
+    XPath('uddf:samples/uddf:waypoint/uddf:decostop'),
+    XPath('uddf:samples/uddf:waypoint/uddf:alarm'),
+    XPath('uddf:samples/uddf:waypoint/uddf:switchmix'),
+)
+
+# dive profile columns, see dive_profile_columns
+ProfileColumns = namedtuple('ProfileColumns', 'depth time temp setpoint'
+    ' deco_time deco_depth alarm gas alarms gases')
 # XPath query to locate gas mix
 XP_MIX = XPath('/uddf:uddf/uddf:gasdefinitions/uddf:mix')
 
@@ -182,6 +231,9 @@ XP_FIND_DIVES = XPath('/uddf:uddf/uddf:profiledata' \
     '/uddf:repetitiongroup/uddf:dive[in-range(position(), $nodes)' \
     ' and in-range(uddf:informationbeforedive/uddf:divenumber/text(), $dives)]')
 
+# XPath query to find total dive number of a dive
+XP_DIVE_NUMBER = XPath('uddf:informationbeforedive/uddf:divenumber/text()')
+
 # XPath query to find dive gases
 XP_FIND_DIVE_GASES = XPath('/uddf:uddf/uddf:gasdefinitions' \
     '/uddf:mix[@id=/uddf:uddf/uddf:profiledata/uddf:repetitiongroup' \
@@ -199,7 +251,7 @@ class RangeError(ValueError):
     pass
 
 
-def parse(f, ver_check=True):
+def parse(f, ver_check=True, cache=False):
     """
     Parse XML file and return document object.
 
@@ -208,22 +260,27 @@ def parse(f, ver_check=True):
     If file to parse is file name and ends with '.bz2', then it is treated
     as file compressed with bzip2.
 
+    If file to parse is file name and parsed documents cache is used, then
+    the document is stored in the cache and the cached document is
+    returned while the file is not modified. The cached document is shared
+    between the callers, therefore it shall not be modified. Use the cache
+    for read-only access only.
+
     :Parameters:
      f
         File to parse.
      ver_check
         Check version of UDDF file.
-    """
-    if isinstance(f, str) and (f.endswith('.bz2') or f.endswith('.bz2.bak')):
-        log.debug('detected compressed file')
-        f = bz2.BZ2File(f)
-    doc = et.parse(f)
+     cache
+        Use parsed documents cache if true.
+    """
+    doc = _cache_get(f) if cache else None
+    if doc is None:
+        doc = et.parse(_open(f))
+        if cache:
+            _cache_put(f, doc)
     if ver_check:
-        v1, v2, *_ = doc.getroot().get('version').split('.')
-        if (v1, v2) != ('3', '2'):
-            raise ValueError('UDDF file version {}.{} is not supported.' \
-                    ' Please upgrade file with "kz upgrade" command.' \
-                    .format(v1, v2))
+        _check_version(doc.getroot())
     return doc
 
 
@@ -237,6 +294,9 @@ def find(f, query, **params):
     File to parse can be a file name ending with '.bz2'. It is treated as
     file compressed with bzip2.
 
+    The file is parsed with parsed documents cache, so the found nodes
+    shall not be modified.
+
     :Parameters:
      f
         UDDF file to parse.
@@ -249,13 +309,81 @@ def find(f, query, **params):
     """
     log.debug('parsing and searching with query: {}; parameters {}' \
             .format(query, params))
-    doc = parse(f)
+    doc = parse(f, cache=True)
     if isinstance(query, str):
         return xp(doc, query)
     else:
         return (n for n in query(doc, **params))
 
 
+def iterfind_dives(f, nodes=None, dives=None):
+    """
+    Find dive nodes in UDDF file using optional numeric range of nodes or
+    total dive number.
+
+    The search is equivalent to :py:data:`XP_FIND_DIVES` query, but the
+    file is parsed incrementally with `lxml.etree.iterparse`, so whole
+    document is never loaded into memory. A dive node is detached from the
+    document when next dive node is requested and dive nodes not matching
+    the search criteria are discarded as soon as they are parsed. Keep a
+    reference to a dive node to use it after iteration continues.
+
+    If the document of UDDF file is in parsed documents cache, then the
+    cached document is searched and dive nodes are not detached. The dive
+    nodes shall not be modified in such case.
+
+    Generator of dive nodes is returned.
+
+    :Parameters:
+     f
+        UDDF file to parse.
+     nodes
+        Numeric range of nodes, `None` if all nodes.
+     dives
+        Numeric range of total dive number, `None` if any dive.
+
+    .. seealso:: :py:func:`find`, :py:func:`parse_range`
+    """
+    log.debug('streaming dives with nodes: {}, dives: {}'.format(nodes, dives))
+    ns = '{' + _NSMAP['uddf'] + '}'
+    # root node of any namespace to check version of UDDF file
+    tags = '{*}uddf', ns + 'repetitiongroup', ns + 'dive'
+    doc = _cache_get(f)
+    if doc is not None:
+        _check_version(doc.getroot())
+        yield from XP_FIND_DIVES(doc, nodes=nodes, dives=dives)
+        return
+
+    in_nodes = _range_func(nodes)
+    in_dives = _range_func(dives)
+
+    ctx = et.iterparse(_open(f), events=('start', 'end'), tag=tags)
+    pos = 0
+    last = None
+    for event, n in ctx:
+        if event == 'start':
+            if n.getparent() is None:
+                _check_version(n)
+            elif n.tag == tags[1]:
+                pos = 0 # position of dive node within repetition group
+            continue
+
+        if n.tag != tags[2] or not _is_profile_dive(n):
+            continue
+
+        if last is not None:
+            last.getparent().remove(last)
+            last = None
+
+        pos += 1
+        num = _dive_number(n) if dives else None
+        if in_nodes(pos) and (not dives or num is not None and in_dives(num)):
+            last = n
+            yield n
+        else:
+            n.getparent().remove(n)
+
+
 def xp(node, query):
     """
     Find items with XPath query.
@@ -389,12 +517,57 @@ def dive_data(node, fields=None, queries=None, parsers=None):
         fields = ('number', 'datetime', 'depth', 'duration', 'temp',
             'avg_depth', 'mode', 'profile')
         queries = XP_DEFAULT_DIVE_DATA
-        parsers = (int, dparse, float, float, float, float, str, dive_profile)
+        parsers = (int, parse_datetime, float, float, float, float, str,
+            DiveProfile)
 
     return find_data('Dive', node, fields, queries, parsers)
 
 
-def dive_profile(node, fields=None, queries=None, parsers=None):
+class DiveProfile(object):
+    """
+    Dive profile, which is iterable of dive profile records.
+
+    The dive profile records are extracted from dive node when dive profile
+    is iterated, see :py:func:`dive_profile`. Gas mixes map is obtained on
+    dive profile creation, so the dive profile can be iterated even if
+    dive node is detached from its document later.
+
+    :Attributes:
+     node
+        Dive node.
+     gases
+        Gas mixes map of dive node document.
+    """
+    def __init__(self, node):
+        """
+        Create dive profile of a dive node.
+
+        :Parameters:
+         node
+            Dive node.
+        """
+        self.node = node
+        self.gases = gas_map(node)
+
+
+    def __iter__(self):
+        """
+        Iterate over dive profile records.
+        """
+        return dive_profile(self.node, gases=self.gases)
+
+
+    def columns(self):
+        """
+        Get dive profile data as columns.
+
+        .. seealso:: :py:func:`dive_profile_columns`
+        """
+        return dive_profile_columns(self.node, gases=self.gases)
+
+
+
+def dive_profile(node, fields=None, queries=None, parsers=None, gases=None):
     """
     Specialized function to return generator of dive profiles records.
 
@@ -419,14 +592,17 @@ def dive_profile(node, fields=None, queries=None, parsers=None):
         XPath expression objects for each field to retrieve its value.
      parsers
         Parsers of field values to be created in a record.
+     gases
+        Gas mixes map, by default gas mixes map of dive node document.
 
-    .. seealso:: :py:func:`find_data`
+    .. seealso:: :py:func:`find_data`, :py:func:`gas_map`
     """
     if fields is None:
         fields = ('depth', 'time', 'temp', 'setpoint', 'setpointby',
                 'deco_time', 'deco_depth', 'alarm', 'gas')
         queries = XP_DEFAULT_PROFILE_DATA
-        gases = dict(((gas.id, gas) for gas in gas_data(node)))
+        if gases is None:
+            gases = gas_map(node)
         parsers = (float, ) * 4 + (str, float, float, str, gases.get)
 
     return find_data('Sample', node, fields, queries, parsers,
@@ -443,6 +619,150 @@ def gas_data(node, fields=None, queries=None, parsers=None):
             nquery=XP_MIX)
 
 
+def dive_profile_columns(node, gases=None):
+    """
+    Get dive profile data as columns (struct of arrays).
+
+    The data of each column is fetched with single XPath query for whole
+    dive and the data is returned as record of NumPy arrays
+
+    depth
+        dive depth in meters
+    time
+        dive time in seconds
+    temp
+        temperature in Kelvins
+    setpoint
+        ppO2 setpoint
+    deco_time
+        decompression stop duration
+    deco_depth
+        decompression stop depth
+    alarm
+        alarm index in `alarms` tuple, -1 if no alarm
+    gas
+        gas mix index in `gases` tuple, -1 if no gas mix switch
+    alarms
+        tuple of alarm names
+    gases
+        tuple of gas data records
+
+    Float arrays use `float64` type and contain NaN for missing values.
+    Index arrays use `int16` type.
+
+    If dive node belongs to a document parsed from a file, then the data
+    is read from dive profile cache of the file, see
+    :py:func:`save_profiles`. The arrays read from the cache are
+    read-only, otherwise the data is the same as the data read from XML.
+    The cache reflects content of the file, therefore modifications of
+    a document, which are not saved, are not visible.
+
+    NumPy module is required.
+
+    :Parameters:
+     node
+        Dive node.
+     gases
+        Gas mixes map, by default gas mixes map of dive node document.
+
+    .. seealso:: :py:func:`dive_profile`, :py:func:`gas_map`
+    """
+    if gases is None:
+        gases = gas_map(node)
+
+    data = _cached_profile_columns(node)
+    if data is None:
+        data = _profile_columns(node)
+
+    *columns, alarms, codes = data
+    return ProfileColumns(*columns, tuple(alarms),
+        tuple(gases.get(c) for c in codes))
+
+
+def _profile_columns(node):
+    """
+    Get dive profile data as columns from XML data of dive node.
+
+    Tuple of dive profile columns, list of alarm names and list of gas mix
+    ids is returned.
+
+    :Parameters:
+     node
+        Dive node.
+
+    .. seealso:: :py:func:`dive_profile_columns`
+    """
+    import numpy as np
+
+    waypoints = XP_WAYPOINT(node)
+    n = len(waypoints)
+    pos = dict((wp, i) for i, wp in enumerate(waypoints))
+    alarms = OrderedDict()
+    codes = OrderedDict()
+
+    def column(query, value, dtype=float, na=np.nan):
+        nodes = query(node)
+        data = np.full(n, na, dtype=dtype)
+        data[[pos[k.getparent()] for k in nodes]] = [value(k) for k in nodes]
+        return data
+
+    text = lambda k: float(k.text)
+    depth, time, temp, setpoint = (column(q, text)
+        for q in XP_PROFILE_COLUMNS[:4])
+    deco_time = column(XP_PROFILE_COLUMNS[4],
+        lambda k: float(k.get('duration')))
+    deco_depth = column(XP_PROFILE_COLUMNS[4],
+        lambda k: float(k.get('decodepth')))
+    alarm = column(XP_PROFILE_COLUMNS[5],
+        lambda k: alarms.setdefault(k.text, len(alarms)),
+        dtype=np.int16, na=-1)
+    gas = column(XP_PROFILE_COLUMNS[6],
+        lambda k: codes.setdefault(k.get('ref'), len(codes)),
+        dtype=np.int16, na=-1)
+
+    return depth, time, temp, setpoint, deco_time, deco_depth, alarm, gas, \
+        list(alarms), list(codes)
+
+
+def gas_map(node):
+    """
+    Get gas mixes map of UDDF document, which is dictionary of gas mix
+    id and gas data record.
+
+    The maps are cached with gas definitions data of a document as the
+    key, so the map is created once per document and the cache does not
+    keep references to the documents. The map is recreated if gas mixes of
+    the document are modified.
+
+    :Parameters:
+     node
+        Any node of UDDF document.
+
+    .. seealso:: :py:func:`gas_data`
+    """
+    root = node.getroottree().getroot()
+    gn = xp_first(root, 'uddf:gasdefinitions')
+    key = b'' if gn is None else et.tostring(gn)
+
+    gases = _gas_map_cache.get(key)
+    if gases is None:
+        gases = dict((gas.id, gas) for gas in gas_data(root))
+        _gas_map_cache[key] = gases
+        log.debug('created gas mixes map: {}'.format(', '.join(gases)))
+        if len(_gas_map_cache) > GAS_MAP_CACHE_SIZE:
+            _gas_map_cache.popitem(last=False)
+    else:
+        _gas_map_cache.move_to_end(key)
+    return gases
+
+# maximum number of gas mixes maps kept in the cache
+GAS_MAP_CACHE_SIZE = 8
+
+# cache of gas mixes maps: gas definitions data -> gas mixes map, see
+# gas_map
+_gas_map_cache = OrderedDict()
+
+
 def dump_data(node, fields=None, queries=None, parsers=None):
     """
     Get dive computer dump data.
@@ -473,7 +793,7 @@ def dump_data(node, fields=None, queries=None, parsers=None):
     if fields is None:
         fields = ('dc_id', 'dc_model', 'datetime', 'data')
         queries = XP_DEFAULT_DUMP_DATA
-        parsers = (str, str, dparse, _dump_decode)
+        parsers = (str, str, parse_datetime, _dump_decode)
     return find_data('DiveComputerDump', node, fields, queries, parsers)
 
 
@@ -631,6 +951,173 @@ ns = et.FunctionNamespace(None)
 ns['in-range'] = in_range
 
 
+def _range_func(s):
+    """
+    Create function checking if a number is within numeric range.
+
+    If range is not specified, then the function accepts any number.
+
+    :Parameters:
+     s
+        Textual representation of number range.
+
+    .. seealso:: :py:func:`parse_range`
+    """
+    if not s:
+        return lambda n: True
+    return eval('lambda n: {}'.format(parse_range(s)))
+
+
+def _open(f):
+    """
+    Open file to parse.
+
+    If file is file name and ends with '.bz2', then it is opened as file
+    compressed with bzip2. Otherwise, the file is returned as is.
+
+    :Parameters:
+     f
+        File to open.
+    """
+    if isinstance(f, str) and (f.endswith('.bz2') or f.endswith('.bz2.bak')):
+        log.debug('detected compressed file')
+        f = bz2.BZ2File(f)
+    return f
+
+
+def _cache_key(f):
+    """
+    Get parsed documents cache key of a file.
+
+    Tuple of absolute path of a file and file key is returned. The file key
+    is file modification time, size and inode number. If file is not file
+    name or file does not exist, then `None` is returned.
+
+    :Parameters:
+     f
+        File name.
+    """
+    if not isinstance(f, str):
+        return None
+    try:
+        st = os.stat(f)
+    except OSError:
+        return None
+    return os.path.abspath(f), (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _cache_get(f):
+    """
+    Get document of a file from parsed documents cache.
+
+    If the document is not in the cache or the file was modified since the
+    document was cached, then `None` is returned.
+
+    :Parameters:
+     f
+        File name.
+    """
+    key = _cache_key(f)
+    if key is None:
+        return None
+
+    fn, fk = key
+    ck, doc = _doc_cache.get(fn, (None, None))
+    if ck != fk:
+        return None
+
+    _doc_cache.move_to_end(fn)
+    log.debug('parsed document cache hit: {}'.format(fn))
+    return doc
+
+
+def _cache_put(f, doc):
+    """
+    Store document of a file in parsed documents cache.
+
+    Least recently used documents are evicted from the cache when the cache
+    exceeds :py:data:`DOC_CACHE_SIZE` documents or total size of the
+    documents files exceeds :py:data:`DOC_CACHE_BYTES` bytes. File larger
+    than the size limit is not cached.
+
+    :Parameters:
+     f
+        File name.
+     doc
+        Document of the file.
+    """
+    key = _cache_key(f)
+    if key is None or key[1][1] > DOC_CACHE_BYTES:
+        return
+
+    fn, fk = key
+    _doc_cache[fn] = fk, doc
+    _doc_cache.move_to_end(fn)
+
+    size = sum(k[1] for k, _ in _doc_cache.values())
+    while len(_doc_cache) > DOC_CACHE_SIZE or size > DOC_CACHE_BYTES:
+        fn, (fk, _) = _doc_cache.popitem(last=False)
+        size -= fk[1]
+        log.debug('parsed document evicted from cache: {}'.format(fn))
+
+
+def _cache_del(f):
+    """
+    Remove document of a file from parsed documents cache.
+
+    :Parameters:
+     f
+        File name.
+    """
+    if isinstance(f, str):
+        _doc_cache.pop(os.path.abspath(f), None)
+
+
+def _check_version(root):
+    """
+    Check if UDDF document version is supported.
+
+    :Parameters:
+     root
+        UDDF document root node.
+    """
+    v1, v2, *_ = root.get('version').split('.')
+    if (v1, v2) != ('3', '2'):
+        raise ValueError('UDDF file version {}.{} is not supported.' \
+                ' Please upgrade file with "kz upgrade" command.' \
+                .format(v1, v2))
+
+
+def _is_profile_dive(node):
+    """
+    Check if dive node is located at
+    ``/uddf:uddf/uddf:profiledata/uddf:repetitiongroup``.
+
+    :Parameters:
+     node
+        Dive node.
+    """
+    rg = node.getparent()
+    pd = None if rg is None else rg.getparent()
+    root = None if pd is None else pd.getparent()
+    return root is not None and root.getparent() is None \
+        and pd.tag == '{' + _NSMAP['uddf'] + '}profiledata'
+
+
+def _dive_number(node):
+    """
+    Get total dive number of a dive node.
+
+    If dive has no dive number, then `None` is returned.
+
+    :Parameters:
+     node
+        Dive node.
+    """
+    v = XP_DIVE_NUMBER(node)
+    return int(v[0]) if v else None
+
+
 def _field(node, query, parser):
     """
     Find text value of a node starting from specified XML node.
@@ -676,13 +1163,72 @@ def _record(rt, node, queries, parsers):
     return rt(_field(node, f, p) for f, p in zip(queries, parsers))
 
 
+#
+# Dive computer dump data codecs.
+#
+# The compressed data of each codec starts with magic bytes, so the codec
+# is identified on decoding without additional dive computer dump
+# metadata (dcdump element is of base64 binary type).
+#
+# The compress function of a codec accepts data and compression level
+# (`None` for default level). The decompressor is a factory of objects
+# with ``decompress`` method and ``eof`` attribute. The levels attribute
+# is range of valid compression levels.
+#
+DumpCodec = namedtuple('DumpCodec', 'magic compress decompressor levels')
+
+DUMP_CODECS = OrderedDict((
+    ('bz2', DumpCodec(b'BZh',
+        lambda data, level: bz2.compress(data, 9 if level is None else level),
+        bz2.BZ2Decompressor,
+        range(1, 10))),
+    ('xz', DumpCodec(b'\xfd7zXZ\x00',
+        lambda data, level: lzma.compress(data, preset=level),
+        lzma.LZMADecompressor,
+        range(0, 10))),
+    ('zlib', DumpCodec(b'\x78',
+        lambda data, level: zlib.compress(data, -1 if level is None else level),
+        zlib.decompressobj,
+        range(0, 10))),
+))
+
+# default codec and compression level used to encode dive computer dump
+# data, see DUMP_CODECS
+DUMP_CODEC = 'bz2'
+DUMP_LEVEL = None
+
+# amount of base64 characters decoded at once (multiply of 4)
+DUMP_CHUNK = 64 * 1024
+
+RE_SPACE = re.compile(r'\s')
+
 def _dump_decode(data):
     """
     Decode dive computer data, which is stored in UDDF dive computer dump
     file.
+
+    The base64 encoded data is decoded and decompressed in chunks. The
+    codec is identified with magic bytes of compressed data (see
+    :py:data:`DUMP_CODECS`).
     """
-    s = base64.b64decode(data.encode())
-    return bz2.decompress(s)
+    # chunks of base64 data have to be aligned
+    if RE_SPACE.search(data):
+        data = ''.join(data.split())
+
+    chunks = (base64.b64decode(data[i:i + DUMP_CHUNK])
+        for i in range(0, len(data), DUMP_CHUNK))
+    s = next(chunks, b'')
+    codec = next((c for c in DUMP_CODECS.values() if s.startswith(c.magic)),
+        None)
+    if codec is None:
+        raise ValueError('Unknown dive computer dump data codec')
+
+    dec = codec.decompressor()
+    result = [dec.decompress(s)]
+    result.extend(dec.decompress(s) for s in chunks)
+    if not dec.eof:
+        raise ValueError('Truncated dive computer dump data')
+    return b''.join(result)
 
 
 #
@@ -961,13 +1507,28 @@ def create_site_data(node, queries=None, formatters=None, **data):
     return site
         
 
-def _dump_encode(data):
+def _dump_encode(data, codec=None, level=None):
     """
     Encode dive computer data, so it can be stored in UDDF file.
 
     The encoded string is returned.
-    """
-    s = bz2.compress(data)
+
+    :Parameters:
+     data
+        Dive computer data.
+     codec
+        Name of codec, :py:data:`DUMP_CODEC` by default.
+     level
+        Compression level, :py:data:`DUMP_LEVEL` by default.
+    """
+    if codec is None:
+        codec = DUMP_CODEC
+        level = DUMP_LEVEL if level is None else level
+    c = DUMP_CODECS[codec]
+    if level is not None and level not in c.levels:
+        raise ValueError('Invalid compression level {} of codec {}'
+            .format(level, codec))
+    s = c.compress(data, level)
     return base64.b64encode(s)
 
 
@@ -1136,6 +1697,43 @@ def create_dump_data(dc_id, datetime, data):
     )
 
 
+# default UDDF data validation mode used by save function, one of
+# VALIDATE_MODES
+VALIDATE = 'full'
+VALIDATE_MODES = ('full', 'fast', 'off')
+
+
+@lru_cache(maxsize=1)
+def uddf_schema():
+    """
+    Get UDDF XML schema.
+
+    The schema is loaded and compiled once per process.
+    """
+    fs = pkg_resources.resource_stream('kenozooid', 'uddf/uddf_3.2.0.xsd')
+    if hasattr(fs, 'name'):
+        log.debug('uddf xsd found: {}'.format(fs.name))
+    return et.XMLSchema(et.parse(fs))
+
+
+def assert_valid(doc):
+    """
+    Validate UDDF document with UDDF XML schema.
+
+    `lxml.etree.DocumentInvalid` exception is raised if the document is not
+    valid.
+
+    :Parameters:
+     doc
+        UDDF document or its root node.
+
+    .. seealso:: :py:func:`uddf_schema`
+    """
+    log.debug('validating uddf data')
+    uddf_schema().assertValid(doc)
+    log.debug('uddf data is valid')
+
+
 def save(doc, fout, validate=True):
     """
     Save UDDF XML data into a file.
@@ -1145,18 +1743,50 @@ def save(doc, fout, validate=True):
 
     The UDDF XML data can be ElementTree XML object or iterable of strings.
 
+    The UDDF XML data is validated with one of the modes
+
+    full
+        ElementTree XML object is validated before writing, iterable of
+        strings is validated after writing by parsing the output file
+    fast
+        ElementTree XML object is validated before writing, iterable of
+        strings is not validated
+    off
+        the data is not validated
+
+    Validate full mode is used by default, see :py:data:`VALIDATE`.
+
     If output file exists then backup file with ``.bak`` extension is
     created.
 
+    If dive index or dive profile cache of output file exists, then the
+    index or the cache is updated, see :py:func:`index_dives` and
+    :py:func:`save_profiles`.
+
+    The document of output file is removed from parsed documents cache.
+
     :Parameters:
      doc
         UDDF XML data.
      fout
         Output file.
      validate
-        Validate UDDF file after saving if True.
+        Validation mode, default validation mode if True, no validation if
+        False.
     """
     log.debug('saving uddf file')
+    mode = VALIDATE if validate is True else validate or 'off'
+    if mode not in VALIDATE_MODES:
+        raise ValueError('Unknown validation mode: {}'.format(mode))
+
+    # the document might be changed, so remove it from the cache even if
+    # it is not valid
+    _cache_del(fout)
+
+    is_element = et.iselement(doc)
+    if is_element and mode != 'off':
+        assert_valid(doc)
+
     is_fn = isinstance(fout, str)
     openf = open
     if is_fn and fout.endswith('.bz2'):
@@ -1170,7 +1800,7 @@ def save(doc, fout, validate=True):
     try:
         f = openf(fout, 'wb') if is_fn else fout
 
-        if et.iselement(doc):
+        if is_element:
             et.ElementTree(doc).write(f,
                     encoding='utf-8',
                     xml_declaration=True,
@@ -1178,24 +1808,59 @@ def save(doc, fout, validate=True):
         else:
             f.writelines(l.encode('utf-8') for l in doc)
 
-        if validate:
-            log.debug('validating uddf file')
-            fs = pkg_resources.resource_stream('kenozooid', 'uddf/uddf_3.2.0.xsd')
-            if hasattr(fs, 'name'):
-                log.debug('uddf xsd found: {}'.format(fs.name))
-            schema = et.XMLSchema(et.parse(fs))
+        if is_fn:
+            f.close()
+
+        if not is_element and mode == 'full':
             if is_fn:
                 f = openf(fout)
             else:
                 f.seek(0)
-            schema.assertValid(et.parse(f))
-            log.debug('uddf file is valid')
+            assert_valid(et.parse(f))
+            if is_fn:
+                f.close()
+
     except Exception as ex:
         if os.path.exists(fbk):
             os.rename(fbk, fout)
             log.debug('backup file restored')
         raise ex
 
+    # update dive index and dive profile cache if they are used
+    if is_fn and is_element:
+        _save_cache_file(index_file(fout), save_index, doc, fout)
+        _save_cache_file(profile_file(fout), save_profiles, doc, fout)
+
+
+def _save_cache_file(fn, save_f, doc, fout):
+    """
+    Update dive index or dive profile cache file of UDDF file if the file
+    exists.
+
+    If the update fails, then the error is logged and the file is
+    removed, so out of date data is not used.
+
+    :Parameters:
+     fn
+        Dive index or dive profile cache file name.
+     save_f
+        Function saving the file.
+     doc
+        UDDF document.
+     fout
+        UDDF file name.
+    """
+    if not os.path.exists(fn):
+        return
+    try:
+        save_f(doc, fout)
+    except Exception as ex:
+        log.warn('cannot update {}: {}'.format(fn, ex))
+        try:
+            os.remove(fn)
+        except OSError:
+            pass
+
 
 #
 # Removing UDDF data.
@@ -1253,21 +1918,264 @@ def reorder(doc):
 
     dives = {}
     for n, t in zip(nodes, times):
-        dt = dparse(t) # don't rely on string representation for sorting
+        dt = parse_datetime(t) # don't rely on string representation for sorting
         if dt not in dives:
             dives[dt] = n
 
-    log.debug('removing old repetition groups')
-    for rg in rgroups: # cleanup old repetition groups
-        pd.remove(rg)
     rg, = create_node('uddf:repetitiongroup', parent=pd)
     _set_id(rg)
 
-    # sort dive nodes by dive time
+    # sort dive nodes by dive time; move the nodes before removal of old
+    # repetition groups as moving nodes out of detached subtree is very
+    # slow with lxml
     log.debug('sorting dives')
     for dt, n in sorted(dives.items(), key=itemgetter(0)):
         rg.append(n)
 
+    log.debug('removing old repetition groups')
+    for n in rgroups: # cleanup old repetition groups
+        pd.remove(n)
+
+
+def insert_dive(rg, node):
+    """
+    Insert dive node into repetition group, which dives are sorted by dive
+    start time.
+
+    The dive node is inserted at position found with binary search, so
+    start time is parsed only for a few dives of the repetition group.
+    The dive node is not inserted if a dive with the same start time
+    exists.
+
+    Dive node is returned or `None` if it is not inserted.
+
+    :Parameters:
+     rg
+        Repetition group node.
+     node
+        Dive node to insert.
+
+    .. seealso:: :py:func:`reorder`
+    """
+    start = lambda n: parse_datetime(XP_DEFAULT_DIVE_DATA[1](n)[0])
+    key = start(node)
+    dives = list(xp(rg, 'uddf:dive'))
+
+    lo, hi = 0, len(dives)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if start(dives[mid]) < key:
+            lo = mid + 1
+        else:
+            hi = mid
+
+    if lo == len(dives):
+        rg.append(node)
+    elif start(dives[lo]) == key:
+        log.debug('dive {} already exists, not inserting'.format(key))
+        return None
+    else:
+        dives[lo].addprevious(node)
+    return node
+
+
+def is_ordered(rg):
+    """
+    Check if dives of repetition group are sorted by dive start time and
+    there are no duplicate dives.
+
+    :Parameters:
+     rg
+        Repetition group node.
+
+    .. seealso:: :py:func:`reorder`
+    """
+    dives = list(xp(rg, 'uddf:dive'))
+    times = list(xp(rg, 'uddf:dive/uddf:informationbeforedive/uddf:datetime/text()'))
+    if len(dives) != len(times):
+        return False
+    times = [parse_datetime(t) for t in times]
+    return all(t1 < t2 for t1, t2 in zip(times, times[1:]))
+
+
+# UDDF file data markers used to append dives to UDDF file, see
+# append_dives
+RE_XML_ENCODING = re.compile(br'<\?xml[^>]*encoding=["\']([\w.-]+)["\']')
+RE_UDDF_ROOT = re.compile(r'<uddf\s[^>]*xmlns="{}"'.format(_NSMAP['uddf']))
+RE_RG_START = re.compile(r'<repetitiongroup[\s/>]')
+RE_RG_END = re.compile(r'</repetitiongroup\s*>')
+RE_DIVE_START = re.compile(r'<dive[\s/>]')
+RE_GASDEF_START = re.compile(r'<gasdefinitions[\s/>]')
+RE_GASDEF_END = re.compile(r'</gasdefinitions\s*>')
+RE_GASDEF_NEXT = re.compile(r'<(decomodel|profiledata)[\s/>]')
+
+# default namespace declaration of UDDF node serialized with lxml
+XMLNS_UDDF = ' xmlns="{}"'.format(_NSMAP['uddf'])
+
+
+def append_dives(f, dives, gases):
+    """
+    Append dives and gases to UDDF file without parsing and rewriting
+    whole UDDF document.
+
+    The dives are appended if
+
+    - UDDF file is not compressed and has one repetition group
+    - dives of the repetition group are sorted by dive start time
+
+    Otherwise `None` is returned before dives and gases are read and the
+    caller shall update UDDF document, i.e. with :py:func:`reorder`.
+
+    The ids of UDDF file nodes and dive start times are read from dive
+    index (see :py:func:`index_dives`). If the index is out of date, then
+    UDDF file is parsed once to recreate it.
+
+    The dives and gases are copied into a new UDDF document, which is
+    validated, see :py:data:`VALIDATE`. Then the nodes are serialized and
+    inserted into UDDF file data, so existing data is not changed. A dive
+    is not appended if a dive with the same start time exists.
+
+    Number of appended dives is returned.
+
+    :Parameters:
+     f
+        UDDF file name.
+     dives
+        Collection of dive nodes.
+     gases
+        Collection of gas nodes.
+
+    .. seealso:: :py:class:`NodeCopier`
+    """
+    if f.endswith('.bz2'):
+        return None
+
+    with open(f, 'rb') as fi:
+        data = fi.read()
+    m = RE_XML_ENCODING.match(data)
+    if m and m.group(1).lower() not in (b'utf-8', b'utf8'):
+        return None
+    data = data.decode('utf-8')
+
+    if not RE_UDDF_ROOT.search(data) or len(RE_RG_START.findall(data)) != 1:
+        return None
+
+    # position of each dive, the last position is the end of repetition
+    # group
+    pos = [m.start() for m in RE_DIVE_START.finditer(data)]
+    m = RE_RG_END.search(data, pos[-1]) if pos else None
+    if m is None:
+        return None
+    pos.append(m.start())
+
+    m = RE_GASDEF_END.search(data)
+    gas_wrap = m is None
+    if gas_wrap:
+        if RE_GASDEF_START.search(data):
+            return None
+        m = RE_GASDEF_NEXT.search(data)
+    gas_pos = m.start()
+
+    index = _load_index(f)
+    if index is None or index['ids'] is None:
+        doc = parse(f, cache=True)
+        ids = set(xp(doc, '//uddf:*/@id'))
+        index = {
+            'dives': list(_index_data(XP_FIND_DIVES(doc, nodes=None,
+                dives=None))),
+            'ids': ids,
+        }
+        del doc
+        if CACHE_FILES or os.path.exists(index_file(f)):
+            _write_index(f, index['dives'], ids)
+
+    summary = index['dives']
+    times = [parse_datetime(d[1]) for d in summary]
+    if len(times) != len(pos) - 1 \
+            or any(t1 >= t2 for t1, t2 in zip(times, times[1:])):
+        log.debug('dives not sorted, cannot append')
+        return None
+
+    # copy nodes into new document, so they can be validated
+    doc = create()
+    gn, = create_node('uddf:gasdefinitions', parent=doc)
+    _, rg = create_node('uddf:profiledata/uddf:repetitiongroup', parent=doc)
+    _set_id(rg)
+
+    with NodeCopier(doc, index['ids']) as nc:
+        new_gases = [cn for cn in (nc.copy(n, gn) for n in gases)
+                if cn is not None]
+
+        new_dives = {}
+        for n in dives:
+            cn = nc.copy(n, None)
+            if cn is None:
+                continue
+            dt = parse_datetime(XP_DEFAULT_DIVE_DATA[1](cn)[0])
+            k = bisect_left(times, dt)
+            if k < len(times) and times[k] == dt or dt in new_dives:
+                log.debug('dive {} already exists, not appending'.format(dt))
+                continue
+            new_dives[dt] = cn
+
+    if not new_dives:
+        return 0
+
+    new_dives = sorted(new_dives.items(), key=itemgetter(0))
+    for _, n in new_dives:
+        rg.append(n)
+    if not new_gases:
+        doc.remove(gn)
+    if VALIDATE != 'off':
+        assert_valid(doc)
+
+    inserts = []
+    if new_gases:
+        s = _node_str(gn) if gas_wrap else ''.join(map(_node_str, new_gases))
+        inserts.append((gas_pos, s))
+    inserts.extend((pos[bisect_left(times, dt)], _node_str(n))
+        for dt, n in new_dives)
+
+    def chunks():
+        k = 0
+        for i, s in inserts:
+            yield data[k:i]
+            yield s
+            k = i
+        yield data[k:]
+
+    save(chunks(), f, validate='off')
+
+    # update dive index, dive nodes positions are renumbered
+    if CACHE_FILES or os.path.exists(index_file(f)):
+        new = list(_index_data(n for _, n in new_dives))
+        summary = sorted(summary + new, key=lambda d: parse_datetime(d[1]))
+        summary = [list(d[:-1]) + [k] for k, d in enumerate(summary, 1)]
+        ids = set(index['ids'])
+        for n in itertools.chain(new_gases, (n for _, n in new_dives)):
+            ids.update(xp(n, 'descendant-or-self::uddf:*/@id'))
+        _write_index(f, summary, ids)
+
+    log.debug('appended {} dives'.format(len(new_dives)))
+    return len(new_dives)
+
+
+def _node_str(node):
+    """
+    Serialize UDDF node, which is inserted into UDDF file data.
+
+    UDDF namespace is the default namespace of UDDF file, so its
+    declaration is removed from the node start tag.
+
+    :Parameters:
+     node
+        UDDF node.
+    """
+    s = et.tostring(node, encoding='unicode', pretty_print=True,
+            with_tail=False)
+    k = s.index('>')
+    return s[:k].replace(XMLNS_UDDF, '', 1) + s[k:]
+
 
 class NodeCopier(object):
     """
@@ -1281,12 +2189,19 @@ class NodeCopier(object):
      doc_ids
         The cache of target document ids.
     """
-    def __init__(self, doc):
+    def __init__(self, doc, ids=None):
         """
         Initialize node copier.
+
+        :Parameters:
+         doc
+            The target document.
+         ids
+            Collection of target document ids, if `None`, then the ids are
+            found in the target document.
         """
         self.doc = doc
-        self.doc_ids = set(xp(doc, '//uddf:*/@id'))
+        self.doc_ids = set(xp(doc, '//uddf:*/@id') if ids is None else ids)
 
 
     def __enter__(self):
@@ -1323,7 +2238,8 @@ class NodeCopier(object):
          node
             Node to copy.
          target
-            The future parent of the copied node.
+            The future parent of the copied node, if `None`, then the copy
+            is not attached to target document.
         """
         cn = deepcopy(node)
 
@@ -1358,7 +2274,8 @@ class NodeCopier(object):
             if p is not None:
                 p.remove(n)
 
-        target.append(cn)
+        if target is not None:
+            target.append(cn)
         return cn
 
 
@@ -1391,19 +2308,19 @@ def gen_id(value=None):
     return 'id-{}'.format(vid)
 
 
-def xml_file_copy(f):
+def xml_raw(node):
     """
-    Iterator of raw XML data from a file to data into ``dirty.xml`` nodes.
+    Render ``dirty.xml`` node as raw XML data.
+
+    Every piece of XML data of a node is passed through all its parent
+    nodes when a document is rendered, so rendering a big subtree upfront
+    speeds up rendering of deeply nested documents.
 
     :Parameters:
-     f
-        File containing XML data.
+     node
+        XML node to render.
     """
-    while True:
-        l = f.read(4096)
-        if not l:
-            break
-        yield RawString(l)
+    return RawString(''.join(node))
 
 
 def get_version(f):
@@ -1416,7 +2333,7 @@ def get_version(f):
      f
         File to check.
     """
-    n = parse(f, ver_check=False).getroot()
+    n = parse(f, ver_check=False, cache=True).getroot()
     v1, v2, *_ = n.get('version').split('.')
     if isinstance(f, FileIO):
         f.seek(0, 0)
@@ -1424,4 +2341,394 @@ def get_version(f):
     return int(v1), int(v2)
 
 
+#
+# Dive index.
+#
+
+# dive index file extension and format version
+INDEX_EXT = '.kzidx'
+INDEX_VERSION = 2
+
+# create dive index and dive profile cache files when reading UDDF files;
+# existing files are used and updated regardless of the setting
+CACHE_FILES = False
+
+# dive index record
+DiveSummary = namedtuple('DiveSummary',
+    'number datetime depth duration temp avg_depth mode id node')
+
+# dive summary fields, queries and parsers used to build dive index
+_INDEX_FIELDS = DiveSummary._fields[:-1]
+_INDEX_QUERIES = XP_DEFAULT_DIVE_DATA[:-1] + (XPath('@id'),)
+_INDEX_PARSERS = (int, str, float, float, float, float, str, str)
+
+
+def index_file(f):
+    """
+    Get name of dive index file of an UDDF file.
+
+    :Parameters:
+     f
+        UDDF file name.
+    """
+    return f + INDEX_EXT
+
+
+def index_dives(f, nodes=None, dives=None):
+    """
+    Find dive summary data in UDDF file using optional numeric range of
+    nodes or total dive number.
+
+    The data is read from dive index file stored next to the UDDF file,
+    see :py:func:`index_file`. If the index is out of date, then it is
+    recreated. If the index does not exist, then it is created only if
+    :py:data:`CACHE_FILES` is set.
+
+    The index identifies a dive with its node position within repetition
+    group, which allows to find the dive with numeric range of nodes.
+
+    Generator of dive summary records (:py:class:`DiveSummary`) is
+    returned.
+
+    :Parameters:
+     f
+        UDDF file.
+     nodes
+        Numeric range of nodes, `None` if all nodes.
+     dives
+        Numeric range of total dive number, `None` if any dive.
+    """
+    is_fn = isinstance(f, str)
+    data = load_index(f) if is_fn else None
+    if data is None:
+        data = list(_index_data(iterfind_dives(f)))
+        if is_fn and (CACHE_FILES or os.path.exists(index_file(f))):
+            try:
+                _write_index(f, data)
+            except OSError as ex:
+                log.warn('cannot save dive index: {}'.format(ex))
+
+    in_nodes = _range_func(nodes)
+    in_dives = _range_func(dives)
+    for item in data:
+        d = DiveSummary(*item)
+        if in_nodes(d.node) \
+                and (not dives or d.number is not None and in_dives(d.number)):
+            yield d._replace(datetime=parse_datetime(d.datetime))
+
+
+def save_index(doc, f):
+    """
+    Save dive index of UDDF document.
+
+    :Parameters:
+     doc
+        UDDF document.
+     f
+        UDDF file name of the document.
+    """
+    nodes = XP_FIND_DIVES(doc, nodes=None, dives=None)
+    _write_index(f, list(_index_data(nodes)), xp(doc, '//uddf:*/@id'))
+
+
+def load_index(f):
+    """
+    Load dive index of UDDF file.
+
+    The index data is returned or `None` if the index does not exist or is
+    out of date.
+
+    :Parameters:
+     f
+        UDDF file name.
+    """
+    data = _load_index(f)
+    return None if data is None else data['dives']
+
+
+def _load_index(f):
+    """
+    Load dive index file of UDDF file.
+
+    The dive index file data is returned or `None` if the index does not
+    exist or is out of date.
+
+    :Parameters:
+     f
+        UDDF file name.
+    """
+    fn = index_file(f)
+    try:
+        with open(fn) as fi:
+            data = json.load(fi)
+    except (OSError, ValueError) as ex:
+        log.debug('cannot load dive index {}: {}'.format(fn, ex))
+        return None
+
+    if data.get('version') != INDEX_VERSION or data.get('key') != _file_key(f):
+        log.debug('dive index {} is out of date'.format(fn))
+        return None
+    return data
+
+
+def _index_data(nodes):
+    """
+    Create dive index data for collection of dive nodes.
+
+    :Parameters:
+     nodes
+        Collection of dive nodes.
+    """
+    rg = None
+    for n in nodes:
+        # node position is relative to its repetition group
+        if n.getparent() is not rg:
+            rg = n.getparent()
+            k = 0
+        k += 1
+        d = find_data('DiveSummary', n, _INDEX_FIELDS, _INDEX_QUERIES,
+                _INDEX_PARSERS)
+        yield d + (k,)
+
+
+def _write_index(f, data, ids=None):
+    """
+    Write dive index file of UDDF file.
+
+    The ids of UDDF document nodes are stored in the index file, so dives
+    can be appended to the UDDF file without parsing it, see
+    :py:func:`append_dives`.
+
+    :Parameters:
+     f
+        UDDF file name.
+     data
+        Dive index data.
+     ids
+        Collection of UDDF document node ids, `None` if unknown.
+    """
+    fn = index_file(f)
+    ftmp = fn + '.tmp'
+    with open(ftmp, 'w') as fo:
+        json.dump({
+            'version': INDEX_VERSION,
+            'key': _file_key(f),
+            'dives': data,
+            'ids': None if ids is None else sorted(ids),
+        }, fo)
+    os.replace(ftmp, fn)
+    log.debug('dive index {} saved'.format(fn))
+
+
+def _file_key(f):
+    """
+    Get key of file content, which is file size and modification time.
+
+    :Parameters:
+     f
+        File name.
+    """
+    st = os.stat(f)
+    return [st.st_size, st.st_mtime_ns]
+
+
+#
+# Dive profile cache.
+#
+
+# dive profile cache file extension, magic number and format version
+PROFILE_EXT = '.kzprof'
+PROFILE_MAGIC = b'KZPC'
+PROFILE_VERSION = 2
+
+# dive profile cache header: magic number, format version, UDDF file size,
+# UDDF file modification time and length of table of contents
+PROFILE_HEADER = struct.Struct('<4sIqqI')
+
+# types of dive profile columns stored in dive profile cache, the types
+# are the same as types of columns read from XML, see ProfileColumns
+PROFILE_TYPES = ('<f8',) * 6 + ('<i2',) * 2
+
+# dive profile cache of last used file, see _load_profiles
+_profiles_cache = None, None, None
+
+
+def profile_file(f):
+    """
+    Get name of dive profile cache file of an UDDF file.
+
+    :Parameters:
+     f
+        UDDF file name.
+    """
+    return f + PROFILE_EXT
+
+
+def save_profiles(doc, f):
+    """
+    Save dive profile cache of UDDF document.
+
+    The dive profile cache is binary file with
+
+    - header (:py:data:`PROFILE_HEADER`), which identifies content of the
+      UDDF file
+    - table of contents in JSON format, which maps dive id to offset of
+      dive profile data, number of samples, list of alarm names and list
+      of gas mix ids
+    - dive profile columns of each dive stored as packed arrays of
+      :py:data:`PROFILE_TYPES` types
+
+    The cache is created by :py:func:`dive_profile_columns` function for
+    documents parsed with :py:func:`parse` function, if
+    :py:data:`CACHE_FILES` is set, and updated by :py:func:`save`
+    function.
+
+    NumPy module is required.
+
+    :Parameters:
+     doc
+        UDDF document.
+     f
+        UDDF file name of the document.
+    """
+    import numpy as np
+
+    toc = {}
+    blocks = []
+    offset = 0
+    for n in XP_FIND_DIVES(doc, nodes=None, dives=None):
+        id = n.get('id')
+        if id is None or id in toc:
+            continue
+        *columns, alarms, codes = _profile_columns(n)
+        block = b''.join(c.astype(t).tobytes()
+            for c, t in zip(columns, PROFILE_TYPES))
+        block += bytes(-len(block) % 8)
+
+        toc[id] = [offset, len(columns[0]), alarms, codes]
+        blocks.append(block)
+        offset += len(block)
+
+    toc = json.dumps(toc).encode()
+    header = PROFILE_HEADER.pack(PROFILE_MAGIC, PROFILE_VERSION,
+            *_file_key(f), len(toc))
+    pad = bytes(-(len(header) + len(toc)) % 8)
+
+    fn = profile_file(f)
+    ftmp = fn + '.tmp'
+    with open(ftmp, 'wb') as fo:
+        fo.write(header)
+        fo.write(toc)
+        fo.write(pad)
+        fo.writelines(blocks)
+    os.replace(ftmp, fn)
+    log.debug('dive profile cache {} saved'.format(fn))
+
+
+def _load_profiles(f):
+    """
+    Load dive profile cache of UDDF file.
+
+    The cache file is memory mapped. Tuple of memory map, table of contents
+    and offset of dive profile data is returned or `None` if the cache does
+    not exist or is out of date.
+
+    The cache of last used file is kept in memory.
+
+    :Parameters:
+     f
+        UDDF file name.
+    """
+    global _profiles_cache
+
+    fn = profile_file(f)
+    try:
+        key = _file_key(f)
+    except OSError:
+        return None
+
+    cfn, ckey, data = _profiles_cache
+    if cfn == fn and ckey == key:
+        return data
+
+    try:
+        with open(fn, 'rb') as fi:
+            mm = mmap.mmap(fi.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, ver, *fkey, size = PROFILE_HEADER.unpack_from(mm)
+    except (OSError, ValueError, struct.error) as ex:
+        log.debug('cannot load dive profile cache {}: {}'.format(fn, ex))
+        return None
+
+    if magic != PROFILE_MAGIC or ver != PROFILE_VERSION or fkey != key:
+        log.debug('dive profile cache {} is out of date'.format(fn))
+        return None
+
+    start = PROFILE_HEADER.size
+    toc = json.loads(mm[start:start + size].decode())
+    start += size
+    start += -start % 8
+
+    data = mm, toc, start
+    _profiles_cache = fn, key, data
+    log.debug('dive profile cache {} loaded'.format(fn))
+    return data
+
+
+def _cached_profile_columns(node):
+    """
+    Get dive profile data as columns from dive profile cache.
+
+    If the cache is out of date and the dive node belongs to a document
+    stored in parsed documents cache, then the cache is recreated.
+    If the cache does not exist, then it is created only if
+    :py:data:`CACHE_FILES` is set.
+
+    Tuple of dive profile columns, list of alarm names and list of gas mix
+    ids is returned or `None` if the data is not in the cache.
+
+    :Parameters:
+     node
+        Dive node.
+
+    .. seealso:: :py:func:`dive_profile_columns`
+    """
+    import numpy as np
+
+    tree = node.getroottree()
+    f = tree.docinfo.URL
+    id = node.get('id')
+    if f is None or id is None:
+        return None
+
+    data = _load_profiles(f)
+    if data is None:
+        if not CACHE_FILES and not os.path.exists(profile_file(f)):
+            return None
+        doc = _cache_get(f)
+        if doc is None or doc.getroot() is not tree.getroot():
+            return None
+        try:
+            save_profiles(doc, f)
+        except OSError as ex:
+            log.warn('cannot save dive profile cache: {}'.format(ex))
+            return None
+        data = _load_profiles(f)
+        if data is None:
+            return None
+
+    mm, toc, offset = data
+    if id not in toc:
+        return None
+
+    start, n, alarms, codes = toc[id]
+    offset += start
+    columns = []
+    for t in PROFILE_TYPES:
+        dt = np.dtype(t)
+        columns.append(np.frombuffer(mm, dtype=dt, count=n, offset=offset)
+            if n else np.empty(0, dtype=dt))
+        offset += n * dt.itemsize
+    return (*columns, alarms, codes)
+
+
 # vim: sw=4:et:ai
@@ -0,0 +1,158 @@
+/*
+ * Stub of libdivecomputer library implementing Reefnet Sensus Ultra dive
+ * extraction and parsing functions used by Kenozooid Sensus Ultra driver.
+ *
+ * The stub allows to measure performance of the driver without a device
+ * and without libdivecomputer library, see scripts/bench-su-parser.
+ *
+ *   cc -O2 -shared -fPIC -o libdc-stub.so scripts/libdc-stub.c
+ */
+
+#include <stdlib.h>
+#include <string.h>
+
+#define SIZE_HEADER 16
+#define SIZE_SAMPLE 4
+
+#define BAR 100000.0
+#define ATM 101325.0
+#define HYDROSTATIC (1025.0 * 9.80665)
+
+/* see kenozooid.driver.su.SampleType */
+enum { SAMPLE_TIME, SAMPLE_DEPTH, SAMPLE_PRESSURE, SAMPLE_TEMPERATURE };
+
+typedef union {
+    unsigned int time;
+    double depth;
+    struct {
+        unsigned int tank;
+        double value;
+    } pressure;
+    double temperature;
+} sample_value_t;
+
+typedef int (*dive_callback_t)(const unsigned char *data, unsigned int size,
+    const unsigned char *fingerprint, unsigned int fsize, void *userdata);
+typedef void (*sample_callback_t)(int type, sample_value_t value,
+    void *userdata);
+
+typedef struct {
+    const unsigned char *data;
+    unsigned int size;
+} parser_t;
+
+static const unsigned char header[4] = {0x00, 0x00, 0x00, 0x00};
+static const unsigned char footer[4] = {0xff, 0xff, 0xff, 0xff};
+
+static unsigned int uint16_le(const unsigned char *data) {
+    return data[0] + (data[1] << 8);
+}
+
+/* there is no device, so device functions fail */
+int reefnet_sensusultra_device_open(void **device, const char *name) {
+    return -1;
+}
+
+int reefnet_sensusultra_device_sense(void *device, unsigned char *data,
+        unsigned int size) {
+    return -1;
+}
+
+int reefnet_sensusultra_device_get_handshake(void *device,
+        unsigned char *data, unsigned int size) {
+    return -1;
+}
+
+int reefnet_sensusultra_device_read_user(void *device, unsigned char *data,
+        unsigned int size) {
+    return -1;
+}
+
+void *dc_buffer_new(size_t capacity) {
+    return NULL;
+}
+
+int device_dump(void *device, void *buffer) {
+    return -1;
+}
+
+int reefnet_sensusultra_parser_create(parser_t **parser) {
+    *parser = calloc(1, sizeof(parser_t));
+    return *parser == NULL ? -1 : 0;
+}
+
+int parser_destroy(parser_t *parser) {
+    free(parser);
+    return 0;
+}
+
+int parser_set_data(parser_t *parser, const unsigned char *data,
+        unsigned int size) {
+    parser->data = data;
+    parser->size = size;
+    return 0;
+}
+
+int parser_samples_foreach(parser_t *parser, sample_callback_t callback,
+        void *userdata) {
+    const unsigned char *data = parser->data;
+    unsigned int interval = uint16_le(data + 8);
+    unsigned int time = 0;
+    unsigned int offset = SIZE_HEADER;
+    sample_value_t sample;
+
+    while (offset + SIZE_SAMPLE <= parser->size) {
+        if (memcmp(data + offset, footer, sizeof(footer)) == 0)
+            break;
+
+        time += interval;
+        sample.time = time;
+        callback(SAMPLE_TIME, sample, userdata);
+
+        /* temperature in 0.01 K */
+        sample.temperature = uint16_le(data + offset) / 100.0 - 273.15;
+        callback(SAMPLE_TEMPERATURE, sample, userdata);
+
+        /* absolute pressure in millibar */
+        sample.depth = (uint16_le(data + offset + 2) * BAR / 1000.0 - ATM)
+            / HYDROSTATIC;
+        callback(SAMPLE_DEPTH, sample, userdata);
+
+        offset += SIZE_SAMPLE;
+    }
+    return 0;
+}
+
+int reefnet_sensusultra_extract_dives(void *device, const unsigned char *data,
+        unsigned int size, dive_callback_t callback, void *userdata) {
+    unsigned int previous = size;
+    unsigned int current = size >= 4 ? size - 4 : 0;
+
+    /* search for dives from the end of data, the newest dive first */
+    while (current > 0) {
+        current--;
+        if (memcmp(data + current, header, sizeof(header)) == 0) {
+            unsigned int offset = current + SIZE_HEADER;
+            int found = 0;
+            while (offset + 4 <= previous) {
+                if (memcmp(data + offset, footer, sizeof(footer)) == 0) {
+                    found = 1;
+                    break;
+                }
+                offset++;
+            }
+            if (!found)
+                return -1;
+
+            if (!callback(data + current, offset + 4 - current,
+                    data + current + 4, 4, userdata))
+                return 0;
+
+            previous = current;
+            current = current >= 4 ? current - 4 : 0;
+        }
+    }
+    return 0;
+}
+
+/* vim: sw=4:et:ai */
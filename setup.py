@@ -11,11 +11,13 @@ VERSION = __import__('kenozooid').__version__
 
 MODS = [
     'lxml >= 2.3', 'dirty >= 1.0.2', 'python-dateutil >= 2.0',
-    'rpy2 >= 2.2.1', 'pyserial >= 2.6', 'decotengu >= 0.14.0'
+    'rpy2 >= 2.2.1', 'pyserial >= 2.6', 'decotengu >= 0.14.0',
+    'numpy >= 1.8',
 ]
 MODS_DEPS = [
     'lxml >= 2.3', 'dirty >= 1.0.2', 'python-dateutil >= 2.0',
-    'rpy2 >= 2.2.1', 'pyserial_py3k >= 2.6', 'distribute', 'setuptools-git'
+    'rpy2 >= 2.2.1', 'pyserial_py3k >= 2.6', 'numpy >= 1.8', 'distribute',
+    'setuptools-git'
 ]
 
 def _py_inst(mods, names, py_miss):
@@ -43,12 +45,12 @@ class CheckDeps(Command):
         pass
 
     def run(self):
-        python_ok = sys.version_info >= (3, 2)
+        python_ok = sys.version_info >= (3, 7)
         rpy_ok = False
         mods = MODS
         names = (
             'lxml', 'dirty', 'python-dateutil', 'rpy2', 'pyserial',
-            'decotengu'
+            'decotengu', 'numpy'
         )
         ic = 2
         py_miss = set()
@@ -56,7 +58,7 @@ class CheckDeps(Command):
 
         print('Checking Kenozooid dependencies')
 
-        print('Checking Python version >= 3.2... {}' \
+        print('Checking Python version >= 3.7... {}' \
                 .format('ok' if python_ok else 'no'))
 
         # check Python modules
@@ -89,7 +91,7 @@ class CheckDeps(Command):
         if py_miss and py_miss.intersection(mods[:ic]) or not python_ok :
             print('\nMissing core dependencies:\n')
         if not python_ok:
-            print('  Use Python 3.2 at least!!!\n')
+            print('  Use Python 3.7 at least!!!\n')
         _py_inst(mods[:ic], names, py_miss)
 
         if py_miss and py_miss.intersection(mods[ic:]):
@@ -187,6 +189,7 @@ setup(
     setup_requires = ['setuptools_git >= 1.0',],
     packages=find_packages('.'),
     scripts=('bin/kz',),
+    python_requires='>=3.7',
     include_package_data=True,
     long_description=\
 """\